@@ -1,19 +1,39 @@
 """
 API REST simples para servir o modelo de ML
+
+Para reduzir o cold start, o módulo importa apenas o necessário para o
+caminho de predição: o xgboost é importado ao carregar o modelo (sem o
+scikit-learn) e o pandas só nos endpoints que leem o dataset.
 """
 
+import time
+
+_import_start = time.perf_counter()
+
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import pickle
 import numpy as np
-import pandas as pd
 from pathlib import Path
 import logging
-import json
+import os
+import sys
+import threading
+
+# Adicionar src ao path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from model_pool import ModelPool, parse_traffic_split
+import model_io
+from warmup import warm_up
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Tempos de inicialização (em segundos), expostos em /health
+startup_timings = {
+    'imports_s': time.perf_counter() - _import_start
+}
+
 app = Flask(__name__)
 # Permitir CORS - incluir domínios de deploy (Streamlit Cloud, etc)
 CORS(app, resources={
@@ -25,76 +45,151 @@ CORS(app, resources={
             "*"  # Em produção, remover e especificar apenas domínios permitidos
         ],
         "methods": ["GET", "POST", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"]
+        "allow_headers": ["Content-Type", "Authorization", "X-Model-Version"],
+        "expose_headers": ["X-Model-Version"]
     }
 })
 
-# Variáveis globais para modelo e scaler
+# Variáveis globais para modelo e scaler (versão padrão do pool)
 model = None
 scaler = None
 feature_names = None
 metadata = None
 encoding_maps = None
 unique_values = None
+model_pool = None
+
+# Estado de prontidão, exposto em /ready (pronto só após carga e warm-up)
+readiness = {
+    'ready': False,
+    'stage': 'starting',
+    'error': None,
+    'warmup': None
+}
 
 
 def load_latest_model():
-    """Carrega o modelo mais recente"""
-    global model, scaler, feature_names, metadata, encoding_maps, unique_values
+    """
+    Carrega a versão atual do modelo (manifest.json) e inicializa o pool de versões
+
+    Variáveis de ambiente:
+        MODEL_POOL_SIZE: Número máximo de versões residentes (padrão: 3)
+        MODEL_DEFAULT_VERSION: Versão padrão (padrão: a mais recente)
+        MODEL_TRAFFIC_SPLIT: Divisão de tráfego, ex: "versao_a:0.9,versao_b:0.1"
+        MODEL_SHADOW_VERSION: Versão avaliada em shadow
+        TREE_COMPILER: Compila o ensemble em arrays NumPy para lotes pequenos (padrão: true)
+        TREE_COMPILER_MAX_BATCH: Maior lote atendido pelo ensemble compilado
+            (padrão: calibrado no warm-up)
+        PREDICT_NTHREAD: Threads por predição (padrão: 1, já que o servidor
+            atende requisições em várias threads)
+        MODEL_BACKEND: Backend de predição: xgboost (padrão) ou onnx (onnxruntime)
+        MODEL_SHADOW_MAX_PENDING: Máximo de imóveis pendentes na fila do
+            shadow (padrão: 100; os além disso são descartados)
+    """
+    global model, scaler, feature_names, metadata, encoding_maps, unique_values, model_pool
     
     models_dir = Path(__file__).parent.parent / "models"
     
-    # Encontrar modelo mais recente
-    model_files = list(models_dir.glob("model_*.pkl"))
-    if not model_files:
-        raise FileNotFoundError("Nenhum modelo encontrado. Execute train_model.py primeiro.")
-    
-    # Pegar o mais recente
-    latest_model = max(model_files, key=lambda p: p.stat().st_mtime)
-    version = latest_model.stem.replace("model_", "")
-    
-    logger.info(f"Carregando modelo versão: {version}")
-    
-    # Carregar modelo
-    with open(latest_model, 'rb') as f:
-        model = pickle.load(f)
-    
-    # Carregar scaler
-    scaler_path = models_dir / f"scaler_{version}.pkl"
-    with open(scaler_path, 'rb') as f:
-        scaler = pickle.load(f)
-    
-    # Carregar metadados
-    metadata_path = models_dir / f"metadata_{version}.json"
-    with open(metadata_path, 'r') as f:
-        metadata = json.load(f)
-        feature_names = metadata['feature_names']
-    
-    # Carregar encoding maps e unique values
-    encoding_path = models_dir / f"encoding_{version}.json"
-    if encoding_path.exists():
-        with open(encoding_path, 'r', encoding='utf-8') as f:
-            encoding_data = json.load(f)
-            encoding_maps = encoding_data.get('encoding_maps', {})
-            unique_values = encoding_data.get('unique_values', {})
-        logger.info("Mapeamentos de encoding carregados com sucesso!")
-    else:
-        logger.warning("Arquivo de encoding não encontrado. Usando valores padrão.")
-        encoding_maps = {}
-        unique_values = {}
+    # A API só usa o Booster: importar o xgboost sem o scikit-learn
+    start = time.perf_counter()
+    model_io.import_xgboost(lean=True)
+    startup_timings['xgboost_import_s'] = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    model_pool = ModelPool(
+        models_dir,
+        max_size=int(os.environ.get('MODEL_POOL_SIZE', 3)),
+        default_version=os.environ.get('MODEL_DEFAULT_VERSION') or None,
+        traffic_split=parse_traffic_split(os.environ.get('MODEL_TRAFFIC_SPLIT', '')),
+        shadow_version=os.environ.get('MODEL_SHADOW_VERSION') or None,
+        compile_trees=os.environ.get('TREE_COMPILER', 'true').lower() == 'true',
+        max_compiled_batch=int(os.environ['TREE_COMPILER_MAX_BATCH']) if os.environ.get('TREE_COMPILER_MAX_BATCH') else None,
+        predict_nthread=int(os.environ.get('PREDICT_NTHREAD', 1)),
+        backend=os.environ.get('MODEL_BACKEND', 'xgboost').lower(),
+        max_shadow_pending=int(os.environ.get('MODEL_SHADOW_MAX_PENDING', 100))
+    )
+    bundle = model_pool.get()
     
+    model = bundle.model
+    scaler = bundle.scaler
+    metadata = bundle.metadata
+    feature_names = bundle.feature_names
+    encoding_maps = bundle.encoding_maps
+    unique_values = bundle.unique_values
+    startup_timings['model_load_s'] = time.perf_counter() - start
+    
+    logger.info(
+        "Tempos de inicialização: imports %.3fs, xgboost %.3fs, carga do modelo %.3fs",
+        startup_timings['imports_s'], startup_timings['xgboost_import_s'], startup_timings['model_load_s']
+    )
+    if model_pool.traffic_split:
+        logger.info(f"Divisão de tráfego: {model_pool.traffic_split}")
+    if model_pool.shadow_version:
+        logger.info(f"Versão shadow: {model_pool.shadow_version}")
     logger.info("Modelo carregado com sucesso!")
 
 
+def warm_up_model():
+    """
+    Aquece o pool com predições sintéticas antes de receber tráfego
+
+    Variáveis de ambiente:
+        WARMUP_REQUESTS: Predições sintéticas por versão (padrão: 50, 0 desativa)
+    """
+    max_requests = int(os.environ.get('WARMUP_REQUESTS', 50))
+    start = time.perf_counter()
+    if max_requests > 0:
+        readiness['warmup'] = warm_up(model_pool, max_requests)
+    startup_timings['warmup_s'] = time.perf_counter() - start
+
+
+def initialize():
+    """Carrega o modelo, executa o warm-up e marca a API como pronta"""
+    try:
+        readiness['stage'] = 'loading'
+        load_latest_model()
+        readiness['stage'] = 'warming_up'
+        warm_up_model()
+        readiness['stage'] = 'ready'
+        readiness['ready'] = True
+        logger.info("API pronta para receber tráfego")
+    except Exception as e:
+        readiness['stage'] = 'failed'
+        readiness['error'] = str(e)
+        logger.error(f"Erro ao carregar modelo: {e}")
+        logger.warning("API iniciada sem modelo. Endpoints de predição não funcionarão.")
+
+
 @app.route('/health', methods=['GET'])
 def health():
-    """Endpoint de health check"""
+    """Endpoint de health check (liveness: o processo está respondendo)"""
     return jsonify({
         'status': 'healthy',
-        'model_loaded': model is not None
+        'model_loaded': model is not None,
+        'ready': readiness['ready'],
+        'startup_timings': startup_timings
     })
 
 
+@app.route('/ready', methods=['GET'])
+def ready():
+    """
+    Endpoint de readiness: só responde 200 após a carga do modelo e o warm-up
+
+    Enquanto o modelo carrega (ou se a carga falhou) responde 503, para que
+    o balanceador não envie as primeiras requisições a um worker frio.
+    """
+    body = {
+        'ready': readiness['ready'],
+        'stage': readiness['stage']
+    }
+    if readiness['error']:
+        body['error'] = readiness['error']
+    if readiness['ready']:
+        body['warmup'] = readiness['warmup']
+    return jsonify(body), 200 if readiness['ready'] else 503
+
+
 @app.route('/predict', methods=['POST'])
 def predict():
     """
@@ -114,9 +209,15 @@ def predict():
         "suites": int (opcional)
     }
     """
-    if model is None or scaler is None:
+    if model_pool is None:
         return jsonify({'error': 'Modelo não carregado'}), 500
     
+    requested_version = request.headers.get('X-Model-Version')
+    try:
+        bundle = model_pool.route(requested_version)
+    except KeyError:
+        return jsonify({'error': f'Versão de modelo não encontrada: {requested_version}'}), 404
+    
     try:
         data = request.json
         
@@ -130,10 +231,13 @@ def predict():
             }), 400
         
         # Preparar features
-        features = prepare_features(data)
+        features = prepare_features(data, bundle)
         
         # Fazer predição
-        prediction = model.predict(features)[0]
+        prediction = bundle.predict(features)[0]
+        
+        # Avaliar a versão shadow em background (não afeta a resposta)
+        model_pool.submit_shadow(data, bundle.version, prediction)
         
         # Calcular preço por m²
         price_per_sqm = prediction / data['area'] if data['area'] > 0 else 0
@@ -141,70 +245,101 @@ def predict():
         # Feature importance (simplificado)
         feature_importance = get_simple_feature_importance(data)
         
-        return jsonify({
+        response = jsonify({
             'predicted_price': float(prediction),
             'price_per_sqm': float(price_per_sqm),
             'features_used': feature_importance,
-            'model_version': metadata.get('version', 'unknown'),
+            'model_version': bundle.metadata.get('version', bundle.version),
             'model_metrics': {
-                'mae': metadata.get('metrics', {}).get('MAE', 0),
-                'r2': metadata.get('metrics', {}).get('R2', 0)
+                'mae': bundle.metadata.get('metrics', {}).get('MAE', 0),
+                'r2': bundle.metadata.get('metrics', {}).get('R2', 0)
             }
         })
+        response.headers['X-Model-Version'] = bundle.version
+        return response
     
     except Exception as e:
         logger.error(f"Erro na predição: {e}")
         return jsonify({'error': str(e)}), 500
 
 
-def prepare_features(data: dict) -> np.ndarray:
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """
+    Endpoint para predição de vários imóveis em uma única chamada
+    
+    Body esperado (JSON):
+    {
+        "properties": [ {mesmos campos de /predict}, ... ]
+    }
+    
+    Lotes pequenos são avaliados pelo ensemble compilado e lotes grandes
+    pelo XGBoost (o ponto de troca é calibrado no warm-up).
+    """
+    if model_pool is None:
+        return jsonify({'error': 'Modelo não carregado'}), 500
+    
+    requested_version = request.headers.get('X-Model-Version')
+    try:
+        bundle = model_pool.route(requested_version)
+    except KeyError:
+        return jsonify({'error': f'Versão de modelo não encontrada: {requested_version}'}), 404
+    
+    try:
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict):
+            return jsonify({'error': 'Corpo da requisição deve ser um objeto JSON com o campo "properties"'}), 400
+        items = body.get('properties')
+        if not isinstance(items, list) or not items:
+            return jsonify({'error': 'Campo "properties" deve ser uma lista não vazia'}), 400
+        
+        max_size = int(os.environ.get('BATCH_MAX_SIZE', 1000))
+        if len(items) > max_size:
+            return jsonify({'error': f'Lote maior que o limite de {max_size} imóveis'}), 400
+        
+        # Validar campos obrigatórios de cada imóvel
+        required_fields = ['area', 'bedrooms', 'bathrooms', 'parking_spaces', 
+                         'furnished', 'hoa', 'property_type']
+        for i, data in enumerate(items):
+            if not isinstance(data, dict):
+                return jsonify({'error': f'Imóvel {i} deve ser um objeto JSON'}), 400
+            missing_fields = [f for f in required_fields if f not in data]
+            if missing_fields:
+                return jsonify({
+                    'error': f'Campos obrigatórios faltando no imóvel {i}: {missing_fields}'
+                }), 400
+        
+        # Preparar features e predizer o lote inteiro de uma vez
+        features = np.vstack([prepare_features(data, bundle) for data in items])
+        predictions = bundle.predict(features)
+        
+        # Avaliar a versão shadow nas mesmas entradas, em background
+        model_pool.submit_shadow_batch(items, bundle.version, predictions)
+        
+        response = jsonify({
+            'predictions': [
+                {
+                    'predicted_price': float(prediction),
+                    'price_per_sqm': float(prediction / data['area']) if data['area'] > 0 else 0.0
+                }
+                for data, prediction in zip(items, predictions)
+            ],
+            'count': len(items),
+            'model_version': bundle.metadata.get('version', bundle.version)
+        })
+        response.headers['X-Model-Version'] = bundle.version
+        return response
+    
+    except Exception as e:
+        logger.error(f"Erro na predição em lote: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+def prepare_features(data: dict, bundle=None) -> np.ndarray:
     """Prepara features para predição"""
-    # Inicializar DataFrame com zeros para todas as features esperadas
-    df = pd.DataFrame(0, index=[0], columns=feature_names)
-    
-    # Preencher features numéricas básicas
-    df['area'] = data.get('area', 0)
-    df['bedrooms'] = data.get('bedrooms', 0)
-    df['bathrooms'] = data.get('bathrooms', 0)
-    df['parking_spaces'] = data.get('parking_spaces', 0)
-    df['furnished'] = 1 if data.get('furnished', False) else 0
-    df['hoa'] = data.get('hoa', 0)
-    df['suites'] = data.get('suites', 0)
-    
-    # Calcular price_per_sqm (estimativa inicial baseada na média)
-    mean_rent = encoding_maps.get('mean_rent', 2000) if encoding_maps else 2000
-    if df['area'].iloc[0] > 0:
-        # Usar média de preço por m² do dataset
-        estimated_price_per_sqm = mean_rent / 70  # Assumindo área média de 70m²
-        df['price_per_sqm'] = estimated_price_per_sqm
-    else:
-        df['price_per_sqm'] = mean_rent / 70
-    
-    # Encoding de city (target encoding)
-    if 'city_encoded' in df.columns:
-        city = data.get('city', '')
-        city_encoding = encoding_maps.get('city_encoding', {}) if encoding_maps else {}
-        df['city_encoded'] = city_encoding.get(city, mean_rent)
-    
-    # Encoding de neighborhood (target encoding)
-    if 'neighborhood_encoded' in df.columns:
-        neighborhood = data.get('neighborhood', '')
-        neighborhood_encoding = encoding_maps.get('neighborhood_encoding', {}) if encoding_maps else {}
-        df['neighborhood_encoded'] = neighborhood_encoding.get(neighborhood, mean_rent)
-    
-    # Encoding de property_type (One-Hot - se necessário)
-    property_type = data.get('property_type', 'UNIT')
-    property_col = f'property_type_{property_type}'
-    if property_col in df.columns:
-        df[property_col] = 1
-    
-    # Garantir que todas as features estão presentes e na ordem correta
-    df = df[feature_names]
-    
-    # Normalizar
-    features_scaled = scaler.transform(df)
-    
-    return features_scaled
+    if bundle is None:
+        bundle = model_pool.get()
+    return bundle.prepare_features(data)
 
 
 def get_simple_feature_importance(data: dict) -> dict:
@@ -233,11 +368,38 @@ def model_info():
     return jsonify({
         'version': metadata.get('version', 'unknown'),
         'timestamp': metadata.get('timestamp', 'unknown'),
+        'backend': metadata.get('backend', 'xgboost'),
         'metrics': metadata.get('metrics', {}),
         'top_features': metadata.get('feature_importance', [])[:10]
     })
 
 
+@app.route('/model/versions', methods=['GET'])
+def model_versions():
+    """Retorna as versões disponíveis, residentes em memória e o roteamento configurado"""
+    if model_pool is None:
+        return jsonify({'error': 'Modelo não carregado'}), 500
+    
+    return jsonify({
+        'default_version': model_pool.default_version,
+        'available': model_pool.available_versions(),
+        'resident': model_pool.resident_versions(),
+        'traffic_split': model_pool.traffic_split,
+        'shadow_version': model_pool.shadow_version,
+        'backend': model_pool.backend,
+        'resident_backends': model_pool.resident_backends()
+    })
+
+
+@app.route('/model/shadow', methods=['GET'])
+def model_shadow():
+    """Retorna a divergência entre a versão shadow e as versões que responderam"""
+    if model_pool is None:
+        return jsonify({'error': 'Modelo não carregado'}), 500
+    
+    return jsonify(model_pool.shadow_stats())
+
+
 @app.route('/data/unique-values', methods=['GET'])
 def get_unique_values():
     """Retorna valores únicos de features categóricas"""
@@ -277,6 +439,99 @@ def get_property_types():
     return jsonify({'property_types': property_types})
 
 
+# Colunas dos anúncios usadas por /data/properties (projeção do snapshot)
+LISTING_COLUMNS = ['property_type', 'neighborhood', 'area', 'bedrooms', 'bathrooms', 'parking_spaces',
+                   'hoa', 'furnished', 'rent_amount', 'city']
+
+# Diretório dos dados (CSV, snapshot e armazenamento dos anúncios)
+DATA_DIR = Path(__file__).parent.parent.parent / "data"
+
+# Armazenamento dos anúncios aberto (reaberto quando o arquivo muda)
+_listing_store = {'key': None, 'store': None}
+_listing_store_lock = threading.Lock()
+
+
+def load_listings():
+    """
+    Carrega os anúncios limpos
+    
+    Lê o snapshot colunar (ver listings_snapshot e build_dataset.py) só com
+    as colunas usadas, mapeado em memória. Sem snapshot, limpa o CSV com o
+    mesmo pipeline do treino (DataProcessor.clean).
+    
+    Variáveis de ambiente:
+        LISTINGS_SNAPSHOT: Caminho do snapshot (padrão: data/listings.npz)
+    
+    Returns:
+        DataFrame dos anúncios, ou None se não houver dataset
+    """
+    import listings_snapshot
+    
+    snapshot_path = Path(os.environ.get('LISTINGS_SNAPSHOT', str(DATA_DIR / listings_snapshot.SNAPSHOT_NAME)))
+    if snapshot_path.exists():
+        return listings_snapshot.load(snapshot_path, columns=LISTING_COLUMNS)
+    
+    # Sem snapshot: imoveis-df.csv ou o formato antigo (dataZAP.csv)
+    for name in ("imoveis-df.csv", "dataZAP.csv"):
+        data_path = DATA_DIR / name
+        if data_path.exists():
+            from data_processing import DataProcessor
+            logger.warning(f"Snapshot {snapshot_path} não encontrado; limpando {name} "
+                           f"(gere o snapshot com build_dataset.py)")
+            return DataProcessor(str(data_path)).clean()
+    return None
+
+
+def get_listing_store():
+    """
+    Retorna o armazenamento dos anúncios usado pelas consultas
+    
+    O arquivo (ver listing_store e build_dataset.py) é mapeado em memória
+    uma vez por processo e reaberto quando é regerado. Sem o arquivo, os
+    anúncios de load_listings são convertidos em memória a cada chamada.
+    Com LISTINGS_BACKEND=sqlite, as consultas vão para o banco SQLite (ver
+    listing_db), reaberto quando o arquivo muda.
+    
+    Variáveis de ambiente:
+        LISTINGS_BACKEND: memmap (padrão) ou sqlite
+        LISTINGS_STORE: Caminho do armazenamento (padrão: data/listings_store.npz)
+        LISTINGS_DB: Caminho do banco SQLite (padrão: data/listings.db)
+    
+    Returns:
+        ListingStore ou ListingDB, ou None se não houver dataset
+    """
+    import listing_store
+    
+    if os.environ.get('LISTINGS_BACKEND', 'memmap').lower() == 'sqlite':
+        import listing_db
+        db_path = Path(os.environ.get('LISTINGS_DB', str(DATA_DIR / listing_db.DB_NAME)))
+        if db_path.exists():
+            stat = db_path.stat()
+            key = (str(db_path), stat.st_mtime_ns, stat.st_size)
+            with _listing_store_lock:
+                if _listing_store['key'] != key:
+                    _listing_store['store'] = listing_db.ListingDB(db_path)
+                    _listing_store['key'] = key
+                    logger.info(f"Banco dos anúncios aberto: {db_path} ({len(_listing_store['store'])} anúncios)")
+                return _listing_store['store']
+        logger.warning(f"Banco {db_path} não encontrado; usando o armazenamento em arrays "
+                       f"(gere o banco com build_dataset.py --sqlite)")
+    
+    store_path = Path(os.environ.get('LISTINGS_STORE', str(DATA_DIR / listing_store.STORE_NAME)))
+    if store_path.exists():
+        stat = store_path.stat()
+        key = (str(store_path), stat.st_mtime_ns, stat.st_size)
+        with _listing_store_lock:
+            if _listing_store['key'] != key:
+                _listing_store['store'] = listing_store.ListingStore.open(store_path)
+                _listing_store['key'] = key
+                logger.info(f"Armazenamento dos anúncios mapeado: {store_path} ({len(_listing_store['store'])} anúncios)")
+            return _listing_store['store']
+    
+    frame = load_listings()
+    return None if frame is None else listing_store.ListingStore.from_frame(frame)
+
+
 @app.route('/data/properties', methods=['GET'])
 def get_properties():
     """
@@ -284,121 +539,42 @@ def get_properties():
     Permite filtros opcionais via query parameters
     """
     try:
-        # Carregar dados originais do dataset
-        data_path = Path(__file__).parent.parent.parent / "data" / "imoveis-df.csv"
-        
-        if not data_path.exists():
-            # Tentar formato antigo
-            data_path = Path(__file__).parent.parent.parent / "data" / "dataZAP.csv"
-            if not data_path.exists():
-                return jsonify({'error': 'Dataset não encontrado'}), 404
+        store = get_listing_store()
+        if store is None:
+            return jsonify({'error': 'Dataset não encontrado'}), 404
         
-        # Carregar dados
-        df = pd.read_csv(data_path, sep=';', low_memory=False)
-        
-        # Aplicar filtros opcionais
+        # Aplicar filtros opcionais (valores inválidos são ignorados)
         filters = request.args.to_dict()
-        
-        if 'preco' in df.columns:
-            # Formato novo: imoveis-df.csv
-            # Converter preco para numérico
-            df['preco'] = pd.to_numeric(df['preco'], errors='coerce')
-            df = df[df['preco'].notna() & (df['preco'] > 0) & (df['preco'] < 100000)].copy()
-            
-            # Renomear colunas para formato padrão
-            df = df.rename(columns={
-                'preco': 'rent_amount',
-                'tipo': 'property_type',
-                'area': 'area',
-                'quartos': 'bedrooms',
-                'bairro': 'neighborhood'
-            })
-            
-            # Adicionar campos padrão
-            df['bathrooms'] = 1
-            df['parking_spaces'] = 0
-            df['hoa'] = 0
-            df['furnished'] = False
-            df['suites'] = 0
-            df['city'] = 'Brasília'
-        
-        # Aplicar filtros opcionais
-        if 'property_type' in filters and filters['property_type'] and filters['property_type'] != 'Todos':
-            df = df[df['property_type'].str.contains(filters['property_type'], case=False, na=False)]
-        
-        if 'neighborhood' in filters and filters['neighborhood'] and filters['neighborhood'] != 'Todos':
-            df = df[df['neighborhood'].str.contains(filters['neighborhood'], case=False, na=False)]
-        
-        if 'min_area' in filters and filters['min_area']:
-            try:
-                min_area = float(filters['min_area'])
-                df = df[pd.to_numeric(df['area'], errors='coerce') >= min_area]
-            except:
-                pass
-        
-        if 'max_area' in filters and filters['max_area']:
-            try:
-                max_area = float(filters['max_area'])
-                df = df[pd.to_numeric(df['area'], errors='coerce') <= max_area]
-            except:
-                pass
-        
-        if 'min_bedrooms' in filters and filters['min_bedrooms']:
-            try:
-                min_bedrooms = int(filters['min_bedrooms'])
-                df = df[pd.to_numeric(df['bedrooms'], errors='coerce') >= min_bedrooms]
-            except:
-                pass
-        
-        if 'max_bedrooms' in filters and filters['max_bedrooms']:
-            try:
-                max_bedrooms = int(filters['max_bedrooms'])
-                df = df[pd.to_numeric(df['bedrooms'], errors='coerce') <= max_bedrooms]
-            except:
-                pass
-        
-        if 'min_price' in filters and filters['min_price']:
-            try:
-                min_price = float(filters['min_price'])
-                df = df[df['rent_amount'] >= min_price]
-            except:
-                pass
-        
-        if 'max_price' in filters and filters['max_price']:
-            try:
-                max_price = float(filters['max_price'])
-                df = df[df['rent_amount'] <= max_price]
-            except:
-                pass
+        query = {}
+        for name in ('property_type', 'neighborhood'):
+            if filters.get(name) and filters[name] != 'Todos':
+                query[name] = filters[name]
+        for name, cast in (('min_area', float), ('max_area', float), ('min_bedrooms', int),
+                           ('max_bedrooms', int), ('min_price', float), ('max_price', float)):
+            if filters.get(name):
+                try:
+                    query[name] = cast(filters[name])
+                except ValueError:
+                    pass
         
         # Limitar número de resultados (paginacao)
         limit = int(filters.get('limit', 1000))
         offset = int(filters.get('offset', 0))
+        # Cursor: continuar depois do anúncio com este id (next_after da página anterior)
+        try:
+            after = int(filters['after']) if filters.get('after') else None
+        except ValueError:
+            return jsonify({'error': f'Cursor "after" inválido: {filters["after"]}'}), 400
         
-        # Converter para formato JSON
-        properties = []
-        for idx, row in df.iloc[offset:offset+limit].iterrows():
-            prop = {
-                'id': int(idx) if pd.notna(idx) else len(properties),
-                'property_type': str(row.get('property_type', 'Desconhecido')),
-                'neighborhood': str(row.get('neighborhood', 'Desconhecido')),
-                'area': float(row.get('area', 0)) if pd.notna(row.get('area')) else 0,
-                'bedrooms': int(row.get('bedrooms', 0)) if pd.notna(row.get('bedrooms')) else 0,
-                'bathrooms': int(row.get('bathrooms', 1)) if pd.notna(row.get('bathrooms')) else 1,
-                'parking_spaces': int(row.get('parking_spaces', 0)) if pd.notna(row.get('parking_spaces')) else 0,
-                'hoa': float(row.get('hoa', 0)) if pd.notna(row.get('hoa')) else 0,
-                'furnished': bool(row.get('furnished', False)) if pd.notna(row.get('furnished')) else False,
-                'rent_amount': float(row.get('rent_amount', 0)) if pd.notna(row.get('rent_amount')) else 0,
-                'city': str(row.get('city', 'Brasília'))
-            }
-            properties.append(prop)
+        total, properties = store.query(query, offset=offset, limit=limit, after=after)
         
         return jsonify({
             'properties': properties,
-            'total': len(df),
+            'total': total,
             'returned': len(properties),
             'offset': offset,
-            'limit': limit
+            'limit': limit,
+            'next_after': properties[-1]['id'] if properties and len(properties) == limit else None
         })
     
     except Exception as e:
@@ -409,15 +585,11 @@ def get_properties():
 
 
 if __name__ == '__main__':
-    # Carregar modelo ao iniciar
-    try:
-        load_latest_model()
-    except Exception as e:
-        logger.error(f"Erro ao carregar modelo: {e}")
-        logger.warning("API iniciada sem modelo. Endpoints de predição não funcionarão.")
+    # Carregar e aquecer o modelo em background: /health responde desde já
+    # e /ready passa a responder 200 quando o warm-up terminar
+    threading.Thread(target=initialize, name='initialize', daemon=True).start()
     
     # Iniciar servidor - suporta variável PORT para deploy (Render, Railway, etc)
-    import os
     port = int(os.environ.get('PORT', 5020))
     debug = os.environ.get('DEBUG', 'False').lower() == 'true'
     logger.info(f"Iniciando servidor na porta {port}...")
@@ -0,0 +1,106 @@
+"""
+Benchmark de cold start da API: importar o app e carregar o modelo
+
+Cada medição roda em um processo Python novo. O resultado (mediana) é
+comparado com o orçamento em `cold_start_budget.json`; o script termina
+com código 1 se o tempo total passar do orçamento (com a tolerância) ou
+se algum módulo proibido (ex: pandas, sklearn) for importado na
+inicialização.
+
+Uso:
+    python benchmarks/bench_cold_start.py [--repeats 5] [--update-budget]
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+API_DIR = Path(__file__).parent.parent / "api"
+BUDGET_PATH = Path(__file__).parent / "cold_start_budget.json"
+
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Script executado em cada processo filho
+CHILD_SCRIPT = """
+import json, logging, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {api_dir!r})
+import app
+app.load_latest_model()
+total = time.perf_counter() - start
+logging.disable(logging.CRITICAL)
+print(json.dumps({{'total_s': total, 'timings': app.startup_timings,
+                   'modules': sorted(m for m in sys.modules if '.' not in m)}}))
+"""
+
+
+def measure(repeats: int) -> dict:
+    """Mede o cold start em processos novos"""
+    script = CHILD_SCRIPT.format(api_dir=str(API_DIR))
+    runs = []
+    for _ in range(repeats):
+        output = subprocess.check_output(
+            [sys.executable, '-W', 'ignore', '-c', script],
+            stderr=subprocess.DEVNULL
+        )
+        runs.append(json.loads(output.decode().strip().splitlines()[-1]))
+
+    timings = {key: statistics.median(r['timings'][key] for r in runs) for key in runs[0]['timings']}
+    return {
+        'total_s': statistics.median(r['total_s'] for r in runs),
+        'timings': timings,
+        'modules': set(runs[-1]['modules'])
+    }
+
+
+def main():
+    """Executa o benchmark"""
+    parser = argparse.ArgumentParser(description="Benchmark de cold start da API")
+    parser.add_argument('--repeats', type=int, default=5, help="Número de processos medidos")
+    parser.add_argument('--update-budget', action='store_true',
+                        help="Grava o tempo medido como novo orçamento")
+    args = parser.parse_args()
+
+    with open(BUDGET_PATH, 'r', encoding='utf-8') as f:
+        budget = json.load(f)
+
+    result = measure(args.repeats)
+
+    logger.info("=" * 60)
+    logger.info("COLD START DA API (mediana de %d processos)", args.repeats)
+    logger.info("=" * 60)
+    for key, value in result['timings'].items():
+        logger.info(f"{key:<20}{value * 1000:>10.1f} ms")
+    logger.info(f"{'total':<20}{result['total_s'] * 1000:>10.1f} ms")
+
+    if args.update_budget:
+        budget['total_s'] = round(result['total_s'], 3)
+        with open(BUDGET_PATH, 'w', encoding='utf-8') as f:
+            json.dump(budget, f, indent=2)
+            f.write('\n')
+        logger.info(f"Orçamento atualizado: {budget['total_s']}s")
+        return 0
+
+    failures = []
+    limit = budget['total_s'] * (1 + budget['tolerance'])
+    if result['total_s'] > limit:
+        failures.append(f"cold start {result['total_s']:.3f}s acima do orçamento de {limit:.3f}s")
+    for module in budget['forbidden_modules']:
+        if module in result['modules']:
+            failures.append(f"módulo '{module}' importado na inicialização")
+
+    for failure in failures:
+        logger.error(f"Regressão: {failure}")
+    if not failures:
+        logger.info(f"Dentro do orçamento ({limit:.3f}s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
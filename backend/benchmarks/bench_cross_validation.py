@@ -0,0 +1,112 @@
+"""
+Benchmark da validação cruzada por orçamento de núcleos
+
+Para cada orçamento de N núcleos compara:
+    - sklearn: `cross_val_score(n_jobs=N)` com o XGBRegressor em `n_jobs=N`
+      (o padrão antigo, com N = todos os núcleos: até N × N threads)
+    - sequencial: folds um a um, XGBoost com N threads
+    - agendado: cv_scheduler (folds simultâneos × threads por fold ≤ N,
+      cortes da quantização compartilhados)
+
+Orçamentos acima dos núcleos da máquina mostram o efeito do excesso de
+threads. Os dados são os do treinamento, opcionalmente replicados com ruído
+(`--scale`) para simular um conjunto maior.
+
+Uso:
+    python benchmarks/bench_cross_validation.py [--cpus 1,2,4] [--scale 10] [--folds 5]
+"""
+
+import argparse
+import os
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+
+SRC_DIR = Path(__file__).parent.parent / "src"
+DATA_PATH = Path(__file__).parent.parent.parent / "data" / "imoveis-df.csv"
+
+# Adicionar src ao path
+sys.path.insert(0, str(SRC_DIR))
+
+from data_processing import DataProcessor
+from model_backends import XGBOOST_PARAMS
+import cv_scheduler
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def load_data(scale: int, seed: int = 42) -> tuple:
+    """Features e target do treinamento, replicados `scale` vezes com ruído de 1%"""
+    logging.disable(logging.INFO)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        processor = DataProcessor(str(DATA_PATH))
+        processor.process()
+        X, y = processor.get_features_and_target()
+    logging.disable(logging.NOTSET)
+
+    X = X.to_numpy(dtype=np.float64)
+    y = y.to_numpy(dtype=np.float64)
+    if scale > 1:
+        rng = np.random.default_rng(seed)
+        X = np.vstack([X * (1 + 0.01 * rng.standard_normal(X.shape)) for _ in range(scale)])
+        y = np.tile(y, scale)
+    return X, y
+
+
+def run_sklearn(X, y, folds: int, cpus: int) -> float:
+    """cross_val_score com n_jobs=cpus no CV e no modelo"""
+    import xgboost as xgb
+    from sklearn.model_selection import cross_val_score
+
+    model = xgb.XGBRegressor(**{**XGBOOST_PARAMS, 'n_jobs': cpus})
+    start = time.perf_counter()
+    cross_val_score(model, X, y, cv=folds, scoring='neg_mean_absolute_error', n_jobs=cpus)
+    return time.perf_counter() - start
+
+
+def run_scheduler(X, y, folds: int, cpus: int, threads_per_fold: int = None) -> tuple:
+    """cv_scheduler; retorna (tempo, folds simultâneos, threads por fold)"""
+    logging.disable(logging.INFO)
+    report = cv_scheduler.cross_validate(XGBOOST_PARAMS, X, y, folds=folds, cpus=cpus,
+                                         threads_per_fold=threads_per_fold)
+    logging.disable(logging.NOTSET)
+    return report['wall_s'], report['workers'], report['threads_per_fold']
+
+
+def main():
+    """Executa o benchmark"""
+    parser = argparse.ArgumentParser(description="Benchmark da validação cruzada")
+    parser.add_argument('--cpus', default=None, help="Orçamentos de núcleos (padrão: 1, 2, 4... até a máquina)")
+    parser.add_argument('--scale', type=int, default=10, help="Replicações do conjunto de dados")
+    parser.add_argument('--folds', type=int, default=5, help="Número de folds")
+    args = parser.parse_args()
+
+    available = os.cpu_count() or 1
+    if args.cpus:
+        budgets = [int(c) for c in args.cpus.split(',')]
+    else:
+        budgets = sorted({2 ** i for i in range(available.bit_length())} | {available})
+
+    X, y = load_data(args.scale)
+    logger.info(f"{len(X)} linhas, {X.shape[1]} features, {args.folds} folds, {available} núcleos na máquina")
+    logger.info("=" * 78)
+    logger.info(f"{'núcleos':>8}{'sklearn (s)':>14}{'sequencial (s)':>16}{'agendado (s)':>14}"
+                f"{'divisão':>12}{'speedup':>12}")
+    logger.info("=" * 78)
+    for cpus in budgets:
+        sklearn_s = run_sklearn(X, y, args.folds, cpus)
+        sequential_s, _, _ = run_scheduler(X, y, args.folds, cpus, threads_per_fold=cpus)
+        scheduled_s, workers, nthread = run_scheduler(X, y, args.folds, cpus)
+        logger.info(f"{cpus:>8}{sklearn_s:>14.2f}{sequential_s:>16.2f}{scheduled_s:>14.2f}"
+                    f"{f'{workers}x{nthread}':>12}{sklearn_s / scheduled_s:>11.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""
+Benchmark das consultas de anúncios: pandas vs arrays mapeados vs SQLite
+
+Gera um CSV sintético grande, grava o snapshot (ver listings_snapshot), o
+armazenamento em arrays (ver listing_store) e o banco SQLite (ver
+listing_db), e mede as consultas de /data/properties em cada backend:
+
+    - dataframe: DataFrame em memória filtrado com o pandas (caminho antigo)
+    - memmap: ListingStore, arrays mapeados em memória
+    - sqlite: ListingDB, consultas parametrizadas sobre os índices
+
+Para cada consulta, mede a primeira página e uma página profunda (metade dos
+anúncios filtrados), pedida por offset e pelo cursor `after` (o pandas só
+pagina por offset). Mostra também o tempo de build e o tamanho dos arquivos.
+
+Uso:
+    python benchmarks/bench_listing_db.py [--rows 1000000] [--repeat 5]
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+import warnings
+from pathlib import Path
+
+SRC_DIR = Path(__file__).parent.parent / "src"
+
+# Adicionar src ao path
+sys.path.insert(0, str(SRC_DIR))
+
+import logging
+
+from bench_out_of_core import generate_csv
+from bench_listing_store import query_dataframe
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('dataframe', 'memmap', 'sqlite')
+
+# Consultas medidas (filtros de /data/properties)
+QUERIES = {
+    'todos': {},
+    'bairro+preço': {'neighborhood': 'asa', 'min_area': 50.0, 'max_price': 3000.0},
+    'tipo+quartos': {'property_type': 'casa', 'min_bedrooms': 3},
+    'área': {'max_area': 40.0},
+    'seletiva': {'neighborhood': 'lago', 'property_type': 'casa', 'max_price': 4000.0}
+}
+
+# Anúncios por página
+PAGE_SIZE = 100
+
+
+def best_time(function, repeat: int) -> float:
+    """Menor tempo (ms) de `repeat` execuções"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append((time.perf_counter() - start) * 1000)
+    return min(times)
+
+
+def main():
+    """Executa o benchmark"""
+    parser = argparse.ArgumentParser(description="Benchmark das consultas de anúncios por backend")
+    parser.add_argument('--rows', type=int, default=1_000_000, help="Linhas do CSV sintético")
+    parser.add_argument('--repeat', type=int, default=5, help="Execuções por medição (vale a menor)")
+    args = parser.parse_args()
+
+    import listings_snapshot
+    import listing_store
+    import listing_db
+
+    warnings.simplefilter('ignore')
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {'csv': Path(tmp) / "imoveis.csv", 'snapshot': Path(tmp) / "listings.npz",
+                 'memmap': Path(tmp) / "listings_store.npz", 'sqlite': Path(tmp) / "listings.db"}
+        generate_csv(paths['csv'], args.rows)
+        logging.disable(logging.INFO)
+        listings_snapshot.build(paths['csv'], paths['snapshot'])
+        frame = listings_snapshot.load(paths['snapshot'], mmap=False)
+        builds = {}
+        for name, module in (('memmap', listing_store), ('sqlite', listing_db)):
+            start = time.perf_counter()
+            module.build(frame, paths[name], source=paths['snapshot'])
+            builds[name] = time.perf_counter() - start
+        logging.disable(logging.NOTSET)
+        for name, seconds in builds.items():
+            logger.info(f"Build {name}: {seconds:.2f}s, {paths[name].stat().st_size / 1024 ** 2:.1f} MB")
+
+        backends = {
+            'dataframe': lambda filters, offset, limit, after=None: query_dataframe(frame, filters, offset, limit),
+            'memmap': listing_store.ListingStore.open(paths['memmap']).query,
+            'sqlite': listing_db.ListingDB(paths['sqlite']).query
+        }
+
+        logger.info("=" * 78)
+        logger.info(f"{'consulta':>14}{'backend':>11}{'total':>9}{'página 1 (ms)':>15}"
+                    f"{'offset (ms)':>13}{'after (ms)':>12}")
+        logger.info("=" * 78)
+        for label, filters in QUERIES.items():
+            # Cursor da página profunda: id do anúncio anterior à metade
+            total, _ = backends['memmap'](filters, 0, 0)
+            middle = max(total // 2 - 1, 0)
+            _, previous = backends['memmap'](filters, middle, 1)
+            after = previous[0]['id'] if previous else None
+            pages = {}
+            for name in BACKENDS:
+                query = backends[name]
+                first = best_time(lambda: query(filters, 0, PAGE_SIZE), args.repeat)
+                deep = best_time(lambda: query(filters, middle + 1, PAGE_SIZE), args.repeat)
+                if name == 'dataframe':
+                    cursor = float('nan')
+                else:
+                    cursor = best_time(lambda: query(filters, 0, PAGE_SIZE, after=after), args.repeat)
+                    pages[name] = [row['id'] for row in query(filters, 0, PAGE_SIZE, after=after)[1]]
+                count = query(filters, 0, 0)[0]
+                logger.info(f"{label:>14}{name:>11}{count:>9}{first:>15.1f}{deep:>13.1f}{cursor:>12.1f}")
+            if len({tuple(ids) for ids in pages.values()}) != 1:
+                logger.warning(f"Backends com páginas diferentes em {label}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
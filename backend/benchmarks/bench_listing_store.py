@@ -0,0 +1,165 @@
+"""
+Benchmark de memória dos workers da API nas consultas de anúncios
+
+Gera um CSV sintético grande, grava o snapshot e o armazenamento dos
+anúncios (ver listings_snapshot e listing_store) e inicia N workers
+simultâneos, cada um atendendo as mesmas consultas de /data/properties com
+um de dois modos:
+
+    - dataframe: cada worker mantém os anúncios em um DataFrame próprio e
+      filtra com o pandas
+    - memmap: cada worker mapeia o armazenamento somente leitura e filtra
+      os arrays em blocos (ListingStore)
+
+Com todos os workers vivos, mede a memória de cada um em /proc/<pid>/smaps_rollup:
+RSS, PSS (páginas compartilhadas divididas entre os processos que as usam)
+e memória privada. Só funciona no Linux.
+
+Uso:
+    python benchmarks/bench_listing_store.py [--rows 1000000] [--workers 4]
+"""
+
+import argparse
+import multiprocessing
+import sys
+import tempfile
+import time
+import warnings
+from pathlib import Path
+
+SRC_DIR = Path(__file__).parent.parent / "src"
+MODELS_DIR = Path(__file__).parent.parent / "models"
+
+# Adicionar src ao path
+sys.path.insert(0, str(SRC_DIR))
+
+import logging
+
+from bench_out_of_core import generate_csv
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+MODES = ('dataframe', 'memmap')
+
+# Consultas atendidas por cada worker (filtros, offset, limit)
+QUERIES = [
+    ({}, 0, 1000),
+    ({'neighborhood': 'asa', 'min_area': 50.0, 'max_price': 3000.0}, 0, 100),
+    ({'property_type': 'casa', 'min_bedrooms': 3}, 200, 50),
+    ({'max_area': 40.0}, 5000, 100)
+]
+
+
+def memory_mb() -> dict:
+    """RSS, PSS e memória privada do processo atual (smaps_rollup)"""
+    fields = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    return {
+        'rss': fields['Rss'],
+        'pss': fields['Pss'],
+        'private': fields['Private_Clean'] + fields['Private_Dirty']
+    }
+
+
+def query_dataframe(frame, filters: dict, offset: int, limit: int) -> tuple:
+    """Consulta com o pandas (filtros de /data/properties sobre um DataFrame)"""
+    mask = None
+    for name in ('property_type', 'neighborhood'):
+        if name in filters:
+            condition = frame[name].str.contains(filters[name], case=False, na=False)
+            mask = condition if mask is None else mask & condition
+    for name, (field, op) in {'min_area': ('area', 'ge'), 'max_area': ('area', 'le'),
+                              'min_bedrooms': ('bedrooms', 'ge'), 'max_bedrooms': ('bedrooms', 'le'),
+                              'min_price': ('rent_amount', 'ge'), 'max_price': ('rent_amount', 'le')}.items():
+        if name in filters:
+            condition = getattr(frame[field], op)(filters[name])
+            mask = condition if mask is None else mask & condition
+    selected = frame if mask is None else frame[mask]
+    return len(selected), selected.iloc[offset:offset + limit].reset_index().to_dict('records')
+
+
+def worker(mode: str, paths: dict, loaded, measured, results):
+    """Worker da API: carrega os anúncios, atende as consultas e mede a memória"""
+    logging.disable(logging.WARNING)
+    warnings.simplefilter('ignore')
+    start = time.perf_counter()
+    # Cada modo importa só o que usa (o memmap não importa o pandas)
+    if mode == 'dataframe':
+        import listings_snapshot
+        frame = listings_snapshot.load(paths['snapshot'], mmap=False)
+        run = lambda filters, offset, limit: query_dataframe(frame, filters, offset, limit)
+    else:
+        import listing_store
+        store = listing_store.ListingStore.open(paths['store'])
+        run = store.query
+    totals = [run(filters, offset, limit)[0] for filters, offset, limit in QUERIES]
+    elapsed = time.perf_counter() - start
+    # Mede com todos os workers vivos (páginas compartilhadas entre eles)
+    loaded.wait()
+    results.put({'totals': totals, 'wall_s': elapsed, **memory_mb()})
+    measured.wait()
+
+
+def measure(mode: str, paths: dict, n_workers: int) -> list:
+    """Inicia os workers simultâneos de um modo e coleta as medições"""
+    context = multiprocessing.get_context('spawn')
+    loaded, measured = context.Barrier(n_workers), context.Barrier(n_workers + 1)
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(mode, paths, loaded, measured, results))
+                 for _ in range(n_workers)]
+    for process in processes:
+        process.start()
+    rows = [results.get() for _ in processes]
+    measured.wait()
+    for process in processes:
+        process.join()
+    return rows
+
+
+def main():
+    """Executa o benchmark"""
+    parser = argparse.ArgumentParser(description="Benchmark de memória dos workers nas consultas de anúncios")
+    parser.add_argument('--rows', type=int, default=1_000_000, help="Linhas do CSV sintético")
+    parser.add_argument('--workers', type=int, default=4, help="Workers simultâneos")
+    args = parser.parse_args()
+
+    import listings_snapshot
+    import listing_store
+    from model_pool import ModelPool
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {'csv': Path(tmp) / "imoveis.csv", 'snapshot': Path(tmp) / "listings.npz",
+                 'store': Path(tmp) / "listings_store.npz"}
+        generate_csv(paths['csv'], args.rows)
+        logging.disable(logging.INFO)
+        listings_snapshot.build(paths['csv'], paths['snapshot'])
+        bundle = ModelPool(MODELS_DIR, max_size=1).get() if MODELS_DIR.exists() else None
+        listing_store.build(listings_snapshot.load(paths['snapshot']), paths['store'], bundle=bundle,
+                            source=paths['snapshot'])
+        logging.disable(logging.NOTSET)
+        logger.info(f"Snapshot: {paths['snapshot'].stat().st_size / 1024 ** 2:.1f} MB, "
+                    f"armazenamento: {paths['store'].stat().st_size / 1024 ** 2:.1f} MB")
+
+        logger.info("=" * 78)
+        logger.info(f"{'modo':>10}{'workers':>9}{'RSS/worker':>12}{'PSS/worker':>12}{'privada/worker':>16}"
+                    f"{'PSS total':>11}{'tempo (s)':>10}")
+        logger.info("=" * 78)
+        totals = {}
+        for mode in MODES:
+            rows = measure(mode, {name: str(path) for name, path in paths.items()}, args.workers)
+            totals[mode] = rows[0]['totals']
+            mean = lambda key: sum(row[key] for row in rows) / len(rows)
+            logger.info(f"{mode:>10}{args.workers:>9}{mean('rss'):>12.0f}{mean('pss'):>12.0f}{mean('private'):>16.0f}"
+                        f"{sum(row['pss'] for row in rows):>11.0f}{mean('wall_s'):>10.2f}")
+        if totals['dataframe'] != totals['memmap']:
+            logger.warning(f"Modos com resultados diferentes: {totals}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""
+Benchmark de memória do carregamento tipado do DataProcessor
+
+Gera CSVs sintéticos grandes nos dois formatos aceitos pelo pipeline:
+
+    - imoveis: o formato do imoveis-df.csv (5 colunas)
+    - zap: o formato antigo do dataZAP.csv, com as colunas `listing.*` usadas
+      pelo pipeline e dezenas de outras (textos, URLs, datas) descartadas
+      por select_features
+
+e, para cada um, executa `DataProcessor.process` em um subprocesso novo
+com dois carregadores:
+
+    - sem-tipos: `pd.read_csv(..., low_memory=False)` com todas as colunas
+      (carregamento anterior)
+    - tipado: `DataProcessor.read_csv` (só as colunas usadas, texto como
+      categoria, numéricos reduzidos)
+
+Mostra a memória do DataFrame após o carregamento, o pico de memória
+residente (ru_maxrss) do subprocesso e o tempo.
+
+Uso:
+    python benchmarks/bench_load_memory.py [--rows 1000000] [--formats imoveis,zap]
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+SRC_DIR = Path(__file__).parent.parent / "src"
+DATA_PATH = Path(__file__).parent.parent.parent / "data" / "imoveis-df.csv"
+
+# Adicionar src ao path
+sys.path.insert(0, str(SRC_DIR))
+
+import logging
+
+from bench_out_of_core import generate_csv as generate_imoveis_csv
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+LOADERS = ('sem-tipos', 'tipado')
+FORMATS = ('imoveis', 'zap')
+
+# Colunas extras do formato antigo (não usadas pelo pipeline)
+ZAP_EXTRA_TEXT = ['listing.title', 'listing.description', 'listing.address.street',
+                  'listing.address.zipCode', 'listing.link.href', 'listing.images',
+                  'listing.createdAt', 'listing.updatedAt', 'listing.publisherId',
+                  'listing.portal', 'listing.advertiserContact', 'listing.status']
+ZAP_EXTRA_NUMERIC = [f'listing.extra{i}' for i in range(20)]
+
+
+def generate_zap_csv(path: Path, n_rows: int, block_rows: int = 100_000, seed: int = 42):
+    """Grava um CSV sintético no formato do dataZAP.csv, em blocos"""
+    base = pd.read_csv(DATA_PATH, sep=';', low_memory=False)
+    base['area'] = pd.to_numeric(base['area'].astype(str).str.replace(',', '.', regex=False), errors='coerce')
+    rng = np.random.default_rng(seed)
+    written = 0
+    with open(path, 'w') as f:
+        while written < n_rows:
+            size = min(block_rows, n_rows - written)
+            rows = base.iloc[rng.integers(0, len(base), size)].reset_index(drop=True)
+            ids = np.arange(written, written + size).astype(str)
+            block = pd.DataFrame({
+                'listing.pricingInfo.isRent': rng.random(size) < 0.7,
+                'listing.pricingInfo.rentalPrice': (rows['preco'] * (1 + 0.05 * rng.standard_normal(size))).round(),
+                'listing.usableAreas': rows['area'].round(),
+                'listing.bedrooms': rows['quartos'],
+                'listing.bathrooms': rng.integers(1, 4, size),
+                'listing.parkingSpaces': rng.integers(0, 3, size),
+                'listing.address.city': 'Brasília',
+                'listing.address.neighborhood': rows['bairro'],
+                'listing.address.state': 'Distrito Federal',
+                'listing.furnished': rng.integers(0, 2, size),
+                'listing.pricingInfo.monthlyCondoFee': rng.integers(0, 1500, size),
+                'listing.propertyType': rows['tipo'],
+                'listing.suites': rng.integers(0, 3, size)
+            })
+            for col in ZAP_EXTRA_TEXT:
+                block[col] = col.split('.')[-1] + '-' + pd.Series(ids) + ' ' + rows['bairro']
+            for col in ZAP_EXTRA_NUMERIC:
+                block[col] = rng.random(size)
+            block.to_csv(f, sep=';', index=False, header=written == 0)
+            written += size
+
+
+def run(loader: str, csv_path: str) -> dict:
+    """Processa o CSV com um carregador e mede memória e tempo (executado no subprocesso)"""
+    from data_processing import DataProcessor
+    import out_of_core
+
+    logging.disable(logging.WARNING)
+    warnings.simplefilter('ignore')
+    start = time.perf_counter()
+    processor = DataProcessor(csv_path)
+    if loader == 'sem-tipos':
+        processor.read_csv = lambda path, chunk_rows=None: pd.read_csv(path, sep=';', low_memory=False)
+    processor.process()
+    return {
+        'wall_s': time.perf_counter() - start,
+        'load_mb': processor.stage_report[0]['memory_mb'],
+        'peak_rss_mb': out_of_core.peak_rss_mb(),
+        'rows': len(processor.processed_df)
+    }
+
+
+def measure(loader: str, csv_path: Path) -> dict:
+    """Executa um carregador em um subprocesso novo (pico de memória isolado)"""
+    output = subprocess.run(
+        [sys.executable, __file__, '--run', loader, '--csv', str(csv_path)],
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    """Executa o benchmark"""
+    parser = argparse.ArgumentParser(description="Benchmark de memória do carregamento tipado")
+    parser.add_argument('--rows', default='1000000', help="Linhas dos CSVs sintéticos")
+    parser.add_argument('--formats', default=','.join(FORMATS), help="Formatos de CSV medidos")
+    parser.add_argument('--run', choices=LOADERS, help=argparse.SUPPRESS)
+    parser.add_argument('--csv', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run(args.run, args.csv)))
+        return 0
+
+    generators = {'imoveis': generate_imoveis_csv, 'zap': generate_zap_csv}
+    logger.info("=" * 78)
+    logger.info(f"{'linhas':>10}{'formato':>9}{'CSV (MB)':>10}{'carregador':>12}"
+                f"{'carregado (MB)':>16}{'pico (MB)':>11}{'tempo (s)':>10}")
+    logger.info("=" * 78)
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_rows in (int(r) for r in args.rows.split(',')):
+            for fmt in args.formats.split(','):
+                csv_path = Path(tmp) / f"{fmt}_{n_rows}.csv"
+                generators[fmt](csv_path, n_rows)
+                size_mb = csv_path.stat().st_size / 1024 ** 2
+                results = {loader: measure(loader, csv_path) for loader in LOADERS}
+                if len({result['rows'] for result in results.values()}) != 1:
+                    logger.warning(f"Carregadores com resultados diferentes: {results}")
+                for loader, result in results.items():
+                    logger.info(f"{n_rows:>10}{fmt:>9}{size_mb:>10.1f}{loader:>12}{result['load_mb']:>16.0f}"
+                                f"{result['peak_rss_mb']:>11.0f}{result['wall_s']:>10.2f}")
+                csv_path.unlink()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
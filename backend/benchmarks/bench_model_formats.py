@@ -0,0 +1,127 @@
+"""
+Benchmark de carregamento a frio: pickle vs formatos nativos (.ubj/.npz)
+
+Cada medição roda em um processo Python novo e reporta separadamente o
+tempo de importar numpy/xgboost (comum aos dois formatos), o tempo de
+carregar os artefatos e a memória residente (RSS) após a carga.
+
+Uso:
+    python benchmarks/bench_model_formats.py [--repeats 5]
+"""
+
+import argparse
+import json
+import pickle
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+SRC_DIR = Path(__file__).parent.parent / "src"
+MODELS_DIR = Path(__file__).parent.parent / "models"
+
+# Adicionar src ao path
+sys.path.insert(0, str(SRC_DIR))
+
+import model_io
+from model_registry import ModelRegistry
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Script executado em cada processo filho
+CHILD_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {src_dir!r})
+import model_io
+import xgboost
+imported = time.perf_counter()
+fmt, model_path, scaler_path, encoding_path = sys.argv[1:5]
+model = model_io.load_model(model_path)
+scaler = model_io.load_scaler_artifact(scaler_path)
+encoding = model_io.load_encoding_artifact(encoding_path)
+elapsed = time.perf_counter() - imported
+rss_kb = 0
+with open('/proc/self/status') as f:
+    for line in f:
+        if line.startswith('VmRSS:'):
+            rss_kb = int(line.split()[1])
+print(json.dumps({{'import_s': imported - start, 'load_s': elapsed, 'rss_mb': rss_kb / 1024,
+                   'sklearn_imported': 'sklearn' in sys.modules}}))
+"""
+
+
+def prepare_artifacts(tmp_dir: Path) -> dict:
+    """Gera os artefatos da versão atual nos dois formatos"""
+    artifacts = ModelRegistry(MODELS_DIR).resolve()
+    model = model_io.load_model(artifacts['model'])
+    scaler = model_io.load_scaler_artifact(artifacts['scaler'], mmap=False)
+    if isinstance(scaler, model_io.ArrayScaler):
+        scaler = scaler.to_sklearn()
+    encoding = model_io.load_encoding_artifact(artifacts['encoding'], mmap=False)
+
+    paths = {
+        'pickle': (tmp_dir / "model.pkl", tmp_dir / "scaler.pkl", tmp_dir / "encoding.json"),
+        'native': (tmp_dir / "model.ubj", tmp_dir / "scaler.npz", tmp_dir / "encoding.npz")
+    }
+
+    with open(paths['pickle'][0], 'wb') as f:
+        pickle.dump(model, f)
+    with open(paths['pickle'][1], 'wb') as f:
+        pickle.dump(scaler, f)
+    with open(paths['pickle'][2], 'w', encoding='utf-8') as f:
+        json.dump(encoding, f, ensure_ascii=False)
+
+    model_io.save_model(model, paths['native'][0])
+    model_io.save_scaler(scaler, paths['native'][1])
+    model_io.save_encoding(encoding, paths['native'][2])
+    return paths
+
+
+def measure(fmt: str, paths: tuple, repeats: int) -> dict:
+    """Mede o carregamento em processos novos"""
+    script = CHILD_SCRIPT.format(src_dir=str(SRC_DIR))
+    runs = []
+    for _ in range(repeats):
+        output = subprocess.check_output(
+            [sys.executable, '-W', 'ignore', '-c', script, fmt] + [str(p) for p in paths]
+        )
+        runs.append(json.loads(output.decode().strip().splitlines()[-1]))
+    return {
+        'import_s': statistics.median(r['import_s'] for r in runs),
+        'load_s': statistics.median(r['load_s'] for r in runs),
+        'rss_mb': statistics.median(r['rss_mb'] for r in runs),
+        'size_kb': sum(p.stat().st_size for p in paths) / 1024,
+        'sklearn_imported': runs[-1]['sklearn_imported']
+    }
+
+
+def main():
+    """Executa o benchmark"""
+    parser = argparse.ArgumentParser(description="Benchmark de formatos dos artefatos do modelo")
+    parser.add_argument('--repeats', type=int, default=5, help="Execuções por formato")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = prepare_artifacts(Path(tmp))
+        results = {fmt: measure(fmt, p, args.repeats) for fmt, p in paths.items()}
+
+    logger.info("=" * 60)
+    logger.info("CARREGAMENTO A FRIO (mediana de %d processos)", args.repeats)
+    logger.info("=" * 60)
+    logger.info(f"{'formato':<10}{'import (ms)':>12}{'carga (ms)':>12}{'RSS (MB)':>12}{'disco (KB)':>12}{'sklearn':>10}")
+    for fmt, r in results.items():
+        logger.info(f"{fmt:<10}{r['import_s'] * 1000:>12.1f}{r['load_s'] * 1000:>12.1f}{r['rss_mb']:>12.1f}"
+                    f"{r['size_kb']:>12.1f}{str(r['sklearn_imported']):>10}")
+
+    speedup = results['pickle']['load_s'] / results['native']['load_s']
+    logger.info(f"Formato nativo: {speedup:.2f}x mais rápido, "
+                f"{results['pickle']['rss_mb'] - results['native']['rss_mb']:.1f} MB a menos de RSS")
+    return results
+
+
+if __name__ == "__main__":
+    main()
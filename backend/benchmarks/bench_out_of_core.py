@@ -0,0 +1,135 @@
+"""
+Benchmark de memória do treino em memória vs out-of-core
+
+Gera CSVs sintéticos no formato do imoveis-df.csv (linhas reais sorteadas,
+com ruído no preço e na área) com número crescente de linhas e, para cada
+um, treina em um subprocesso novo:
+
+    - memória: pipeline atual (DataProcessor.process + prepare_data + train)
+    - out-of-core: estatísticas do pipeline acumuladas em blocos, CSV
+      relido em blocos, QuantileDMatrix alimentada por iterador
+    - memória externa: idem, com as páginas quantizadas em disco
+
+O pico de memória residente (ru_maxrss) de cada subprocesso mostra como a
+memória cresce com o número de linhas em cada modo.
+
+Uso:
+    python benchmarks/bench_out_of_core.py [--rows 100000,300000,1000000] [--chunk-rows 100000]
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+SRC_DIR = Path(__file__).parent.parent / "src"
+DATA_PATH = Path(__file__).parent.parent.parent / "data" / "imoveis-df.csv"
+
+# Adicionar src ao path
+sys.path.insert(0, str(SRC_DIR))
+
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+MODES = ('memoria', 'out-of-core', 'memoria-externa')
+
+
+def generate_csv(path: Path, n_rows: int, block_rows: int = 100_000, seed: int = 42):
+    """Grava um CSV sintético de `n_rows` linhas, em blocos (memória limitada)"""
+    base = pd.read_csv(DATA_PATH, sep=';', low_memory=False)
+    base['area'] = pd.to_numeric(base['area'].astype(str).str.replace(',', '.', regex=False), errors='coerce')
+    rng = np.random.default_rng(seed)
+    written = 0
+    with open(path, 'w') as f:
+        while written < n_rows:
+            size = min(block_rows, n_rows - written)
+            block = base.iloc[rng.integers(0, len(base), size)].copy()
+            noise = 1 + 0.05 * rng.standard_normal(size)
+            block['preco'] = (block['preco'] * noise).round()
+            block['area'] = (block['area'] * (1 + 0.05 * rng.standard_normal(size))).round(1)
+            block.to_csv(f, sep=';', index=False, header=written == 0)
+            written += size
+
+
+def run(mode: str, csv_path: str, chunk_rows: int) -> dict:
+    """Treina em um modo e mede tempo e pico de memória (executado no subprocesso)"""
+    from data_processing import DataProcessor
+    from model_trainer import ModelTrainer
+    import out_of_core
+
+    logging.disable(logging.WARNING)
+    warnings.simplefilter('ignore')
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as models_dir:
+        trainer = ModelTrainer(model_dir=models_dir)
+        processor = DataProcessor(csv_path)
+        if mode == 'memoria':
+            processor.process()
+            X, y = processor.get_features_and_target()
+            X_train, X_val, X_test, y_train, y_val, y_test = trainer.prepare_data(X, y)
+            del X, y
+            trainer.train(X_train, y_train, X_val, y_val)
+            trainer.evaluate(X_test, y_test)
+        else:
+            processor.fit_streaming(chunk_rows=chunk_rows)
+            trainer.train_out_of_core(processor, chunk_rows=chunk_rows,
+                                      external_memory=mode == 'memoria-externa')
+    return {
+        'wall_s': time.perf_counter() - start,
+        'peak_rss_mb': out_of_core.peak_rss_mb(),
+        'MAE': trainer.metrics['MAE']
+    }
+
+
+def measure(mode: str, csv_path: Path, chunk_rows: int) -> dict:
+    """Executa um modo em um subprocesso novo (pico de memória isolado)"""
+    output = subprocess.run(
+        [sys.executable, __file__, '--run', mode, '--csv', str(csv_path), '--chunk-rows', str(chunk_rows)],
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    """Executa o benchmark"""
+    parser = argparse.ArgumentParser(description="Benchmark de memória do treino out-of-core")
+    parser.add_argument('--rows', default='100000,300000,1000000', help="Linhas dos CSVs sintéticos")
+    parser.add_argument('--chunk-rows', type=int, default=100_000, help="Linhas por bloco")
+    parser.add_argument('--modes', default=','.join(MODES), help="Modos medidos")
+    parser.add_argument('--run', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--csv', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run(args.run, args.csv, args.chunk_rows)))
+        return 0
+
+    modes = args.modes.split(',')
+    logger.info(f"Blocos de {args.chunk_rows} linhas")
+    logger.info("=" * 72)
+    logger.info(f"{'linhas':>10}{'CSV (MB)':>10}{'modo':>18}{'tempo (s)':>12}{'pico (MB)':>12}{'MAE (R$)':>10}")
+    logger.info("=" * 72)
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_rows in (int(r) for r in args.rows.split(',')):
+            csv_path = Path(tmp) / f"imoveis_{n_rows}.csv"
+            generate_csv(csv_path, n_rows)
+            size_mb = csv_path.stat().st_size / 1024 ** 2
+            for mode in modes:
+                result = measure(mode, csv_path, args.chunk_rows)
+                logger.info(f"{n_rows:>10}{size_mb:>10.1f}{mode:>18}{result['wall_s']:>12.2f}"
+                            f"{result['peak_rss_mb']:>12.0f}{result['MAE']:>10.2f}")
+            csv_path.unlink()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""
+Benchmark de latência de predição por tamanho de lote
+
+Compara, para a versão atual do modelo:
+    - DMatrix: `Booster.predict` com DMatrix (o caminho do XGBRegressor.predict)
+    - inplace: `Booster.inplace_predict` sobre array float32 contíguo
+    - compilado: ensemble em arrays NumPy (tree_compiler)
+    - auto: escolha do BoosterRegressor após a calibração
+    - onnx: modelo ONNX com o scaler incorporado, no onnxruntime (se instalado)
+
+Antes de medir, confere que os três caminhos do XGBoost produzem exatamente
+as mesmas predições e que o ONNX fica dentro da tolerância. Ao final, mede a
+memória residente (RSS) de um processo novo com cada backend carregado.
+
+Uso:
+    python benchmarks/bench_serving.py [--batch-sizes 1,8,64,512,4096] [--repeats 50] [--nthread 1]
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+SRC_DIR = Path(__file__).parent.parent / "src"
+MODELS_DIR = Path(__file__).parent.parent / "models"
+
+# Adicionar src ao path
+sys.path.insert(0, str(SRC_DIR))
+
+from model_pool import ModelPool
+import onnx_backend
+from warmup import synthetic_requests
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Script executado em processo novo para medir a memória de cada backend
+MEMORY_SCRIPT = """
+import json, logging, sys
+logging.disable(logging.CRITICAL)
+sys.path.insert(0, {src_dir!r})
+import model_io
+model_io.import_xgboost(lean=True)
+from model_pool import ModelPool
+bundle = ModelPool({models_dir!r}, compile_trees=True, backend=sys.argv[1]).get()
+rss_kb = 0
+with open('/proc/self/status') as f:
+    for line in f:
+        if line.startswith('VmRSS:'):
+            rss_kb = int(line.split()[1])
+print(json.dumps({{'backend': bundle.backend, 'rss_mb': rss_kb / 1024}}))
+"""
+
+
+def sample_features(bundle, n_rows: int, seed: int = 42) -> np.ndarray:
+    """
+    Gera linhas de features (sem normalização) a partir das requisições
+    sintéticas do warm-up, com área, quartos e condomínio perturbados
+    """
+    rng = np.random.default_rng(seed)
+    base = synthetic_requests(bundle, max_requests=200)
+    rows = []
+    for i in range(n_rows):
+        data = dict(base[i % len(base)])
+        data['area'] = float(rng.uniform(20, 400))
+        data['bedrooms'] = int(rng.integers(0, 6))
+        data['hoa'] = float(rng.uniform(0, 3000))
+        rows.append(bundle.feature_row(data))
+    return np.vstack(rows)
+
+
+def percentile_ms(predict, X: np.ndarray, repeats: int) -> tuple:
+    """Latência p50 e p99 (ms) de uma chamada de predição"""
+    predict(X)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predict(X)
+        timings.append(time.perf_counter() - start)
+    return np.percentile(timings, 50) * 1000, np.percentile(timings, 99) * 1000
+
+
+def measure_memory(backend: str) -> dict:
+    """Mede o RSS de um processo novo com o backend carregado"""
+    script = MEMORY_SCRIPT.format(src_dir=str(SRC_DIR), models_dir=str(MODELS_DIR))
+    output = subprocess.check_output([sys.executable, '-W', 'ignore', '-c', script, backend],
+                                     stderr=subprocess.DEVNULL)
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def main():
+    """Executa o benchmark"""
+    parser = argparse.ArgumentParser(description="Benchmark de latência de predição")
+    parser.add_argument('--batch-sizes', default='1,8,64,512,4096', help="Tamanhos de lote")
+    parser.add_argument('--repeats', type=int, default=50, help="Repetições por medição")
+    parser.add_argument('--nthread', type=int, default=1, help="Threads do XGBoost por predição")
+    args = parser.parse_args()
+    batch_sizes = [int(size) for size in args.batch_sizes.split(',')]
+
+    bundle = ModelPool(MODELS_DIR, compile_trees=True, predict_nthread=args.nthread).get()
+    model = bundle.model
+    if getattr(model, 'compiled', None) is None:
+        logger.error("O modelo atual não pôde ser compilado")
+        return 1
+
+    raw = sample_features(bundle, max(batch_sizes))
+    X = bundle.scaler.transform(raw)
+
+    # Paridade: in-place e compilado precisam reproduzir o XGBoost bit a bit
+    reference = model.predict_dmatrix(X)
+    mismatches = int(np.sum(model.predict_native(X) != reference)) + \
+        int(np.sum(model.compiled.predict(X) != reference))
+    logger.info(f"Paridade em {len(X)} linhas: {mismatches} divergências")
+    if mismatches:
+        return 1
+
+    onnx_model = None
+    if onnx_backend.runtime_available() and 'onnx' in bundle.artifact_hashes:
+        onnx_bundle = ModelPool(MODELS_DIR, predict_nthread=args.nthread, backend='onnx').get()
+        onnx_model = onnx_bundle.onnx_model
+    if onnx_model is not None:
+        onnx_diff = float(np.max(np.abs(onnx_model.predict(raw) - reference)))
+        logger.info(f"ONNX: diferença máxima para o XGBoost em {len(raw)} linhas: {onnx_diff:.6f}")
+    else:
+        logger.info("ONNX indisponível (onnxruntime ou artefato .onnx ausente), backend omitido")
+
+    crossover = model.calibrate(X[:64])
+    logger.info(f"Ponto de troca calibrado: lotes de até {crossover} linhas no compilado")
+
+    paths = {
+        'DMatrix': model.predict_dmatrix,
+        'inplace': model.predict_native,
+        'compilado': model.compiled.predict,
+        'auto': model.predict
+    }
+    if onnx_model is not None:
+        paths['onnx'] = onnx_model.predict
+    logger.info("=" * 96)
+    logger.info("Latência p50 / p99 (ms)")
+    logger.info(f"{'lote':>6}" + "".join(f"{name:>16}" for name in paths) + f"{'speedup':>10}")
+    logger.info("=" * 96)
+    for size in batch_sizes:
+        results = {}
+        for name, predict in paths.items():
+            # O ONNX recebe as features sem normalização (scaler no grafo)
+            batch = raw[:size] if name == 'onnx' else X[:size]
+            results[name] = percentile_ms(predict, batch, args.repeats)
+        cells = "".join(f"{p50:>8.3f}/{p99:<7.3f}" for p50, p99 in results.values())
+        speedup = results['DMatrix'][0] / results['auto'][0]
+        logger.info(f"{size:>6}  {cells}{speedup:>9.2f}x")
+
+    logger.info("=" * 96)
+    logger.info("Memória residente após a carga (processo novo)")
+    for backend in ['xgboost'] + (['onnx'] if onnx_model is not None else []):
+        memory = measure_memory(backend)
+        logger.info(f"{backend:<10}{memory['rss_mb']:>10.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
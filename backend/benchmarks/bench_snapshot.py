@@ -0,0 +1,131 @@
+"""
+Benchmark de carregamento: CSV vs snapshot colunar (ver listings_snapshot)
+
+Gera CSVs sintéticos grandes nos dois formatos aceitos pelo pipeline
+(imoveis e zap, os mesmos de bench_load_memory), grava o snapshot de cada um
+e mede, em um subprocesso novo, os dois leitores dos anúncios:
+
+    - treino: `DataProcessor.clean` (carregamento, filtro, seleção e tipos;
+      o início de `process`)
+    - api: os anúncios limpos de /data/properties (com o snapshot, só as
+      colunas usadas, mapeadas em memória)
+
+cada um a partir do CSV e a partir do snapshot. Mostra o tempo, o pico de
+memória residente (ru_maxrss) do subprocesso e o tamanho dos arquivos.
+
+Uso:
+    python benchmarks/bench_snapshot.py [--rows 1000000] [--formats imoveis,zap]
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from pathlib import Path
+
+SRC_DIR = Path(__file__).parent.parent / "src"
+
+# Adicionar src ao path
+sys.path.insert(0, str(SRC_DIR))
+
+import logging
+
+from bench_out_of_core import generate_csv as generate_imoveis_csv
+from bench_load_memory import generate_zap_csv
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+CONSUMERS = ('treino', 'api')
+SOURCES = ('csv', 'snapshot')
+FORMATS = ('imoveis', 'zap')
+
+# Colunas lidas por /data/properties (api/app.py, LISTING_COLUMNS)
+API_COLUMNS = ['property_type', 'neighborhood', 'area', 'bedrooms', 'bathrooms', 'parking_spaces',
+               'hoa', 'furnished', 'rent_amount', 'city']
+
+
+def run(consumer: str, path: str) -> dict:
+    """Lê os anúncios de um CSV ou snapshot e mede tempo e memória (executado no subprocesso)"""
+    from data_processing import DataProcessor
+    import listings_snapshot
+    import out_of_core
+
+    logging.disable(logging.WARNING)
+    warnings.simplefilter('ignore')
+    start = time.perf_counter()
+    if consumer == 'api' and listings_snapshot.is_snapshot(path):
+        frame = listings_snapshot.load(path, columns=API_COLUMNS)
+    else:
+        frame = DataProcessor(path).clean()
+    if consumer == 'api':
+        # Um filtro da API: lê os valores das colunas (páginas do arquivo mapeado)
+        rows = int((frame['rent_amount'] <= frame['rent_amount'].median()).sum())
+    else:
+        rows = len(frame)
+    return {
+        'wall_s': time.perf_counter() - start,
+        'peak_rss_mb': out_of_core.peak_rss_mb(),
+        'rows': rows
+    }
+
+
+def measure(consumer: str, path: Path) -> dict:
+    """Executa um leitor em um subprocesso novo (pico de memória isolado)"""
+    output = subprocess.run(
+        [sys.executable, __file__, '--run', consumer, '--path', str(path)],
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    """Executa o benchmark"""
+    parser = argparse.ArgumentParser(description="Benchmark de carregamento: CSV vs snapshot")
+    parser.add_argument('--rows', default='1000000', help="Linhas dos CSVs sintéticos")
+    parser.add_argument('--formats', default=','.join(FORMATS), help="Formatos de CSV medidos")
+    parser.add_argument('--run', choices=CONSUMERS, help=argparse.SUPPRESS)
+    parser.add_argument('--path', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run(args.run, args.path)))
+        return 0
+
+    import listings_snapshot
+
+    generators = {'imoveis': generate_imoveis_csv, 'zap': generate_zap_csv}
+    logger.info("=" * 74)
+    logger.info(f"{'linhas':>10}{'formato':>9}{'leitor':>8}{'origem':>10}{'arquivo (MB)':>14}"
+                f"{'pico (MB)':>11}{'tempo (s)':>12}")
+    logger.info("=" * 74)
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_rows in (int(r) for r in args.rows.split(',')):
+            for fmt in args.formats.split(','):
+                paths = {'csv': Path(tmp) / f"{fmt}_{n_rows}.csv", 'snapshot': Path(tmp) / f"{fmt}_{n_rows}.npz"}
+                generators[fmt](paths['csv'], n_rows)
+                logging.disable(logging.INFO)
+                start = time.perf_counter()
+                listings_snapshot.build(paths['csv'], paths['snapshot'])
+                build_s = time.perf_counter() - start
+                logging.disable(logging.NOTSET)
+                logger.info(f"{n_rows:>10}{fmt:>9}{'build':>8}{'':>10}"
+                            f"{paths['snapshot'].stat().st_size / 1024 ** 2:>14.1f}{'':>11}{build_s:>12.2f}")
+                for consumer in CONSUMERS:
+                    results = {source: measure(consumer, paths[source]) for source in SOURCES}
+                    if len({result['rows'] for result in results.values()}) != 1:
+                        logger.warning(f"Origens com resultados diferentes: {results}")
+                    for source, result in results.items():
+                        logger.info(f"{n_rows:>10}{fmt:>9}{consumer:>8}{source:>10}"
+                                    f"{paths[source].stat().st_size / 1024 ** 2:>14.1f}"
+                                    f"{result['peak_rss_mb']:>11.0f}{result['wall_s']:>12.3f}")
+                for path in paths.values():
+                    path.unlink()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""
+Script de build dos arquivos de anúncios
+
+Gera, a partir do CSV:
+
+    - o snapshot colunar (ver src/listings_snapshot.py): anúncios limpos com
+      o pipeline do treino, lidos pelo treino (train_model.py)
+    - o armazenamento das consultas da API (ver src/listing_store.py):
+      campos em arrays mapeáveis em memória, com o aluguel estimado pela
+      versão atual do modelo
+    - opcionalmente (--sqlite), o banco SQLite das consultas (ver
+      src/listing_db.py), para LISTINGS_BACKEND=sqlite
+
+Executar sempre que o CSV mudar ou outra versão do modelo for promovida
+(arquivos já atualizados não são regerados).
+
+Exemplos:
+    python build_dataset.py
+    python build_dataset.py --source ../data/dataZAP.csv --output ../data/listings.npz
+    python build_dataset.py --no-estimates   # Armazenamento sem a estimativa do modelo
+    python build_dataset.py --sqlite         # Gera também o banco SQLite
+    python build_dataset.py --check          # Só verifica se os arquivos estão atualizados
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# Adicionar src ao path
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from data_processing import DataProcessor
+from model_pool import ModelPool
+import listings_snapshot
+import listing_store
+import listing_db
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).parent.parent / "data"
+
+
+def default_source() -> Path:
+    """CSV de origem padrão: imoveis-df.csv, ou dataZAP.csv (formato antigo)"""
+    for name in ("imoveis-df.csv", "dataZAP.csv"):
+        if (DATA_DIR / name).exists():
+            return DATA_DIR / name
+    raise FileNotFoundError("Nenhum dataset encontrado. Verifique se imoveis-df.csv ou dataZAP.csv existe em data/")
+
+
+def open_model_pool(models_dir):
+    """Pool de modelos para as estimativas (None se não houver modelo treinado)"""
+    try:
+        return ModelPool(models_dir, max_size=1)
+    except FileNotFoundError as e:
+        logger.warning(f"{e} Armazenamento gerado sem estimativas.")
+        return None
+
+
+def main():
+    """Gera (ou verifica) o snapshot e o armazenamento dos anúncios"""
+    parser = argparse.ArgumentParser(description="Build do snapshot e do armazenamento dos anúncios")
+    parser.add_argument('--source', default=None, help="CSV de origem (padrão: data/imoveis-df.csv)")
+    parser.add_argument('--output', default=str(DATA_DIR / listings_snapshot.SNAPSHOT_NAME),
+                        help="Caminho do snapshot")
+    parser.add_argument('--store', default=str(DATA_DIR / listing_store.STORE_NAME),
+                        help="Caminho do armazenamento das consultas da API")
+    parser.add_argument('--sqlite', action='store_true',
+                        help="Gera também o banco SQLite das consultas (LISTINGS_BACKEND=sqlite)")
+    parser.add_argument('--db', default=str(DATA_DIR / listing_db.DB_NAME),
+                        help="Caminho do banco SQLite")
+    parser.add_argument('--models-dir', default=str(Path(__file__).parent / "models"),
+                        help="Diretório dos modelos (estimativa pela versão atual)")
+    parser.add_argument('--no-estimates', action='store_true',
+                        help="Não calcula a estimativa de aluguel do modelo")
+    parser.add_argument('--check', action='store_true',
+                        help="Só verifica se os arquivos estão atualizados (código 1 se não)")
+    args = parser.parse_args()
+
+    source = Path(args.source) if args.source else default_source()
+    pool = None if args.no_estimates else open_model_pool(args.models_dir)
+    model_version = None if pool is None else pool.default_version
+
+    snapshot_fresh = listings_snapshot.is_fresh(args.output, source, DataProcessor.PIPELINE_VERSION)
+    store_fresh = snapshot_fresh and listing_store.is_fresh(args.store, args.output, model_version)
+    db_fresh = not args.sqlite or (snapshot_fresh and listing_db.is_fresh(args.db, args.output, model_version))
+    if snapshot_fresh and store_fresh and db_fresh:
+        logger.info(f"Snapshot e armazenamento atualizados: {args.output}, {args.store}")
+        return 0
+    if args.check:
+        stale = [path for path, fresh in ((args.output, snapshot_fresh), (args.store, store_fresh),
+                                          (args.db, db_fresh)) if not fresh]
+        logger.info(f"Desatualizados ou ausentes: {stale}")
+        return 1
+
+    if not snapshot_fresh:
+        meta = listings_snapshot.build(source, args.output)
+        logger.info(f"Snapshot de {meta['source']}: {meta['rows']} anúncios, colunas {meta['columns']}")
+
+    bundle = None if pool is None else pool.get()
+    frame = listings_snapshot.load(args.output)
+    if not store_fresh:
+        listing_store.build(frame, args.store, bundle=bundle, source=args.output)
+    if not db_fresh:
+        listing_db.build(frame, args.db, bundle=bundle, source=args.output)
+    if bundle is not None:
+        logger.info(f"Estimativas de aluguel pela versão {bundle.version}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+"""
+Script de gerenciamento das versões do modelo (manifest.json)
+
+Exemplos:
+    python manage_models.py list
+    python manage_models.py set-current 20251209_202801
+    python manage_models.py prune --keep 3
+    python manage_models.py migrate
+    python manage_models.py convert
+    python manage_models.py export-onnx
+    python manage_models.py promote 20251209_202801
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# Adicionar src ao path
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from model_registry import ModelRegistry
+from model_backends import get_backend
+import model_io
+import onnx_backend
+import promotion
+import json
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def cmd_list(registry: ModelRegistry, args):
+    """Lista as versões registradas"""
+    for version in registry.versions():
+        entry = registry.get(version)
+        size_kb = sum(info['size'] for info in entry['artifacts'].values()) / 1024
+        marker = '*' if version == registry.current else ' '
+        print(f"{marker} {version}  {entry.get('created_at', '')}  {size_kb:.1f} KB")
+
+
+def cmd_set_current(registry: ModelRegistry, args):
+    """Promove uma versão a atual (sem passar pelo gate)"""
+    registry.verify(args.version)
+    registry.set_current(args.version)
+
+
+def cmd_promote(registry: ModelRegistry, args):
+    """Promove uma versão a atual passando pelo gate de latência e memória"""
+    budget = promotion.load_budget(args.budget)
+    if not promotion.promote(registry, args.version, budget, force=args.force):
+        sys.exit(1)
+
+
+def cmd_prune(registry: ModelRegistry, args):
+    """Remove versões antigas"""
+    removed = registry.prune(keep=args.keep, dry_run=args.dry_run)
+    action = "Seriam removidas" if args.dry_run else "Removidas"
+    logger.info(f"{action} {len(removed)} versões: {removed}")
+
+
+def cmd_verify(registry: ModelRegistry, args):
+    """Confere os artefatos de uma versão (ou de todas)"""
+    versions = [args.version] if args.version else registry.versions()
+    for version in versions:
+        registry.verify(version)
+        logger.info(f"Versão {version}: OK")
+
+
+def cmd_migrate(registry: ModelRegistry, args):
+    """Move os artefatos registrados para o armazenamento por conteúdo"""
+    removed = registry.migrate_to_objects()
+    logger.info(f"Artefatos migrados para objects/ ({removed} duplicados removidos)")
+
+
+def cmd_gc(registry: ModelRegistry, args):
+    """Remove objetos não referenciados por nenhuma versão"""
+    removed = registry.collect_garbage(dry_run=args.dry_run)
+    action = "Seriam removidos" if args.dry_run else "Removidos"
+    logger.info(f"{action} {len(removed)} objetos: {removed}")
+
+
+def load_backend(artifacts: dict, version: str):
+    """
+    Metadados e backend de modelo de uma versão
+
+    Returns:
+        (metadados, backend), com backend None se o nome registrado for
+        desconhecido
+    """
+    with open(artifacts['metadata'], 'r', encoding='utf-8') as f:
+        metadata = json.load(f)
+    name = metadata.get('backend', 'xgboost')
+    try:
+        return metadata, get_backend(name)
+    except ValueError as e:
+        logger.warning(f"Versão {version}: {e}")
+        return metadata, None
+
+
+def cmd_convert(registry: ModelRegistry, args):
+    """Converte versões em pickle para os formatos nativos (.ubj e .npz)"""
+    versions = [args.version] if args.version else registry.versions()
+    staging_dir = registry.model_dir / ".staging"
+    staging_dir.mkdir(exist_ok=True)
+
+    for version in versions:
+        artifacts = registry.resolve(version)
+        if artifacts['model'].suffix != '.pkl':
+            logger.info(f"Versão {version} já está no formato nativo")
+            continue
+
+        metadata, backend = load_backend(artifacts, version)
+        if backend is None or backend.model_format != model_io.MODEL_FORMAT_UBJ:
+            # Os backends do scikit-learn usam o pickle como formato próprio
+            logger.info(f"Versão {version} ignorada: backend {metadata.get('backend')} "
+                        f"não tem formato nativo além do pickle")
+            continue
+        metadata['model_format'] = model_io.MODEL_FORMAT_UBJ
+
+        converted = {
+            'model': staging_dir / f"model_{version}.ubj",
+            'scaler': staging_dir / f"scaler_{version}.npz",
+            'metadata': staging_dir / f"metadata_{version}.json"
+        }
+        model_io.save_model(model_io.load_model(artifacts['model']), converted['model'])
+        model_io.save_scaler(model_io.load_scaler_artifact(artifacts['scaler']), converted['scaler'])
+        with open(converted['metadata'], 'w') as f:
+            json.dump(metadata, f, indent=2)
+        if 'encoding' in artifacts:
+            converted['encoding'] = staging_dir / f"encoding_{version}.npz"
+            model_io.save_encoding(model_io.load_encoding_artifact(artifacts['encoding']), converted['encoding'])
+
+        entry = registry.get(version)
+        registry.register(version, converted, make_current=(version == registry.current),
+                          created_at=entry.get('created_at'))
+        logger.info(f"Versão {version} convertida para o formato nativo")
+
+    removed = registry.collect_garbage()
+    logger.info(f"{len(removed)} objetos antigos removidos")
+
+
+def cmd_export_onnx(registry: ModelRegistry, args):
+    """Exporta versões já registradas para ONNX (backend onnxruntime da API)"""
+    if not onnx_backend.export_available():
+        logger.error("onnx e onnxmltools são necessários: pip install onnx onnxmltools")
+        sys.exit(1)
+
+    versions = [args.version] if args.version else registry.versions()
+    staging_dir = registry.model_dir / ".staging"
+    staging_dir.mkdir(exist_ok=True)
+
+    for version in versions:
+        artifacts = registry.resolve(version)
+        if 'onnx' in artifacts:
+            logger.info(f"Versão {version} já possui modelo ONNX")
+            continue
+
+        metadata, backend = load_backend(artifacts, version)
+        if backend is None or not backend.supports_onnx:
+            logger.info(f"Versão {version} ignorada: backend {metadata.get('backend')} "
+                        f"não suporta exportação para ONNX")
+            continue
+
+        model = model_io.load_model(artifacts['model'])
+        scaler = model_io.load_scaler_artifact(artifacts['scaler'])
+        best_iteration = getattr(model, 'best_iteration', None)
+        iteration_range = (0, best_iteration + 1) if best_iteration is not None else (0, 0)
+
+        onnx_path = staging_dir / f"model_{version}.onnx"
+        onnx_backend.export_onnx(model.get_booster(), scaler, onnx_path, iteration_range)
+        registry.add_artifact(version, 'onnx', onnx_path)
+
+
+def cmd_rebuild(registry: ModelRegistry, args):
+    """Recria o manifest a partir dos arquivos existentes"""
+    versions = registry.rebuild_from_files()
+    logger.info(f"Manifest recriado com {len(versions)} versões. Atual: {registry.current}")
+
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(description="Gerenciamento das versões do modelo AlugAI")
+    parser.add_argument('--models-dir', default=str(Path(__file__).parent / "models"),
+                        help="Diretório dos modelos")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('list', help="Lista as versões registradas")
+
+    parser_current = subparsers.add_parser('set-current', help="Promove uma versão a atual")
+    parser_current.add_argument('version')
+
+    parser_promote = subparsers.add_parser('promote', help="Promove uma versão se passar pelo gate")
+    parser_promote.add_argument('version')
+    parser_promote.add_argument('--budget', default=str(Path(__file__).parent / "promotion_budget.json"),
+                                help="Orçamentos do gate de promoção")
+    parser_promote.add_argument('--force', action='store_true', help="Promove mesmo com violações")
+
+    parser_prune = subparsers.add_parser('prune', help="Remove versões antigas e seus artefatos")
+    parser_prune.add_argument('--keep', type=int, default=3, help="Versões mais recentes mantidas")
+    parser_prune.add_argument('--dry-run', action='store_true', help="Apenas lista o que seria removido")
+
+    parser_verify = subparsers.add_parser('verify', help="Confere hash e tamanho dos artefatos")
+    parser_verify.add_argument('version', nargs='?')
+
+    subparsers.add_parser('migrate', help="Move os artefatos para objects/ (endereçados por hash)")
+
+    parser_gc = subparsers.add_parser('gc', help="Remove objetos não referenciados")
+    parser_gc.add_argument('--dry-run', action='store_true', help="Apenas lista o que seria removido")
+
+    parser_convert = subparsers.add_parser('convert', help="Converte versões em pickle para .ubj/.npz")
+    parser_convert.add_argument('version', nargs='?')
+
+    parser_onnx = subparsers.add_parser('export-onnx', help="Exporta versões registradas para ONNX")
+    parser_onnx.add_argument('version', nargs='?')
+
+    subparsers.add_parser('rebuild', help="Recria o manifest a partir dos arquivos no formato antigo")
+
+    args = parser.parse_args()
+    registry = ModelRegistry(args.models_dir)
+
+    commands = {
+        'list': cmd_list,
+        'set-current': cmd_set_current,
+        'promote': cmd_promote,
+        'prune': cmd_prune,
+        'verify': cmd_verify,
+        'migrate': cmd_migrate,
+        'gc': cmd_gc,
+        'convert': cmd_convert,
+        'export-onnx': cmd_export_onnx,
+        'rebuild': cmd_rebuild
+    }
+    commands[args.command](registry, args)
+
+
+if __name__ == "__main__":
+    main()
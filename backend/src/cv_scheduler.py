@@ -0,0 +1,149 @@
+"""
+Módulo de validação cruzada do XGBoost com divisão explícita dos núcleos
+
+O `cross_val_score(..., n_jobs=-1)` sobre um XGBRegressor com `n_jobs=-1`
+abre um processo por fold e cada um tenta usar todos os núcleos: com N
+núcleos, são até N × N threads disputando a CPU. Aqui o orçamento de
+núcleos é dividido entre folds simultâneos (threads Python: o XGBoost
+libera o GIL durante o treino) e threads do XGBoost por fold, sem passar
+do orçamento.
+
+Os cortes da quantização (o "sketch" das features) são calculados uma única
+vez sobre todas as linhas e compartilhados pelas matrizes de todos os folds
+(`QuantileDMatrix(..., ref=...)`); cada fold só indexa suas linhas nos bins.
+"""
+
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def plan(cpus: int, folds: int, threads_per_fold: int = None) -> tuple:
+    """
+    Divide o orçamento de núcleos entre folds simultâneos e threads por fold
+
+    Por padrão prioriza os folds (paralelismo sem sincronização entre
+    threads, mais eficiente em conjuntos pequenos); os núcleos que sobram
+    viram threads do XGBoost.
+
+    Args:
+        cpus: Orçamento de núcleos
+        folds: Número de folds
+        threads_per_fold: Threads do XGBoost por fold (se None, calculado)
+
+    Returns:
+        (folds simultâneos, threads por fold)
+    """
+    cpus = max(1, cpus)
+    if threads_per_fold is None:
+        workers = min(folds, cpus)
+        threads_per_fold = max(1, cpus // workers)
+    else:
+        threads_per_fold = max(1, min(threads_per_fold, cpus))
+        workers = max(1, min(folds, cpus // threads_per_fold))
+    return workers, threads_per_fold
+
+
+def kfold_indices(n_rows: int, folds: int) -> list:
+    """Índices (treino, teste) dos folds, sem embaralhar (como o KFold padrão do cross_val_score)"""
+    # Mesma divisão do KFold: os primeiros folds recebem as linhas excedentes
+    sizes = np.full(folds, n_rows // folds)
+    sizes[:n_rows % folds] += 1
+    bounds = np.concatenate([[0], np.cumsum(sizes)])
+    rows = np.arange(n_rows)
+    return [(np.concatenate([rows[:start], rows[stop:]]), rows[start:stop])
+            for start, stop in zip(bounds[:-1], bounds[1:])]
+
+
+def booster_params(xgb_params: dict, nthread: int) -> tuple:
+    """
+    Converte os parâmetros do XGBRegressor para o `xgb.train`
+
+    Returns:
+        (parâmetros, rodadas de boosting)
+    """
+    params = dict(xgb_params)
+    rounds = params.pop('n_estimators', 100)
+    params.pop('n_jobs', None)
+    if 'random_state' in params:
+        params['seed'] = params.pop('random_state')
+    params['nthread'] = nthread
+    params.setdefault('tree_method', 'hist')
+    return params, rounds
+
+
+def cross_validate(xgb_params: dict, X, y, folds: int = 5, cpus: int = None,
+                   threads_per_fold: int = None, max_bin: int = 256) -> dict:
+    """
+    Validação cruzada k-fold do XGBoost dentro de um orçamento de núcleos
+
+    Args:
+        xgb_params: Parâmetros do XGBRegressor (sem early stopping)
+        X: Features
+        y: Target
+        folds: Número de folds
+        cpus: Orçamento de núcleos (se None, todos os da máquina)
+        threads_per_fold: Threads do XGBoost por fold (se None, ver `plan`)
+        max_bin: Bins da quantização
+
+    Returns:
+        Relatório: MAE médio e desvio, divisão dos núcleos e tempos por fold
+    """
+    import xgboost as xgb
+
+    cpus = cpus or os.cpu_count() or 1
+    workers, nthread = plan(cpus, folds, threads_per_fold)
+    params, rounds = booster_params(xgb_params, nthread)
+    params['max_bin'] = max_bin
+
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    y = np.asarray(y, dtype=np.float32)
+
+    start = time.perf_counter()
+    # Cortes calculados uma vez, com todos os núcleos do orçamento
+    reference = xgb.QuantileDMatrix(X, y, max_bin=max_bin, nthread=cpus)
+    sketch_s = time.perf_counter() - start
+
+    def run_fold(fold: int) -> dict:
+        train_idx, test_idx = splits[fold]
+        fold_start = time.perf_counter()
+        dtrain = xgb.QuantileDMatrix(X[train_idx], y[train_idx], ref=reference, nthread=nthread)
+        booster = xgb.train(params, dtrain, num_boost_round=rounds)
+        predictions = booster.inplace_predict(X[test_idx])
+        return {
+            'fold': fold,
+            'train_rows': int(len(train_idx)),
+            'test_rows': int(len(test_idx)),
+            'MAE': float(np.mean(np.abs(predictions - y[test_idx]))),
+            'wall_s': time.perf_counter() - fold_start
+        }
+
+    splits = kfold_indices(len(X), folds)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        fold_results = list(pool.map(run_fold, range(folds)))
+    wall_s = time.perf_counter() - start
+
+    maes = np.array([r['MAE'] for r in fold_results])
+    for r in fold_results:
+        logger.info(f"  fold {r['fold']}: MAE R$ {r['MAE']:.2f} em {r['wall_s']:.2f}s")
+    logger.info(f"Validação cruzada: {folds} folds, {workers} simultâneos x {nthread} threads "
+                f"(orçamento: {cpus} núcleos) em {wall_s:.2f}s")
+
+    return {
+        'folds': folds,
+        'cpus': cpus,
+        'workers': workers,
+        'threads_per_fold': nthread,
+        'rounds': rounds,
+        'sketch_s': sketch_s,
+        'wall_s': wall_s,
+        'MAE': float(maes.mean()),
+        'MAE_std': float(maes.std()),
+        'per_fold': fold_results
+    }
@@ -6,6 +6,13 @@ import pandas as pd
 import numpy as np
 from pathlib import Path
 import logging
+import resource
+import time
+
+from streaming_stats import GroupedGrid, NAN_INDEX, DEFAULT_ACCURACY, weighted_quantile
+import quantile_sketch
+import processing_cache
+import listings_snapshot
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -14,22 +21,229 @@ logger = logging.getLogger(__name__)
 class DataProcessor:
     """Classe para processamento de dados e feature engineering"""
     
-    def __init__(self, data_path: str):
+    # Colunas numéricas (convertidas e imputadas pela mediana) e categóricas
+    NUMERIC_COLUMNS = ['area', 'bedrooms', 'bathrooms', 'parking_spaces', 'hoa', 'suites', 'rent_amount']
+    CATEGORICAL_COLUMNS = ['city', 'neighborhood', 'state', 'property_type']
+    
+    # Bairros com menos exemplos que isso são agrupados em 'Outros'
+    MIN_NEIGHBORHOOD_COUNT = 10
+    
+    # Versão do pipeline: incrementar a cada mudança no resultado do
+    # processamento (invalida as entradas do cache, ver processing_cache)
+    PIPELINE_VERSION = 1
+    
+    # Colunas de cada formato de CSV (nome no arquivo -> nome no pipeline)
+    IMOVEIS_FEATURE_MAP = {
+        'preco': 'rent_amount',
+        'area': 'area',
+        'quartos': 'bedrooms',
+        'tipo': 'property_type',
+        'bairro': 'neighborhood'
+    }
+    ZAP_FEATURE_MAP = {
+        'listing.pricingInfo.rentalPrice': 'rent_amount',
+        'listing.usableAreas': 'area',
+        'listing.bedrooms': 'bedrooms',
+        'listing.bathrooms': 'bathrooms',
+        'listing.parkingSpaces': 'parking_spaces',
+        'listing.address.city': 'city',
+        'listing.address.neighborhood': 'neighborhood',
+        'listing.address.state': 'state',
+        'listing.furnished': 'furnished',
+        'listing.pricingInfo.monthlyCondoFee': 'hoa',
+        'listing.propertyType': 'property_type',
+        'listing.suites': 'suites'
+    }
+    # Colunas lidas só para o filtro de aluguel (formato dataZAP)
+    ZAP_FILTER_COLUMNS = ['listing.pricingInfo.isRent']
+    # Colunas de texto lidas como categoria (poucos valores distintos)
+    CATEGORY_SOURCE_COLUMNS = ['tipo', 'bairro', 'listing.address.city', 'listing.address.neighborhood',
+                               'listing.address.state', 'listing.propertyType']
+    
+    def __init__(self, data_path: str, extra_paths: list = None, quantile_accuracy: float = None,
+                 cache_dir: str = None):
         """
         Inicializa o processador de dados
         
         Args:
             data_path: Caminho para o arquivo CSV
+            extra_paths: CSVs adicionais no mesmo formato (ex: lotes novos de
+                anúncios), concatenados ao principal
+            quantile_accuracy: Erro de rank das medianas e quartis do IQR,
+                calculados com sketches KLL (ver quantile_sketch); se None,
+                quantis exatos
+            cache_dir: Diretório do cache de dados processados (ver
+                processing_cache); se None, `process` sempre reprocessa
         """
         self.data_path = data_path
+        self.extra_paths = list(extra_paths or [])
+        self.quantile_accuracy = quantile_accuracy
+        self.cache_dir = cache_dir
+        self.cache_status = None
         self.df = None
         self.processed_df = None
+        # Sketches das colunas numéricas (gravados nos metadados do modelo)
+        self.quantile_sketches = {}
+        # Filtro de linhas acumulado, aplicado de uma vez (ver _apply_row_mask)
+        self.row_mask = None
+        # Tempo, linhas e memória de cada etapa (ver _run_stage)
+        self._reset_report()
+    
+    def _csv_columns(self, path) -> tuple:
+        """
+        Colunas a ler de um CSV e seus tipos, pelo formato detectado no cabeçalho
+        
+        Só as colunas usadas pelo pipeline são lidas; as de texto de
+        `CATEGORY_SOURCE_COLUMNS` viram categorias. Em formato desconhecido,
+        todas as colunas (select_features rejeita o arquivo depois).
+        
+        Returns:
+            (usecols, dtype) para pd.read_csv
+        """
+        header = pd.read_csv(path, sep=';', nrows=0).columns
+        if 'preco' in header:
+            wanted = set(self.IMOVEIS_FEATURE_MAP)
+        elif 'listing.pricingInfo.rentalPrice' in header:
+            wanted = set(self.ZAP_FEATURE_MAP) | set(self.ZAP_FILTER_COLUMNS)
+        else:
+            return None, None
+        usecols = [col for col in header if col in wanted]
+        dtype = {col: 'category' for col in usecols if col in self.CATEGORY_SOURCE_COLUMNS}
+        return usecols, dtype
+    
+    @staticmethod
+    def downcast(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Reduz os tipos numéricos sem perda de valores
+        
+        Inteiros vão para o menor tipo que comporta a faixa (ex: quartos em
+        int8, preços em int32); floats vão para float32 quando todos os
+        valores são representáveis exatamente.
+        """
+        for col in df.columns:
+            series = df[col]
+            if pd.api.types.is_bool_dtype(series.dtype):
+                continue
+            if pd.api.types.is_integer_dtype(series.dtype):
+                df[col] = pd.to_numeric(series, downcast='integer')
+            elif series.dtype == np.float64:
+                compact = series.astype(np.float32)
+                if ((compact == series) | series.isna()).all():
+                    df[col] = compact
+        return df
+    
+    def read_csv(self, path, chunk_rows: int = None):
+        """
+        Lê um CSV com tipos compactos (só as colunas usadas, texto como
+        categoria, numéricos reduzidos; ver downcast)
+        
+        Aceita também um snapshot (.npz, ver listings_snapshot), já limpo e
+        mapeado em memória: os blocos são fatias do snapshot.
+        
+        Args:
+            path: Caminho do CSV ou do snapshot
+            chunk_rows: Se definido, lê em blocos de `chunk_rows` linhas
+        
+        Returns:
+            DataFrame, ou iterador de DataFrames com `chunk_rows`
+        """
+        if listings_snapshot.is_snapshot(path):
+            frame = listings_snapshot.load(path)
+            if chunk_rows is not None:
+                return (frame.iloc[start:start + chunk_rows].copy() for start in range(0, len(frame), chunk_rows))
+            return frame
+        usecols, dtype = self._csv_columns(path)
+        # low_memory: o parser tokeniza o arquivo em partes, em vez de inteiro
+        # (colunas de tipo misto ficam como objeto e convert_types as converte)
+        if chunk_rows is not None:
+            reader = pd.read_csv(path, sep=';', usecols=usecols, dtype=dtype, low_memory=True,
+                                 chunksize=chunk_rows)
+            return (self.downcast(chunk) for chunk in reader)
+        return self.downcast(pd.read_csv(path, sep=';', usecols=usecols, dtype=dtype, low_memory=True))
+    
+    def _filter_rows(self, mask: pd.Series):
+        """Acumula um filtro de linhas, sem copiar o DataFrame"""
+        self.row_mask = mask if self.row_mask is None else self.row_mask & mask
+    
+    def _apply_row_mask(self, columns: list = None) -> pd.DataFrame:
+        """Aplica os filtros acumulados (e a seleção de colunas) em uma única cópia"""
+        df = self.df if columns is None else self.df[columns]
+        if self.row_mask is not None:
+            # take (e não df[mask]): o resultado não é marcado como fatia de outro DataFrame
+            df = df.take(np.flatnonzero(self.row_mask.to_numpy()))
+        self.df = df
+        self.row_mask = None
+        return self.df
+    
+    def _kept(self, col: str) -> pd.Series:
+        """Valores de uma coluna nas linhas que passam nos filtros acumulados"""
+        return self.df[col] if self.row_mask is None else self.df[col][self.row_mask]
+    
+    @property
+    def n_rows_kept(self) -> int:
+        """Linhas do DataFrame que passam nos filtros acumulados"""
+        if self.df is None:
+            return 0
+        return len(self.df) if self.row_mask is None else int(self.row_mask.sum())
+    
+    def _reset_report(self):
+        """Zera o relatório por etapa (ver _run_stage)"""
+        self.stage_report = []
+        self._memory_mb = 0.0
+    
+    def _run_stage(self, step, **kwargs):
+        """
+        Executa uma etapa do pipeline registrando tempo, linhas de entrada e
+        saída e memória do DataFrame em `stage_report`
+        
+        Args:
+            step: Método da etapa
+            **kwargs: Argumentos da etapa
+        """
+        rows_in = self.n_rows_kept
+        start = time.perf_counter()
+        step(**kwargs)
+        wall_s = time.perf_counter() - start
+        memory_mb = 0.0 if self.df is None else float(self.df.memory_usage(deep=True).sum()) / 1024 ** 2
+        delta_mb = memory_mb - self._memory_mb
+        self._memory_mb = memory_mb
+        self.stage_report.append({
+            'stage': step.__name__,
+            'wall_s': round(wall_s, 4),
+            'rows_in': rows_in,
+            'rows_out': self.n_rows_kept,
+            'memory_mb': round(memory_mb, 2),
+            'memory_delta_mb': round(delta_mb, 2),
+            'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        })
+        logger.info(f"Etapa {step.__name__}: {wall_s:.3f}s, {rows_in} -> {self.n_rows_kept} linhas, "
+                    f"{memory_mb:.1f} MB ({delta_mb:+.1f} MB)")
+    
+    def get_pipeline_report(self) -> dict:
+        """Relatório por etapa do último processamento (gravado junto aos artefatos do modelo)"""
+        report = {
+            'data_path': str(self.data_path),
+            'extra_paths': [str(path) for path in self.extra_paths],
+            'total_wall_s': round(sum(stage['wall_s'] for stage in self.stage_report), 4),
+            'stages': self.stage_report
+        }
+        if self.cache_status is not None:
+            report['cache'] = self.cache_status
+        return report
         
     def load_data(self) -> pd.DataFrame:
-        """Carrega os dados do CSV"""
+        """Carrega os dados do CSV (só as colunas usadas, com tipos compactos) ou do snapshot"""
         logger.info(f"Carregando dados de {self.data_path}")
+        paths = [self.data_path] + self.extra_paths
+        if len(paths) > 1 and any(listings_snapshot.is_snapshot(path) for path in paths):
+            # O snapshot já está limpo: não pode ser concatenado a CSVs brutos
+            raise ValueError("Snapshot não pode ser combinado com outros arquivos; use os CSVs")
         try:
-            self.df = pd.read_csv(self.data_path, sep=';', low_memory=False)
+            self.df = self.read_csv(self.data_path)
+            if self.extra_paths:
+                frames = [self.read_csv(path) for path in self.extra_paths]
+                # Colunas com categorias diferentes entre os arquivos viram texto no concat
+                self.df = pd.concat([self.df] + frames, ignore_index=True)
             logger.info(f"Dados carregados: {len(self.df)} registros")
             logger.info(f"Colunas encontradas: {list(self.df.columns)}")
             return self.df
@@ -52,8 +266,8 @@ class DataProcessor:
                 (self.df['preco'] > 0) &
                 (self.df['preco'] < 100000)  # Remover outliers extremos
             )
-            self.df = self.df[mask].copy()
-            logger.info(f"Imóveis válidos: {len(self.df)} registros")
+            self._filter_rows(mask)
+            logger.info(f"Imóveis válidos: {self.n_rows_kept} registros")
         elif 'listing.pricingInfo.isRent' in self.df.columns:
             # Formato antigo: dataZAP.csv
             mask = (
@@ -61,8 +275,11 @@ class DataProcessor:
                 (self.df['listing.pricingInfo.rentalPrice'].notna()) &
                 (self.df['listing.pricingInfo.rentalPrice'] > 0)
             )
-            self.df = self.df[mask].copy()
-            logger.info(f"Imóveis para aluguel: {len(self.df)} registros")
+            self._filter_rows(mask)
+            logger.info(f"Imóveis para aluguel: {self.n_rows_kept} registros")
+        elif 'rent_amount' in self.df.columns:
+            # Snapshot (ver listings_snapshot): já filtrado no build
+            logger.info(f"Snapshot já filtrado: {self.n_rows_kept} registros")
         else:
             # Se não tem filtro, manter todos
             logger.info("Nenhum filtro aplicado, mantendo todos os registros")
@@ -76,17 +293,11 @@ class DataProcessor:
         # Verificar qual formato de dataset estamos usando
         if 'preco' in self.df.columns:
             # Novo formato: imoveis-df.csv
-            feature_map = {
-                'preco': 'rent_amount',
-                'area': 'area',
-                'quartos': 'bedrooms',
-                'tipo': 'property_type',
-                'bairro': 'neighborhood'
-            }
+            feature_map = self.IMOVEIS_FEATURE_MAP
             
-            # Selecionar e renomear colunas existentes
+            # Selecionar (com o filtro de linhas, em uma cópia) e renomear colunas existentes
             available_cols = {k: v for k, v in feature_map.items() if k in self.df.columns}
-            self.df = self.df[list(available_cols.keys())].copy()
+            self._apply_row_mask(list(available_cols.keys()))
             self.df = self.df.rename(columns=available_cols)
             
             # Adicionar colunas faltantes com valores padrão
@@ -106,59 +317,36 @@ class DataProcessor:
             
         elif 'listing.pricingInfo.rentalPrice' in self.df.columns:
             # Formato antigo: dataZAP.csv
-            feature_map = {
-                'listing.pricingInfo.rentalPrice': 'rent_amount',
-                'listing.usableAreas': 'area',
-                'listing.bedrooms': 'bedrooms',
-                'listing.bathrooms': 'bathrooms',
-                'listing.parkingSpaces': 'parking_spaces',
-                'listing.address.city': 'city',
-                'listing.address.neighborhood': 'neighborhood',
-                'listing.address.state': 'state',
-                'listing.furnished': 'furnished',
-                'listing.pricingInfo.monthlyCondoFee': 'hoa',
-                'listing.propertyType': 'property_type',
-                'listing.suites': 'suites'
-            }
+            feature_map = self.ZAP_FEATURE_MAP
             
-            # Selecionar apenas colunas que existem
+            # Selecionar apenas colunas que existem (com o filtro de linhas, em uma cópia)
             available_cols = {k: v for k, v in feature_map.items() if k in self.df.columns}
-            self.df = self.df[list(available_cols.keys())].copy()
+            self._apply_row_mask(list(available_cols.keys()))
             self.df = self.df.rename(columns=available_cols)
+        elif 'rent_amount' in self.df.columns:
+            # Snapshot: colunas já selecionadas e renomeadas no build
+            self._apply_row_mask()
         else:
             raise ValueError("Formato de dataset não reconhecido")
         
         logger.info(f"Features selecionadas: {list(self.df.columns)}")
         return self.df
     
-    def handle_missing_values(self) -> pd.DataFrame:
-        """Trata valores faltantes"""
-        logger.info("Tratando valores faltantes...")
-        
+    def convert_types(self) -> pd.DataFrame:
+        """Converte os tipos das colunas (numéricas, categóricas e furnished), sem imputação"""
         # Converter colunas numéricas para float, tratando strings e valores inválidos
-        numeric_cols = ['area', 'bedrooms', 'bathrooms', 'parking_spaces', 'hoa', 'suites', 'rent_amount']
-        for col in numeric_cols:
+        for col in self.NUMERIC_COLUMNS:
             if col in self.df.columns:
                 # Converter para numérico, tratando vírgulas e valores inválidos
-                if self.df[col].dtype == 'object':
+                if not pd.api.types.is_numeric_dtype(self.df[col]):
                     # Substituir vírgulas por pontos e converter
                     self.df[col] = self.df[col].astype(str).str.replace(',', '.', regex=False)
                 self.df[col] = pd.to_numeric(self.df[col], errors='coerce')
-                # Preencher NaN com mediana
-                if self.df[col].isna().sum() > 0:
-                    median_val = self.df[col].median()
-                    if pd.isna(median_val):
-                        median_val = 0  # Se mediana for NaN, usar 0
-                    self.df[col].fillna(median_val, inplace=True)
-                    logger.info(f"{col}: convertido e preenchido {self.df[col].isna().sum()} valores com mediana {median_val}")
         
-        # Categóricos: preencher com 'Desconhecido'
-        categorical_cols = ['city', 'neighborhood', 'state', 'property_type']
-        for col in categorical_cols:
+        # Categóricos: valores ausentes viram 'Desconhecido'
+        for col in self.CATEGORICAL_COLUMNS:
             if col in self.df.columns:
-                self.df[col] = self.df[col].astype(str)
-                self.df[col].fillna('Desconhecido', inplace=True)
-                self.df[col] = self.df[col].replace('nan', 'Desconhecido')
+                self.df[col] = self.df[col].astype(str).replace('nan', 'Desconhecido')
         
         # Furnished: converter para booleano
         if 'furnished' in self.df.columns:
@@ -167,47 +355,148 @@ class DataProcessor:
         
         return self.df
     
-    def remove_outliers(self) -> pd.DataFrame:
-        """Remove outliers usando IQR"""
+    def clean(self) -> pd.DataFrame:
+        """
+        Limpeza comum ao treino e à API: carrega, filtra os imóveis para
+        aluguel, seleciona as features e converte os tipos (sem imputação
+        nem remoção de outliers, que dependem do treino)
+        
+        É o conteúdo do snapshot dos anúncios (ver listings_snapshot).
+        """
+        self._reset_report()
+        for step in (self.load_data, self.filter_rental_properties, self.select_features, self.convert_types):
+            self._run_stage(step)
+        return self.df
+    
+    def handle_missing_values(self, medians: dict = None) -> pd.DataFrame:
+        """
+        Trata valores faltantes
+        
+        Args:
+            medians: Mediana de cada coluna numérica (se None, calculada sobre
+                os dados carregados; ver fit_streaming)
+        """
+        logger.info("Tratando valores faltantes...")
+        
+        self.convert_types()
+        
+        # Preencher NaN com mediana
+        self.medians = {}
+        for col in self.NUMERIC_COLUMNS:
+            if col in self.df.columns:
+                if medians is not None:
+                    median_val = medians[col]
+                else:
+                    self.quantile_sketches[col] = self._sketch(self.df[col])
+                    median_val = self._quantile(self.df[col], 0.5, self.quantile_sketches[col])
+                    if pd.isna(median_val):
+                        median_val = 0  # Se mediana for NaN, usar 0
+                self.medians[col] = float(median_val)
+                missing = int(self.df[col].isna().sum())
+                if missing > 0:
+                    self.df[col] = self.df[col].fillna(median_val)
+                    logger.info(f"{col}: convertido e preenchido {missing} valores com mediana {median_val}")
+        
+        return self.df
+    
+    def _sketch(self, values: pd.Series) -> quantile_sketch.KLLSketch:
+        """Sketch KLL de uma coluna (em paralelo por blocos), na precisão configurada"""
+        return quantile_sketch.build(values.to_numpy(dtype=np.float64),
+                                     accuracy=self.quantile_accuracy or quantile_sketch.DEFAULT_ACCURACY)
+    
+    def _quantile(self, values: pd.Series, q: float, sketch: quantile_sketch.KLLSketch = None) -> float:
+        """
+        Quantil de uma coluna: pelo sketch se quantile_accuracy estiver
+        definido, senão exato (calculado em float64, mesmo com a coluna em
+        float32)
+        """
+        if self.quantile_accuracy is None:
+            values = values.to_numpy(dtype=np.float64, na_value=np.nan)
+            values = values[~np.isnan(values)]
+            return float(np.quantile(values, q)) if len(values) else np.nan
+        if sketch is None:
+            sketch = self._sketch(values)
+        return sketch.quantile(q)
+    
+    def get_quantile_sketches(self) -> dict:
+        """Sketches das colunas numéricas, serializados (para os metadados do modelo)"""
+        return {col: sketch.to_dict() for col, sketch in self.quantile_sketches.items()}
+    
+    @staticmethod
+    def iqr_bounds(q1: float, q3: float, non_negative: bool = False) -> tuple:
+        """Limites de outliers pelo método IQR a partir dos quartis"""
+        iqr = q3 - q1
+        lower_bound = q1 - 1.5 * iqr
+        if non_negative:
+            lower_bound = max(0, lower_bound)
+        return float(lower_bound), float(q3 + 1.5 * iqr)
+    
+    def remove_outliers(self, bounds: dict = None) -> pd.DataFrame:
+        """
+        Remove outliers usando IQR
+        
+        Args:
+            bounds: Limites (inferior, superior) de 'rent_amount' e 'area' (se
+                None, calculados sobre os dados carregados)
+        """
         logger.info("Removendo outliers...")
         
-        initial_len = len(self.df)
+        # Os filtros são acumulados em uma máscara e aplicados em uma única cópia
+        initial_len = self.n_rows_kept
+        self.outlier_bounds = {}
         
         # Remover outliers do target
         if 'rent_amount' in self.df.columns:
-            Q1 = self.df['rent_amount'].quantile(0.25)
-            Q3 = self.df['rent_amount'].quantile(0.75)
-            IQR = Q3 - Q1
-            lower_bound = Q1 - 1.5 * IQR
-            upper_bound = Q3 + 1.5 * IQR
+            if bounds is not None:
+                lower_bound, upper_bound = bounds['rent_amount']
+            else:
+                rent = self._kept('rent_amount')
+                sketch = self._sketch(rent) if self.quantile_accuracy else None
+                lower_bound, upper_bound = self.iqr_bounds(self._quantile(rent, 0.25, sketch),
+                                                           self._quantile(rent, 0.75, sketch))
+            self.outlier_bounds['rent_amount'] = (lower_bound, upper_bound)
             
-            mask = (self.df['rent_amount'] >= lower_bound) & (self.df['rent_amount'] <= upper_bound)
-            self.df = self.df[mask].copy()
-            logger.info(f"Outliers removidos do target: {initial_len - len(self.df)} registros")
+            self._filter_rows((self.df['rent_amount'] >= lower_bound) & (self.df['rent_amount'] <= upper_bound))
+            logger.info(f"Outliers removidos do target: {initial_len - self.n_rows_kept} registros")
         
-        # Remover outliers da área
+        # Remover outliers da área (quartis das linhas que passaram no filtro do target)
         if 'area' in self.df.columns:
-            Q1 = self.df['area'].quantile(0.25)
-            Q3 = self.df['area'].quantile(0.75)
-            IQR = Q3 - Q1
-            lower_bound = max(0, Q1 - 1.5 * IQR)  # Área não pode ser negativa
-            upper_bound = Q3 + 1.5 * IQR
+            if bounds is not None:
+                lower_bound, upper_bound = bounds['area']
+            else:
+                # Área não pode ser negativa
+                area = self._kept('area')
+                sketch = self._sketch(area) if self.quantile_accuracy else None
+                lower_bound, upper_bound = self.iqr_bounds(self._quantile(area, 0.25, sketch),
+                                                           self._quantile(area, 0.75, sketch),
+                                                           non_negative=True)
+            self.outlier_bounds['area'] = (lower_bound, upper_bound)
             
-            mask = (self.df['area'] >= lower_bound) & (self.df['area'] <= upper_bound)
-            self.df = self.df[mask].copy()
-            logger.info(f"Outliers removidos da área: {initial_len - len(self.df)} registros")
+            self._filter_rows((self.df['area'] >= lower_bound) & (self.df['area'] <= upper_bound))
+            logger.info(f"Outliers removidos da área: {initial_len - self.n_rows_kept} registros")
         
-        return self.df
+        return self._apply_row_mask()
     
-    def create_derived_features(self) -> pd.DataFrame:
-        """Cria features derivadas"""
+    def create_derived_features(self, price_per_sqm_median: float = None) -> pd.DataFrame:
+        """
+        Cria features derivadas
+        
+        Args:
+            price_per_sqm_median: Mediana usada para preencher price_per_sqm
+                (se None, calculada sobre os dados carregados)
+        """
         logger.info("Criando features derivadas...")
         
         # Preço por m²
         if 'rent_amount' in self.df.columns and 'area' in self.df.columns:
             self.df['price_per_sqm'] = self.df['rent_amount'] / self.df['area']
             self.df['price_per_sqm'] = self.df['price_per_sqm'].replace([np.inf, -np.inf], np.nan)
-            self.df['price_per_sqm'].fillna(self.df['price_per_sqm'].median(), inplace=True)
+            if price_per_sqm_median is None:
+                self.quantile_sketches['price_per_sqm'] = self._sketch(self.df['price_per_sqm'])
+                price_per_sqm_median = self._quantile(self.df['price_per_sqm'], 0.5,
+                                                      self.quantile_sketches['price_per_sqm'])
+            self.price_per_sqm_median = float(price_per_sqm_median)
+            self.df['price_per_sqm'] = self.df['price_per_sqm'].fillna(price_per_sqm_median)
             logger.info("Feature 'price_per_sqm' criada")
         
         return self.df
@@ -233,26 +522,31 @@ class DataProcessor:
         # Por enquanto, vamos usar target encoding simples
         self.city_encoding_map = {}
         self.neighborhood_encoding_map = {}
-        self.mean_rent = self.df['rent_amount'].mean()
+        self.city_counts = {}
+        self.neighborhood_counts = {}
+        # Médias em float64 (a coluna pode estar em float32)
+        rent = self.df['rent_amount'].astype(np.float64)
+        self.mean_rent = rent.mean()
+        self.n_rows = len(self.df)
         
         if 'city' in self.df.columns:
-            city_means = self.df.groupby('city')['rent_amount'].mean()
+            city_means = rent.groupby(self.df['city']).mean()
             self.city_encoding_map = city_means.to_dict()
-            self.df['city_encoded'] = self.df['city'].map(city_means)
-            self.df['city_encoded'].fillna(self.mean_rent, inplace=True)
+            self.city_counts = self.df['city'].value_counts().to_dict()
+            self.df['city_encoded'] = self.df['city'].map(city_means).fillna(self.mean_rent)
             self.df.drop('city', axis=1, inplace=True)
         
         if 'neighborhood' in self.df.columns:
             # Agrupar bairros com poucos exemplos
             neighborhood_counts = self.df['neighborhood'].value_counts()
-            rare_neighborhoods = neighborhood_counts[neighborhood_counts < 10].index
+            rare_neighborhoods = neighborhood_counts[neighborhood_counts < self.MIN_NEIGHBORHOOD_COUNT].index
             self.df['neighborhood'] = self.df['neighborhood'].replace(rare_neighborhoods, 'Outros')
             
             # Target encoding
-            neighborhood_means = self.df.groupby('neighborhood')['rent_amount'].mean()
+            neighborhood_means = rent.groupby(self.df['neighborhood']).mean()
             self.neighborhood_encoding_map = neighborhood_means.to_dict()
-            self.df['neighborhood_encoded'] = self.df['neighborhood'].map(neighborhood_means)
-            self.df['neighborhood_encoded'].fillna(self.mean_rent, inplace=True)
+            self.neighborhood_counts = self.df['neighborhood'].value_counts().to_dict()
+            self.df['neighborhood_encoded'] = self.df['neighborhood'].map(neighborhood_means).fillna(self.mean_rent)
             self.df.drop('neighborhood', axis=1, inplace=True)
         
         # Remover state se existir (não vamos usar)
@@ -261,24 +555,491 @@ class DataProcessor:
         
         return self.df
     
+    @staticmethod
+    def _merge_target_means(means: dict, counts: dict, keys: pd.Series, target: pd.Series) -> tuple:
+        """
+        Atualiza médias do target por categoria com as linhas de um lote
+        
+        Args:
+            means: Média atual de cada categoria
+            counts: Número de linhas por trás de cada média
+            keys: Categoria de cada linha do lote
+            target: Target de cada linha do lote
+        
+        Returns:
+            (médias atualizadas, contagens atualizadas)
+        """
+        means = dict(means)
+        counts = dict(counts)
+        batch = target.groupby(keys).agg(['sum', 'count'])
+        for key, row in batch.iterrows():
+            old_count = counts.get(key, 0)
+            total = old_count + row['count']
+            means[key] = (means.get(key, 0.0) * old_count + row['sum']) / total
+            counts[key] = int(total)
+        return means, counts
+    
+    def encode_incremental(self, encoding_maps: dict, feature_names: list) -> pd.DataFrame:
+        """
+        Codifica um lote novo com os mapeamentos de uma versão anterior,
+        atualizando os mapeamentos com as linhas do lote
+        
+        As médias do target encoding são combinadas pelas contagens (o
+        resultado é o mesmo de recalcular sobre os dados antigos mais o lote).
+        Bairros novos com menos de MIN_NEIGHBORHOOD_COUNT linhas entram em
+        'Outros'. As colunas one-hot seguem `feature_names`, para que o lote
+        tenha exatamente as features do modelo.
+        
+        Args:
+            encoding_maps: Mapeamentos da versão anterior (com contagens)
+            feature_names: Features do modelo, na ordem
+        
+        Raises:
+            ValueError: Se os mapeamentos não tiverem as contagens (versões
+                anteriores a este modo; é preciso um retreino completo)
+        """
+        logger.info("Codificando lote com os mapeamentos da versão anterior...")
+        
+        required = ('city_counts', 'neighborhood_counts', 'n_rows')
+        if any(key not in encoding_maps for key in required):
+            raise ValueError("Mapeamentos de encoding sem contagens: é necessário um retreino completo")
+        
+        old_rows = int(encoding_maps['n_rows'])
+        batch_rows = len(self.df)
+        self.n_rows = old_rows + batch_rows
+        # Somas em float64 (a coluna pode estar em float32)
+        rent = self.df['rent_amount'].astype(np.float64)
+        self.mean_rent = (encoding_maps['mean_rent'] * old_rows + rent.sum()) / self.n_rows
+        
+        self.city_encoding_map, self.city_counts = encoding_maps['city_encoding'], encoding_maps['city_counts']
+        if 'city' in self.df.columns:
+            self.city_encoding_map, self.city_counts = self._merge_target_means(
+                self.city_encoding_map, self.city_counts, self.df['city'], rent
+            )
+            self.df['city_encoded'] = self.df['city'].map(self.city_encoding_map).fillna(self.mean_rent)
+        
+        self.neighborhood_encoding_map = encoding_maps['neighborhood_encoding']
+        self.neighborhood_counts = encoding_maps['neighborhood_counts']
+        if 'neighborhood' in self.df.columns:
+            # Bairros já codificados mantêm a chave; novos só com exemplos suficientes
+            batch_counts = self.df['neighborhood'].value_counts()
+            rare = [n for n, count in batch_counts.items()
+                    if n not in self.neighborhood_encoding_map and count < self.MIN_NEIGHBORHOOD_COUNT]
+            self.df['neighborhood'] = self.df['neighborhood'].replace(rare, 'Outros')
+            self.neighborhood_encoding_map, self.neighborhood_counts = self._merge_target_means(
+                self.neighborhood_encoding_map, self.neighborhood_counts,
+                self.df['neighborhood'], rent
+            )
+        
+        self.apply_encoding(feature_names)
+        logger.info(f"Lote codificado: {batch_rows} linhas ({self.n_rows} no total)")
+        return self.df
+    
+    def apply_encoding(self, feature_names: list) -> pd.DataFrame:
+        """
+        Codifica os dados carregados com mapeamentos já calculados
+        
+        Bairros fora do mapeamento entram em 'Outros' e categorias sem média
+        recebem a média geral. As colunas one-hot seguem `feature_names` (o
+        drop_first de get_dummies dependeria das linhas presentes).
+        
+        Args:
+            feature_names: Features do modelo, na ordem
+        """
+        if 'city' in self.df.columns:
+            self.df['city_encoded'] = self.df['city'].map(self.city_encoding_map).fillna(self.mean_rent)
+        
+        if 'neighborhood' in self.df.columns:
+            known = self.df['neighborhood'].isin(list(self.neighborhood_encoding_map))
+            neighborhood = self.df['neighborhood'].where(known, 'Outros')
+            self.df['neighborhood_encoded'] = neighborhood.map(self.neighborhood_encoding_map).fillna(self.mean_rent)
+        
+        if 'furnished' in self.df.columns:
+            self.df['furnished'] = self.df['furnished'].astype(int)
+        
+        if 'property_type' in self.df.columns:
+            for name in feature_names:
+                if name.startswith('property_type_'):
+                    self.df[name] = (self.df['property_type'] == name[len('property_type_'):]).astype(int)
+        
+        self.df = self.df.reindex(columns=list(feature_names) + ['rent_amount'], fill_value=0)
+        return self.df
+    
+    def encode_with_maps(self, encoding_maps: dict, feature_names: list) -> pd.DataFrame:
+        """
+        Codifica os dados com os mapeamentos de uma versão anterior, sem
+        atualizá-los (linhas de avaliação, ver process_batch)
+        
+        Args:
+            encoding_maps: Mapeamentos da versão anterior
+            feature_names: Features do modelo, na ordem
+        """
+        logger.info("Codificando com os mapeamentos da versão anterior (sem atualizar)...")
+        
+        self.city_encoding_map = encoding_maps['city_encoding']
+        self.neighborhood_encoding_map = encoding_maps['neighborhood_encoding']
+        self.mean_rent = encoding_maps['mean_rent']
+        return self.apply_encoding(feature_names)
+    
+    def process_batch(self, encoding_maps: dict, feature_names: list, update: bool = True) -> pd.DataFrame:
+        """
+        Processa um lote novo de anúncios para treino incremental
+        
+        Mesmo pipeline de `process`, exceto o encoding, que reaproveita e
+        atualiza os mapeamentos da versão anterior (ver encode_incremental).
+        Com `update=False` os mapeamentos ficam como estão: é o caso das
+        linhas antigas usadas só para medir o drift.
+        
+        Args:
+            encoding_maps: Mapeamentos da versão anterior (com contagens)
+            feature_names: Features do modelo, na ordem
+            update: Atualiza os mapeamentos com as linhas processadas
+        """
+        logger.info("Iniciando processamento do lote incremental...")
+        
+        self._reset_report()
+        for step in (self.load_data, self.filter_rental_properties, self.select_features,
+                     self.handle_missing_values, self.remove_outliers, self.create_derived_features):
+            self._run_stage(step)
+            if step == self.select_features:
+                self.selected_unique_values = self._unique_values()
+        encode = self.encode_incremental if update else self.encode_with_maps
+        self._run_stage(encode, encoding_maps=encoding_maps, feature_names=feature_names)
+        
+        # Sem cópia: processed_df e df são o mesmo DataFrame
+        self.processed_df = self.df
+        
+        logger.info(f"Processamento do lote concluído: {len(self.processed_df)} registros")
+        return self.processed_df
+    
     def process(self) -> pd.DataFrame:
         """Executa todo o pipeline de processamento"""
         logger.info("Iniciando pipeline de processamento...")
         
-        self.load_data()
-        self.filter_rental_properties()
-        self.select_features()
-        self.handle_missing_values()
-        self.remove_outliers()
-        self.create_derived_features()
-        self.encode_categorical_features()
+        self._reset_report()
+        key = self.cache_key() if self.cache_dir is not None else None
+        if key is not None and processing_cache.exists(self.cache_dir, key):
+            self._run_stage(self.load_cache, key=key)
+            if self.cache_status['hit']:
+                self.processed_df = self.df
+                logger.info(f"Dados processados lidos do cache: {len(self.processed_df)} registros finais")
+                return self.processed_df
         
-        # Salvar DataFrame processado
-        self.processed_df = self.df.copy()
+        for step in (self.load_data, self.filter_rental_properties, self.select_features,
+                     self.handle_missing_values, self.remove_outliers,
+                     self.create_derived_features, self.encode_categorical_features):
+            self._run_stage(step)
+            if step == self.select_features:
+                # Valores únicos antes do encoding (que remove as colunas categóricas)
+                self.selected_unique_values = self._unique_values()
+        
+        # Salvar DataFrame processado (sem cópia: processed_df e df são o mesmo DataFrame)
+        self.processed_df = self.df
+        if key is not None:
+            self.save_cache(key)
         
         logger.info(f"Processamento concluído: {len(self.processed_df)} registros finais")
         return self.processed_df
     
+    def cache_key(self) -> str:
+        """Chave do cache: conteúdo dos CSVs, versão do pipeline e configuração"""
+        config = {
+            'quantile_accuracy': self.quantile_accuracy,
+            'min_neighborhood_count': self.MIN_NEIGHBORHOOD_COUNT
+        }
+        return processing_cache.cache_key([self.data_path] + self.extra_paths, self.PIPELINE_VERSION, config)
+    
+    def save_cache(self, key: str) -> bool:
+        """Grava o DataFrame processado e as estatísticas ajustadas no cache"""
+        state = {
+            'encoding_maps': self.get_encoding_maps(),
+            'unique_values': self.selected_unique_values,
+            'quantile_sketches': self.get_quantile_sketches(),
+            'medians': self.medians,
+            'outlier_bounds': self.outlier_bounds,
+            'price_per_sqm_median': getattr(self, 'price_per_sqm_median', None),
+            'stage_report': self.stage_report
+        }
+        stored = processing_cache.save(self.cache_dir, key, self.processed_df, state)
+        self.cache_status = {'key': key, 'hit': False, 'stored': stored}
+        return stored
+    
+    def load_cache(self, key: str) -> pd.DataFrame:
+        """Restaura o DataFrame processado e as estatísticas ajustadas de uma entrada do cache"""
+        cached = processing_cache.load(self.cache_dir, key)
+        self.cache_status = {'key': key, 'hit': cached is not None}
+        if cached is None:
+            return self.df
+        
+        self.df, state = cached
+        encoding_maps = state['encoding_maps']
+        self.city_encoding_map = encoding_maps['city_encoding']
+        self.neighborhood_encoding_map = encoding_maps['neighborhood_encoding']
+        self.mean_rent = encoding_maps['mean_rent']
+        self.city_counts = encoding_maps['city_counts']
+        self.neighborhood_counts = encoding_maps['neighborhood_counts']
+        self.n_rows = encoding_maps['n_rows']
+        self.selected_unique_values = state['unique_values']
+        self.quantile_sketches = {col: quantile_sketch.KLLSketch.from_dict(data)
+                                  for col, data in state['quantile_sketches'].items()}
+        self.medians = state['medians']
+        self.outlier_bounds = {col: tuple(bounds) for col, bounds in state['outlier_bounds'].items()}
+        self.price_per_sqm_median = state['price_per_sqm_median']
+        # Etapas do processamento original, para o relatório
+        self.cache_status['processed_stages'] = state['stage_report']
+        return self.df
+    
+    def _quietly(self, *steps):
+        """Executa etapas do pipeline sem os logs por etapa (usado em cada bloco do streaming)"""
+        level = logger.level
+        logger.setLevel(logging.WARNING)
+        try:
+            for step, kwargs in steps:
+                step(**kwargs)
+        finally:
+            logger.setLevel(level)
+        return self.df
+    
+    def iter_clean_chunks(self, chunk_rows: int = 100_000):
+        """
+        Lê os CSVs em blocos de `chunk_rows` linhas, com filtro, seleção e
+        conversão de tipos aplicados a cada bloco
+        
+        Nenhuma dessas etapas depende de estatísticas do conjunto inteiro, então
+        a memória fica limitada ao tamanho do bloco.
+        
+        Args:
+            chunk_rows: Linhas por bloco
+        
+        Yields:
+            DataFrame de cada bloco (ainda com valores faltantes e outliers)
+        """
+        for path in [self.data_path] + self.extra_paths:
+            for chunk in self.read_csv(path, chunk_rows=chunk_rows):
+                self.df = chunk
+                yield self._quietly((self.filter_rental_properties, {}), (self.select_features, {}),
+                                    (self.convert_types, {}))
+    
+    def fit_sample(self, sample_rows: int = 200_000, chunk_rows: int = 100_000, seed: int = 42) -> list:
+        """
+        Ajusta o pipeline (medianas, limites de outliers, encoding) em uma
+        amostra uniforme de tamanho limitado, lendo os CSVs em blocos
+        
+        A amostra é mantida por chaves aleatórias: cada linha recebe uma chave
+        uniforme e ficam as `sample_rows` de menor chave (a memória não passa
+        de uma amostra mais um bloco). Com menos linhas que `sample_rows`, o
+        ajuste é o mesmo de `process`. Os valores únicos das categorias são
+        coletados de todos os blocos.
+        
+        Args:
+            sample_rows: Tamanho máximo da amostra
+            chunk_rows: Linhas por bloco
+            seed: Semente das chaves da amostra
+        
+        Returns:
+            Nomes das features, na ordem de `process`
+        """
+        logger.info(f"Ajustando o pipeline em uma amostra de até {sample_rows} linhas "
+                    f"(blocos de {chunk_rows} linhas)...")
+        
+        rng = np.random.default_rng(seed)
+        sample = None
+        total_rows = 0
+        unique_values = {'city': set(), 'neighborhood': set(), 'property_type': set()}
+        for chunk in self.iter_clean_chunks(chunk_rows):
+            for col, values in unique_values.items():
+                if col in chunk.columns:
+                    values.update(chunk[col].unique().tolist())
+            chunk = chunk.assign(_sample_key=rng.random(len(chunk)),
+                                 _sample_row=np.arange(total_rows, total_rows + len(chunk)))
+            total_rows += len(chunk)
+            sample = chunk if sample is None else pd.concat([sample, chunk], ignore_index=True)
+            if len(sample) > sample_rows:
+                sample = sample.nsmallest(sample_rows, '_sample_key')
+        
+        if sample is None or sample.empty:
+            raise ValueError("Nenhum registro válido nos dados")
+        
+        # Ordem original das linhas (mesmo ajuste de `process` quando a amostra é tudo)
+        self.df = sample.sort_values('_sample_row').drop(columns=['_sample_key', '_sample_row'])
+        self.df = self.df.reset_index(drop=True)
+        logger.info(f"Amostra: {len(self.df)} de {total_rows} linhas válidas")
+        
+        self._quietly((self.handle_missing_values, {}), (self.remove_outliers, {}),
+                      (self.create_derived_features, {}), (self.encode_categorical_features, {}))
+        self.feature_names = [col for col in self.df.columns if col != 'rent_amount']
+        self.processed_df = self.df
+        self.streamed_unique_values = {
+            col: sorted(str(v) for v in values if str(v) not in ('nan', 'Desconhecido'))
+            for col, values in unique_values.items()
+        }
+        return self.feature_names
+    
+    def fit_streaming(self, chunk_rows: int = 100_000, accuracy: float = DEFAULT_ACCURACY) -> list:
+        """
+        Ajusta o pipeline em uma única passada pelos CSVs em blocos, sem
+        manter as linhas em memória
+        
+        A passada acumula estatísticas mergeáveis (ver streaming_stats):
+        
+            - um sketch KLL por coluna numérica (medianas da imputação; ver
+              quantile_sketch)
+            - uma grade por cidade, bairro e tipo de imóvel com contagens e
+              somas do aluguel por bucket de aluguel e de área
+        
+        Os filtros de outliers são sequenciais (os quartis da área são os das
+        linhas que passaram no filtro do aluguel) e o encoding usa só as
+        linhas que passaram nos dois; com a grade, essas estatísticas
+        condicionadas saem das células dentro dos limites, sem reler os
+        dados. O resultado difere do de `process` só pela precisão
+        (`accuracy`: erro relativo dos buckets da grade e erro de rank das
+        medianas; médias do encoding exatas exceto nas células que cruzam os
+        limites dos filtros).
+        
+        A segunda passada, que aplica imputação, filtros e encoding bloco a
+        bloco, é `iter_processed_chunks`.
+        
+        Args:
+            chunk_rows: Linhas por bloco
+            accuracy: Erro relativo dos buckets e erro de rank das medianas
+        
+        Returns:
+            Nomes das features, na ordem de `process`
+        """
+        logger.info(f"Acumulando estatísticas em blocos de {chunk_rows} linhas "
+                    f"(precisão dos quantis: {accuracy:.1%})...")
+        
+        sketches = {}
+        grid = None
+        columns = None
+        total_rows = 0
+        unique_values = {'city': set(), 'neighborhood': set(), 'property_type': set()}
+        for chunk in self.iter_clean_chunks(chunk_rows):
+            if columns is None:
+                columns = list(chunk.columns)
+                if 'rent_amount' not in columns or 'area' not in columns:
+                    raise ValueError("Processamento em streaming requer as colunas 'rent_amount' e 'area'")
+                key_cols = [col for col in ('city', 'neighborhood', 'property_type') if col in columns]
+                grid = GroupedGrid(key_cols, ['rent_amount', 'area'], ['rent_amount'], accuracy)
+            total_rows += len(chunk)
+            for col in self.NUMERIC_COLUMNS:
+                if col in chunk.columns:
+                    sketches.setdefault(col, quantile_sketch.KLLSketch(accuracy=accuracy)).update(chunk[col])
+            grid.add(chunk)
+            for col, values in unique_values.items():
+                if col in chunk.columns:
+                    values.update(chunk[col].unique().tolist())
+        
+        if total_rows == 0:
+            raise ValueError("Nenhum registro válido nos dados")
+        
+        # Imputação: mediana de cada coluna (0 se a coluna não tiver valores)
+        self.medians = {}
+        for col, sketch in sketches.items():
+            median = sketch.quantile(0.5)
+            self.medians[col] = 0.0 if np.isnan(median) else median
+        
+        # Células da grade com os ausentes imputados pela mediana
+        cells = grid.table
+        counts = cells['count'].to_numpy()
+        rent_missing = cells['rent_amount'].to_numpy() == NAN_INDEX
+        rent_sum = cells['rent_amount_sum'].to_numpy() + np.where(rent_missing, self.medians['rent_amount'] * counts, 0)
+        rent = rent_sum / counts
+        area = grid.buckets.value(cells['area'].to_numpy())
+        area[np.isnan(area)] = self.medians['area']
+        
+        # Outliers: aluguel, depois área (nas células que passaram no aluguel)
+        self.outlier_bounds = {}
+        self.outlier_bounds['rent_amount'] = self.iqr_bounds(weighted_quantile(rent, counts, 0.25),
+                                                             weighted_quantile(rent, counts, 0.75))
+        lower, upper = self.outlier_bounds['rent_amount']
+        keep = (rent >= lower) & (rent <= upper)
+        self.outlier_bounds['area'] = self.iqr_bounds(weighted_quantile(area[keep], counts[keep], 0.25),
+                                                      weighted_quantile(area[keep], counts[keep], 0.75),
+                                                      non_negative=True)
+        lower, upper = self.outlier_bounds['area']
+        keep &= (area >= lower) & (area <= upper)
+        
+        # Preço por m² (áreas nulas ficam de fora da mediana, como inf -> NaN em process)
+        with np.errstate(divide='ignore'):
+            price_per_sqm = np.where(area > 0, rent / area, np.nan)
+        self.price_per_sqm_median = weighted_quantile(price_per_sqm[keep], counts[keep], 0.5)
+        
+        # Target encoding a partir das somas exatas das células mantidas
+        kept = cells[keep].assign(rent_amount_sum=rent_sum[keep])
+        self.n_rows = int(kept['count'].sum())
+        self.mean_rent = float(kept['rent_amount_sum'].sum() / self.n_rows)
+        self.city_encoding_map, self.city_counts = {}, {}
+        if 'city' in kept.columns:
+            by_city = kept.groupby('city')[['rent_amount_sum', 'count']].sum()
+            self.city_encoding_map = (by_city['rent_amount_sum'] / by_city['count']).to_dict()
+            self.city_counts = by_city['count'].to_dict()
+        self.neighborhood_encoding_map, self.neighborhood_counts = {}, {}
+        if 'neighborhood' in kept.columns:
+            by_neighborhood = kept.groupby('neighborhood')[['rent_amount_sum', 'count']].sum()
+            rare = by_neighborhood['count'] < self.MIN_NEIGHBORHOOD_COUNT
+            names = np.where(rare, 'Outros', by_neighborhood.index.to_numpy(dtype=object))
+            by_neighborhood = by_neighborhood.groupby(names).sum()
+            self.neighborhood_encoding_map = (by_neighborhood['rent_amount_sum'] / by_neighborhood['count']).to_dict()
+            self.neighborhood_counts = by_neighborhood['count'].to_dict()
+        
+        # Colunas na mesma ordem de process: numéricas, price_per_sqm, one-hot
+        # (drop_first sobre os tipos presentes), city_encoded, neighborhood_encoded
+        categorical = set(self.CATEGORICAL_COLUMNS) | {'rent_amount'}
+        self.feature_names = [col for col in columns if col not in categorical] + ['price_per_sqm']
+        if 'property_type' in kept.columns:
+            property_types = sorted(kept['property_type'].unique().tolist())
+            self.feature_names += [f"property_type_{t}" for t in property_types[1:]]
+        self.feature_names += [f"{col}_encoded" for col in ('city', 'neighborhood') if col in columns]
+        
+        self.processed_df = None
+        self.streamed_unique_values = {
+            col: sorted(str(v) for v in values if str(v) not in ('nan', 'Desconhecido'))
+            for col, values in unique_values.items()
+        }
+        self.streaming_stats = {
+            'accuracy': accuracy,
+            'rows': total_rows,
+            'kept_rows': self.n_rows,
+            'grid_cells': grid.cells,
+            'sketch_items': {col: sketch.size for col, sketch in sketches.items()}
+        }
+        self.quantile_sketches = sketches
+        logger.info(f"Estatísticas de {total_rows} linhas em {grid.cells} células; "
+                    f"{self.n_rows} linhas após outliers")
+        return self.feature_names
+    
+    def transform_chunk(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        """
+        Aplica a um bloco limpo (ver iter_clean_chunks) as estatísticas
+        ajustadas em fit_sample ou fit_streaming: imputação, outliers,
+        features derivadas e encoding
+        """
+        self.df = chunk
+        return self._quietly(
+            (self.handle_missing_values, {'medians': self.medians}),
+            (self.remove_outliers, {'bounds': self.outlier_bounds}),
+            (self.create_derived_features, {'price_per_sqm_median': self.price_per_sqm_median}),
+            (self.apply_encoding, {'feature_names': self.feature_names})
+        )
+    
+    def iter_processed_chunks(self, chunk_rows: int = 100_000):
+        """
+        Percorre os CSVs em blocos já processados (requer fit_sample ou fit_streaming)
+        
+        Args:
+            chunk_rows: Linhas lidas por bloco (antes do filtro de outliers)
+        
+        Yields:
+            (X, y) de cada bloco, com as colunas de feature_names
+        """
+        if getattr(self, 'feature_names', None) is None:
+            raise ValueError("Pipeline não ajustado. Execute fit_sample() ou fit_streaming() primeiro.")
+        for chunk in self.iter_clean_chunks(chunk_rows):
+            processed = self.transform_chunk(chunk)
+            if len(processed):
+                yield processed[self.feature_names], processed['rent_amount']
+    
     def get_features_and_target(self) -> tuple:
         """Retorna features (X) e target (y) separados"""
         if self.processed_df is None:
@@ -289,8 +1050,9 @@ class DataProcessor:
         if target_col not in self.processed_df.columns:
             raise ValueError(f"Coluna '{target_col}' não encontrada")
         
-        y = self.processed_df[target_col].copy()
-        X = self.processed_df.drop(target_col, axis=1).copy()
+        # Sem cópias explícitas: drop já cria um DataFrame novo e o treino não modifica y
+        y = self.processed_df[target_col]
+        X = self.processed_df.drop(target_col, axis=1)
         
         logger.info(f"Features shape: {X.shape}, Target shape: {y.shape}")
         return X, y
@@ -300,22 +1062,40 @@ class DataProcessor:
         return {
             'city_encoding': self.city_encoding_map,
             'neighborhood_encoding': self.neighborhood_encoding_map,
-            'mean_rent': float(self.mean_rent) if hasattr(self, 'mean_rent') else 0.0
+            'mean_rent': float(self.mean_rent) if hasattr(self, 'mean_rent') else 0.0,
+            # Contagens por trás das médias (permitem atualizar os mapeamentos
+            # com lotes novos, ver encode_incremental)
+            'city_counts': {k: int(v) for k, v in getattr(self, 'city_counts', {}).items()},
+            'neighborhood_counts': {k: int(v) for k, v in getattr(self, 'neighborhood_counts', {}).items()},
+            'n_rows': int(getattr(self, 'n_rows', 0))
         }
     
     def get_unique_values(self) -> dict:
         """Retorna valores únicos de features categóricas"""
-        unique_values = {}
+        # Streaming: valores coletados de todos os blocos em fit_sample
+        streamed = getattr(self, 'streamed_unique_values', None)
+        if streamed is not None:
+            names = {'city': 'cities', 'neighborhood': 'neighborhoods', 'property_type': 'property_types'}
+            return {names[col]: values for col, values in streamed.items() if values}
+        
+        # Valores coletados após select_features em process/process_batch (ou do cache)
+        selected = getattr(self, 'selected_unique_values', None)
+        if selected is not None:
+            return selected
         
         # Usar dados antes do encoding (após select_features mas antes de encode_categorical_features)
-        # Se já processamos, precisamos recarregar até o ponto de select_features
+        # Se ainda não processamos, carregar até o ponto de select_features
         if self.df is None or 'city' not in self.df.columns:
             # Recarregar até select_features
             self.load_data()
             self.filter_rental_properties()
             self.select_features()
         
-        # Agora self.df tem as colunas originais (city, neighborhood, property_type)
+        return self._unique_values()
+    
+    def _unique_values(self) -> dict:
+        """Valores únicos das colunas categóricas do DataFrame atual (após select_features)"""
+        unique_values = {}
         if 'city' in self.df.columns:
             cities = self.df['city'].dropna().unique().tolist()
             unique_values['cities'] = sorted([str(c) for c in cities if str(c) != 'nan'])
@@ -0,0 +1,218 @@
+"""
+Módulo de busca de hiperparâmetros do XGBoost (successive halving)
+
+As configurações são sorteadas do espaço de busca e avaliadas em rodadas
+("degraus") de custo crescente: todas começam com poucas rodadas de
+boosting, e só a melhor fração (1/eta) de cada degrau segue para o próximo,
+com eta vezes mais rodadas. Assim a maior parte do tempo vai para as
+configurações promissoras.
+
+As avaliações rodam em um pool de processos dentro de um orçamento de
+núcleos: cada processo constrói uma única vez a QuantileDMatrix de treino
+(features já quantizadas) e a de validação, reaproveitadas em todas as
+avaliações que executar.
+"""
+
+import logging
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Espaço de busca: (mínimo, máximo, escala)
+SEARCH_SPACE = {
+    'max_depth': (3, 10, 'int'),
+    'learning_rate': (0.02, 0.3, 'log'),
+    'subsample': (0.5, 1.0, 'linear'),
+    'colsample_bytree': (0.5, 1.0, 'linear'),
+    'min_child_weight': (1.0, 10.0, 'log')
+}
+
+# Configuração padrão da busca
+DEFAULT_CONFIGS = 27
+DEFAULT_MIN_ROUNDS = 25
+DEFAULT_MAX_ROUNDS = 600
+DEFAULT_ETA = 3
+
+# Rodadas sem melhora no MAE de validação antes de parar uma avaliação
+EARLY_STOPPING_ROUNDS = 10
+
+# Estado de cada processo do pool (construído uma vez por processo)
+_worker = {}
+
+
+def sample_config(rng: np.random.Generator) -> dict:
+    """Sorteia uma configuração do espaço de busca"""
+    config = {}
+    for name, (low, high, scale) in SEARCH_SPACE.items():
+        if scale == 'int':
+            config[name] = int(rng.integers(low, high + 1))
+        elif scale == 'log':
+            config[name] = float(np.exp(rng.uniform(np.log(low), np.log(high))))
+        else:
+            config[name] = float(rng.uniform(low, high))
+    return config
+
+
+def rung_rounds(min_rounds: int, max_rounds: int, eta: int) -> list:
+    """Rodadas de boosting de cada degrau (a última é sempre max_rounds)"""
+    rounds = []
+    current = min_rounds
+    while current < max_rounds:
+        rounds.append(current)
+        current *= eta
+    rounds.append(max_rounds)
+    return rounds
+
+
+def _init_worker(X_train, y_train, X_val, y_val, nthread: int, max_bin: int):
+    """
+    Inicializa um processo do pool: constrói as matrizes quantizadas
+
+    A quantização (cálculo dos cortes e dos índices dos bins) é feita uma
+    única vez por processo; a validação usa os cortes do treino (`ref`).
+    """
+    import xgboost as xgb
+
+    dtrain = xgb.QuantileDMatrix(X_train, y_train, max_bin=max_bin, nthread=nthread)
+    _worker['dtrain'] = dtrain
+    _worker['dval'] = xgb.QuantileDMatrix(X_val, y_val, ref=dtrain, nthread=nthread)
+    _worker['nthread'] = nthread
+    _worker['max_bin'] = max_bin
+
+
+def _evaluate(trial: dict) -> dict:
+    """
+    Treina e avalia uma configuração no processo do pool
+
+    Args:
+        trial: Identificador, degrau, rodadas e configuração
+
+    Returns:
+        O trial com o MAE de validação, as rodadas usadas e os tempos
+    """
+    import xgboost as xgb
+
+    params = {
+        'objective': 'reg:squarederror',
+        'eval_metric': 'mae',
+        'tree_method': 'hist',
+        'max_bin': _worker['max_bin'],
+        'nthread': _worker['nthread'],
+        'seed': 42,
+        **trial['config']
+    }
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    booster = xgb.train(
+        params, _worker['dtrain'], num_boost_round=trial['rounds'],
+        evals=[(_worker['dval'], 'val')], early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+        verbose_eval=False
+    )
+    return {
+        **trial,
+        'val_MAE': float(booster.best_score),
+        'best_rounds': int(booster.best_iteration) + 1,
+        'wall_s': time.perf_counter() - wall_start,
+        'cpu_s': time.process_time() - cpu_start,
+        'pid': os.getpid()
+    }
+
+
+def successive_halving(X_train, y_train, X_val, y_val, n_configs: int = DEFAULT_CONFIGS,
+                       min_rounds: int = DEFAULT_MIN_ROUNDS, max_rounds: int = DEFAULT_MAX_ROUNDS,
+                       eta: int = DEFAULT_ETA, cpus: int = None, max_bin: int = 256,
+                       seed: int = 42) -> dict:
+    """
+    Busca hiperparâmetros do XGBoost com successive halving
+
+    Args:
+        X_train, y_train: Conjunto de treino
+        X_val, y_val: Conjunto de validação (MAE usado na escolha)
+        n_configs: Configurações sorteadas no primeiro degrau
+        min_rounds: Rodadas de boosting do primeiro degrau
+        max_rounds: Rodadas de boosting do último degrau
+        eta: Fator de redução (1/eta das configurações sobe de degrau)
+        cpus: Orçamento de núcleos (se None, todos os da máquina)
+        max_bin: Bins da quantização das features
+        seed: Semente do sorteio das configurações
+
+    Returns:
+        Relatório: melhor configuração, degraus e todas as avaliações
+    """
+    cpus = max(1, cpus or os.cpu_count() or 1)
+    workers = min(cpus, n_configs)
+    nthread = max(1, cpus // workers)
+    rounds_per_rung = rung_rounds(min_rounds, max_rounds, eta)
+    rng = np.random.default_rng(seed)
+    survivors = [{'trial': i, 'config': sample_config(rng)} for i in range(n_configs)]
+
+    logger.info(f"Busca de hiperparâmetros: {n_configs} configurações, degraus {rounds_per_rung}, "
+                f"{workers} processos x {nthread} threads (orçamento: {cpus} núcleos)")
+
+    X_train = np.ascontiguousarray(X_train, dtype=np.float32)
+    X_val = np.ascontiguousarray(X_val, dtype=np.float32)
+    y_train = np.asarray(y_train, dtype=np.float32)
+    y_val = np.asarray(y_val, dtype=np.float32)
+
+    # 'spawn': processos novos, sem herdar o estado do OpenMP do processo pai
+    context = multiprocessing.get_context('spawn')
+    results = []
+    rungs = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                             initargs=(X_train, y_train, X_val, y_val, nthread, max_bin)) as pool:
+        for rung, rounds in enumerate(rounds_per_rung):
+            trials = [{**s, 'rung': rung, 'rounds': rounds} for s in survivors]
+            rung_start = time.perf_counter()
+            rung_results = list(pool.map(_evaluate, trials))
+            for r in rung_results:
+                logger.info(f"  degrau {rung} trial {r['trial']:>3}: MAE val R$ {r['val_MAE']:8.2f} "
+                            f"({r['best_rounds']}/{rounds} rodadas) em {r['wall_s']:.2f}s")
+            results.extend(rung_results)
+
+            ranked = sorted(rung_results, key=lambda r: r['val_MAE'])
+            keep = max(1, math.ceil(len(ranked) / eta))
+            rungs.append({
+                'rung': rung,
+                'rounds': rounds,
+                'trials': len(trials),
+                'wall_s': time.perf_counter() - rung_start,
+                'best_val_MAE': ranked[0]['val_MAE']
+            })
+            logger.info(f"Degrau {rung}: {len(trials)} configurações com {rounds} rodadas em "
+                        f"{rungs[-1]['wall_s']:.2f}s; melhor MAE val R$ {ranked[0]['val_MAE']:.2f}")
+            survivors = [{'trial': r['trial'], 'config': r['config']} for r in ranked[:keep]]
+
+    best = min((r for r in results if r['rung'] == len(rounds_per_rung) - 1), key=lambda r: r['val_MAE'])
+    wall_s = time.perf_counter() - start
+    cpu_s = sum(r['cpu_s'] for r in results)
+    logger.info(f"Melhor configuração (trial {best['trial']}): {best['config']}, "
+                f"{best['best_rounds']} rodadas, MAE val R$ {best['val_MAE']:.2f}")
+    logger.info(f"Busca concluída em {wall_s:.2f}s ({cpu_s:.2f}s de CPU nas avaliações)")
+
+    return {
+        'space': {name: list(spec) for name, spec in SEARCH_SPACE.items()},
+        'n_configs': n_configs,
+        'eta': eta,
+        'rounds_per_rung': rounds_per_rung,
+        'cpus': cpus,
+        'workers': workers,
+        'nthread': nthread,
+        'max_bin': max_bin,
+        'wall_s': wall_s,
+        'cpu_s': cpu_s,
+        'best': {
+            'trial': best['trial'],
+            'params': {**best['config'], 'n_estimators': best['best_rounds']},
+            'val_MAE': best['val_MAE']
+        },
+        'rungs': rungs,
+        'trials': [{k: v for k, v in r.items() if k != 'pid'} for r in results]
+    }
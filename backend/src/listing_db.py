@@ -0,0 +1,455 @@
+"""
+Módulo do armazenamento dos anúncios em SQLite
+
+Alternativa ao armazenamento em arrays (ver listing_store) para datasets
+maiores que a memória ou atualizados com frequência. Os anúncios limpos ficam
+em um arquivo SQLite local:
+
+    - tabela `listings`, com índices compostos em
+      (neighborhood, property_type, rent_amount) e em (area)
+    - tabela FTS5 `neighborhood_fts` (tokenizador trigram) com os nomes dos
+      bairros, para a busca por trecho do nome
+    - tabela `categories` com os valores distintos dos campos de texto e o
+      número de anúncios de cada um
+
+A chave primária `row_id` é o id estável do anúncio (ver
+listing_store.listing_ids). Os filtros de /data/properties viram consultas
+parametrizadas sobre os índices, com paginação por cursor (`row_id > ?`, uma
+busca na chave primária). Cada índice só é usado quando a consulta é coberta
+por ele ou a fração estimada de anúncios que ele seleciona (pelas contagens
+das categorias e pelos quantis da área) é pequena; filtros amplos percorrem a
+tabela na ordem de `row_id` e param ao completar a página, em vez de buscar e
+ordenar uma fração grande da tabela.
+As atualizações (upsert e delete) rodam em uma transação: os leitores veem o
+arquivo antes ou depois da atualização inteira.
+"""
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+
+import numpy as np
+
+import listing_store
+from model_registry import file_sha256
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Versão do formato do arquivo (2: ids derivados do conteúdo)
+DB_FORMAT_VERSION = 2
+
+# Nome padrão do arquivo (ao lado do snapshot, em data/)
+DB_NAME = "listings.db"
+
+# Anúncios inseridos por vez no build
+INSERT_ROWS = 50_000
+
+# Colunas da tabela `listings` (além de row_id), na ordem dos inserts
+COLUMNS = ['property_type', 'neighborhood', 'city'] + listing_store.NUMERIC_FIELDS + ['furnished', 'estimate']
+
+# Filtros de faixa: nome do filtro -> (coluna, operador)
+RANGE_FILTERS = {
+    'min_area': ('area', '>='),
+    'max_area': ('area', '<='),
+    'min_bedrooms': ('bedrooms', '>='),
+    'max_bedrooms': ('bedrooms', '<='),
+    'min_price': ('rent_amount', '>='),
+    'max_price': ('rent_amount', '<=')
+}
+
+# Colunas do índice composto (consultas só com elas são respondidas pelo índice)
+INDEX_COLUMNS = {'neighborhood', 'property_type', 'rent_amount'}
+
+# Fração estimada de anúncios selecionados abaixo da qual um índice é usado
+INDEX_FRACTION = 0.05
+
+# Quantis da área guardados nos metadados (estimativa dos filtros de área)
+AREA_QUANTILES = 100
+
+# Caracteres com significado especial nos padrões de texto (regex)
+REGEX_CHARS = set('.^$*+?{}[]\\|()')
+
+SCHEMA = """
+CREATE TABLE listings (
+    row_id INTEGER PRIMARY KEY,
+    property_type TEXT,
+    neighborhood TEXT,
+    city TEXT,
+    area REAL,
+    bedrooms INTEGER,
+    bathrooms INTEGER,
+    parking_spaces INTEGER,
+    hoa REAL,
+    rent_amount REAL,
+    furnished INTEGER,
+    estimate REAL
+);
+CREATE TABLE categories (
+    field TEXT NOT NULL,
+    value TEXT NOT NULL,
+    rows INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (field, value)
+) WITHOUT ROWID;
+CREATE VIRTUAL TABLE neighborhood_fts USING fts5(name, tokenize='trigram');
+CREATE TABLE meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+INDEXES = """
+CREATE INDEX idx_listings_neighborhood_type_rent ON listings (neighborhood, property_type, rent_amount);
+CREATE INDEX idx_listings_area ON listings (area);
+"""
+
+
+def rows_from_arrays(arrays: dict, start: int, stop: int) -> list:
+    """
+    Linhas da tabela `listings` a partir dos arrays do armazenamento (ver
+    listing_store.arrays_from_frame), com None nos valores ausentes
+    """
+    columns = [arrays['row_id'][start:stop].tolist()]
+    for name in COLUMNS:
+        if f'{name}.codes' in arrays:
+            categories = arrays[f'{name}.categories'].tolist()
+            columns.append([categories[code] if code >= 0 else None
+                            for code in arrays[f'{name}.codes'][start:stop].tolist()])
+        elif name in arrays:
+            values = arrays[name][start:stop]
+            if values.dtype.kind == 'f':
+                values = np.where(np.isnan(values), None, values.astype(object))
+            columns.append(values.tolist())
+        else:
+            columns.append([None] * (stop - start))
+    return list(zip(*columns))
+
+
+def write_rows(conn: sqlite3.Connection, arrays: dict):
+    """Insere (ou substitui) os anúncios"""
+    placeholders = ', '.join('?' * (len(COLUMNS) + 1))
+    n_rows = len(arrays['row_id'])
+    for start in range(0, n_rows, INSERT_ROWS):
+        conn.executemany(f"INSERT OR REPLACE INTO listings (row_id, {', '.join(COLUMNS)}) VALUES ({placeholders})",
+                         rows_from_arrays(arrays, start, min(start + INSERT_ROWS, n_rows)))
+
+
+def refresh_categories(conn: sqlite3.Connection):
+    """
+    Atualiza os valores distintos e as contagens de `categories` (e os nomes
+    de bairro da tabela FTS) a partir de `listings`
+
+    Valores sem anúncios ficam com contagem zero (os filtros não os usam).
+    """
+    conn.execute("UPDATE categories SET rows = 0")
+    for name in listing_store.CATEGORICAL_FIELDS:
+        counts = conn.execute(f"SELECT {name}, COUNT(*) FROM listings WHERE {name} IS NOT NULL GROUP BY {name}")
+        for value, rows in counts.fetchall():
+            inserted = conn.execute("INSERT OR IGNORE INTO categories (field, value, rows) VALUES (?, ?, ?)",
+                                    (name, value, rows)).rowcount
+            if inserted and name == 'neighborhood':
+                conn.execute("INSERT INTO neighborhood_fts (name) VALUES (?)", (value,))
+            elif not inserted:
+                conn.execute("UPDATE categories SET rows = ? WHERE field = ? AND value = ?", (rows, name, value))
+
+
+def write_meta(conn: sqlite3.Connection, meta: dict):
+    """Grava os metadados (chave -> valor em JSON)"""
+    conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                     [(key, json.dumps(value)) for key, value in meta.items()])
+
+
+def read_meta(path) -> dict:
+    """Metadados de um arquivo"""
+    conn = sqlite3.connect(Path(path).resolve().as_uri() + '?mode=ro', uri=True)
+    try:
+        meta = {key: json.loads(value) for key, value in conn.execute("SELECT key, value FROM meta")}
+    finally:
+        conn.close()
+    if meta.get('format') != DB_FORMAT_VERSION:
+        raise ValueError(f"Formato de banco de anúncios não suportado em {path}: {meta.get('format')}")
+    return meta
+
+
+def is_fresh(path, source, model_version: str = None) -> bool:
+    """
+    Se o banco corresponde ao snapshot de origem (mesmo conteúdo) e à versão
+    do modelo das estimativas
+
+    Args:
+        path: Caminho do banco
+        source: Snapshot de origem
+        model_version: Versão do modelo esperada (None: sem estimativas)
+    """
+    if not Path(path).exists():
+        return False
+    try:
+        meta = read_meta(path)
+    except (ValueError, sqlite3.Error) as e:
+        logger.warning(f"Banco de anúncios ilegível em {path}: {e}")
+        return False
+    return meta['model_version'] == model_version and meta['source_sha256'] == file_sha256(source)
+
+
+def build(frame, path, bundle=None, source=None) -> dict:
+    """
+    Grava o banco dos anúncios
+
+    Os anúncios são inseridos antes dos índices (mais rápido que manter os
+    índices a cada insert) em um arquivo temporário, renomeado no fim.
+
+    Args:
+        frame: Anúncios limpos (DataFrame do snapshot)
+        path: Caminho do arquivo
+        bundle: Versão do modelo para a estimativa de aluguel (opcional)
+        source: Snapshot de origem (registrado nos metadados, com o hash)
+
+    Returns:
+        Metadados gravados
+    """
+    path = Path(path)
+    arrays = listing_store.arrays_from_frame(frame)
+    if bundle is not None:
+        arrays['estimate'] = listing_store.estimate_rents(arrays, bundle)
+    area = arrays['area'][~np.isnan(arrays['area'])] if 'area' in arrays else np.empty(0)
+    meta = {
+        'format': DB_FORMAT_VERSION,
+        'rows': len(arrays['row_id']),
+        'model_version': None if bundle is None else bundle.version,
+        'source_sha256': None if source is None else file_sha256(source),
+        # Só para estimar a seletividade: não são atualizados por upsert/delete
+        'area_quantiles': np.quantile(area, np.linspace(0, 1, AREA_QUANTILES + 1)).tolist() if len(area) else None
+    }
+
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.unlink(missing_ok=True)
+    conn = sqlite3.connect(tmp)
+    try:
+        conn.executescript(SCHEMA)
+        with conn:
+            write_rows(conn, arrays)
+            write_meta(conn, meta)
+        conn.executescript(INDEXES)
+        with conn:
+            refresh_categories(conn)
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+    os.replace(tmp, path)
+    logger.info(f"Banco dos anúncios gravado: {path} ({meta['rows']} anúncios, "
+                f"{path.stat().st_size / 1024 ** 2:.1f} MB)")
+    return meta
+
+
+def upsert(path, frame, bundle=None) -> int:
+    """
+    Insere anúncios em uma transação
+
+    O id vem do conteúdo (ver listing_store.listing_ids): gravar de novo um
+    anúncio igual não o duplica. Um anúncio alterado ganha outro id; remova
+    o antigo com delete.
+
+    Args:
+        path: Caminho do banco
+        frame: Anúncios limpos
+        bundle: Versão do modelo das estimativas do banco (obrigatória se o
+            banco tiver estimativas)
+
+    Returns:
+        Número de anúncios gravados
+    """
+    meta = read_meta(path)
+    version = None if bundle is None else bundle.version
+    if version != meta['model_version']:
+        raise ValueError(f"Estimativas do banco pela versão {meta['model_version']}, não {version}")
+    arrays = listing_store.arrays_from_frame(frame)
+    if bundle is not None:
+        arrays['estimate'] = listing_store.estimate_rents(arrays, bundle)
+
+    conn = sqlite3.connect(path)
+    try:
+        with conn:
+            write_rows(conn, arrays)
+            refresh_categories(conn)
+            rows = conn.execute("SELECT COUNT(*) FROM listings").fetchone()[0]
+            write_meta(conn, {'rows': rows, 'source_sha256': None})
+    finally:
+        conn.close()
+    logger.info(f"{len(arrays['row_id'])} anúncios gravados em {path}")
+    return len(arrays['row_id'])
+
+
+def delete(path, row_ids) -> int:
+    """
+    Remove anúncios (pelo id) em uma transação
+
+    Returns:
+        Número de anúncios removidos
+    """
+    conn = sqlite3.connect(path)
+    try:
+        with conn:
+            removed = conn.executemany("DELETE FROM listings WHERE row_id = ?",
+                                       [(int(row_id),) for row_id in row_ids]).rowcount
+            refresh_categories(conn)
+            rows = conn.execute("SELECT COUNT(*) FROM listings").fetchone()[0]
+            write_meta(conn, {'rows': rows, 'source_sha256': None})
+    finally:
+        conn.close()
+    logger.info(f"{removed} anúncios removidos de {path}")
+    return removed
+
+
+class ListingDB:
+    """Anúncios em SQLite, com filtros e paginação por consultas indexadas"""
+
+    def __init__(self, path):
+        """
+        Abre o banco somente leitura
+
+        Args:
+            path: Caminho do arquivo
+        """
+        self.path = Path(path)
+        self.uri = self.path.resolve().as_uri() + '?mode=ro'
+        # Uma conexão por thread (o sqlite3 não compartilha conexões entre threads)
+        self._local = threading.local()
+        self.meta = read_meta(self.path)
+        conn = self._connection()
+        # Valores distintos das categorias e seus anúncios (poucos: lidos uma vez)
+        self.category_rows = {name: {} for name in listing_store.CATEGORICAL_FIELDS}
+        for field, value, rows in conn.execute("SELECT field, value, rows FROM categories WHERE rows > 0"):
+            self.category_rows.setdefault(field, {})[value] = rows
+        self.categories = {name: list(rows) for name, rows in self.category_rows.items()}
+
+    def _connection(self) -> sqlite3.Connection:
+        """Conexão somente leitura da thread atual"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.uri, uri=True)
+            self._local.conn = conn
+        return conn
+
+    def __len__(self) -> int:
+        return self.meta['rows']
+
+    @property
+    def has_estimates(self) -> bool:
+        """Se o banco tem a estimativa de aluguel do modelo"""
+        return self.meta['model_version'] is not None
+
+    def _category_values(self, name: str, pattern: str) -> list:
+        """
+        Valores de um campo de texto que casam com o padrão (busca sem
+        diferenciar maiúsculas, como str.contains do pandas)
+
+        Trechos simples de bairro (3 ou mais caracteres, sem regex) usam a
+        tabela FTS; os demais padrões são comparados com os valores distintos.
+        """
+        regex = re.compile(pattern, re.IGNORECASE)
+        if name == 'neighborhood' and len(pattern) >= 3 and not REGEX_CHARS.intersection(pattern):
+            phrase = '"' + pattern.replace('"', '""') + '"'
+            candidates = [value for (value,) in self._connection().execute(
+                "SELECT name FROM neighborhood_fts WHERE neighborhood_fts MATCH ?", (phrase,))]
+        else:
+            candidates = self.categories.get(name, [])
+        rows = self.category_rows.get(name, {})
+        return [value for value in candidates if value in rows and regex.search(value) is not None]
+
+    def _where(self, filters: dict) -> tuple:
+        """
+        Cláusula WHERE parametrizada dos filtros
+
+        Cada índice só é usado quando a consulta é coberta por ele ou seletiva
+        (fração estimada até INDEX_FRACTION): o composto, com filtro de bairro
+        (fração pelas contagens das categorias); o de área, com filtro de área
+        (fração pelos quantis). Os termos sem índice levam `+` (o SQLite não
+        usa índice para eles); sem nenhum índice, a tabela é percorrida na
+        ordem de `row_id`, parando ao completar a página.
+
+        Returns:
+            (lista de condições, parâmetros), ou None se nenhum anúncio passa
+        """
+        values = {}
+        for name in listing_store.CATEGORICAL_FIELDS:
+            if filters.get(name):
+                values[name] = self._category_values(name, filters[name])
+                if not values[name]:
+                    return None
+        columns = set(values) | {RANGE_FILTERS[name][0] for name in RANGE_FILTERS if name in filters}
+        fraction = 1.0
+        for name, selected in values.items():
+            rows = self.category_rows[name]
+            fraction *= sum(rows[value] for value in selected) / max(sum(rows.values()), 1)
+        indexed = set()
+        if 'neighborhood' in values and (columns <= INDEX_COLUMNS or fraction <= INDEX_FRACTION):
+            indexed |= INDEX_COLUMNS
+        if 'area' in columns and (columns == {'area'} or self._area_fraction(filters) <= INDEX_FRACTION):
+            indexed.add('area')
+
+        conditions, params = [], []
+        for name, selected in values.items():
+            prefix = '' if name in indexed else '+'
+            conditions.append(f"{prefix}{name} IN ({', '.join('?' * len(selected))})")
+            params.extend(selected)
+        for name, (column, operator) in RANGE_FILTERS.items():
+            if name in filters:
+                prefix = '' if column in indexed else '+'
+                conditions.append(f"{prefix}{column} {operator} ?")
+                params.append(filters[name])
+        return conditions, params
+
+    def _area_fraction(self, filters: dict) -> float:
+        """Fração estimada de anúncios nos filtros de área (pelos quantis)"""
+        quantiles = self.meta.get('area_quantiles')
+        if not quantiles:
+            return 1.0
+        positions = np.linspace(0, 1, len(quantiles))
+        low = np.interp(filters['min_area'], quantiles, positions) if 'min_area' in filters else 0.0
+        high = np.interp(filters['max_area'], quantiles, positions) if 'max_area' in filters else 1.0
+        return max(float(high - low), 0.0)
+
+    def query(self, filters: dict = None, offset: int = 0, limit: int = 1000, after: int = None) -> tuple:
+        """
+        Filtra e pagina os anúncios (em ordem de `row_id`)
+
+        Args:
+            filters: Filtros: `property_type` e `neighborhood` (padrões de
+                texto) e os de RANGE_FILTERS (valores numéricos)
+            offset: Posição do primeiro anúncio retornado, entre os filtrados
+                (a partir do cursor `after`, se informado)
+            limit: Máximo de anúncios retornados
+            after: Cursor: a página começa no primeiro anúncio com `row_id`
+                maior que este (busca na chave primária)
+
+        Returns:
+            (total de anúncios filtrados, lista de anúncios da página)
+        """
+        where = self._where(filters or {})
+        if where is None:
+            return 0, []
+        conditions, params = where
+        conn = self._connection()
+        clause = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        total = conn.execute(f"SELECT COUNT(*) FROM listings{clause}", params).fetchone()[0]
+
+        if after is not None:
+            conditions = conditions + ["row_id > ?"]
+            params = params + [int(after)]
+        clause = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        cursor = conn.execute(
+            f"SELECT row_id, {', '.join(COLUMNS)} FROM listings{clause} ORDER BY row_id LIMIT ? OFFSET ?",
+            params + [max(limit, 0), max(offset, 0)]
+        )
+        names = ['row_id'] + COLUMNS
+        properties = []
+        for row in cursor:
+            record = dict(zip(names, row))
+            if not self.has_estimates:
+                record.pop('estimate')
+            properties.append(listing_store.format_listing(record))
+        return total, properties
@@ -0,0 +1,466 @@
+"""
+Módulo do armazenamento dos anúncios para as consultas da API
+
+Os endpoints de anúncios filtram e paginam todas as linhas a cada chamada.
+Com um DataFrame por processo, a memória de cada worker da API cresce com o
+tamanho do dataset (e o total, com o número de workers). Aqui os anúncios
+ficam em um arquivo struct-of-arrays (um array por campo, .npz sem
+compressão) que cada worker mapeia em memória somente leitura:
+
+    - campos numéricos (área, quartos, aluguel, estimativa do modelo, ...)
+      no menor tipo que representa os valores exatamente
+    - campos categóricos como códigos inteiros pequenos, ao lado dos valores
+      distintos (os filtros de texto comparam só as categorias)
+    - id estável de cada anúncio (o `id` da API), derivado do conteúdo; os
+      arrays ficam em ordem de id, e o cursor de paginação é uma busca binária
+
+As páginas do arquivo ficam no page cache do sistema operacional e são
+compartilhadas entre os processos. Os filtros percorrem os arrays em blocos
+de BLOCK_ROWS linhas, então a memória própria de cada consulta não depende do
+tamanho do dataset; só as linhas da página pedida são materializadas.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+import model_io
+from model_registry import file_sha256
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Versão do formato do arquivo (2: ids derivados do conteúdo)
+STORE_FORMAT_VERSION = 2
+
+# Nome padrão do arquivo (ao lado do snapshot, em data/)
+STORE_NAME = "listings_store.npz"
+
+# Campos guardados
+NUMERIC_FIELDS = ['area', 'bedrooms', 'bathrooms', 'parking_spaces', 'hoa', 'rent_amount']
+CATEGORICAL_FIELDS = ['property_type', 'neighborhood', 'city']
+
+# Campos que identificam um anúncio (os da resposta da API)
+ID_FIELDS = CATEGORICAL_FIELDS + NUMERIC_FIELDS + ['furnished']
+
+# Bits dos ids (inteiros exatos em JSON/JavaScript)
+ID_BITS = 53
+
+# Linhas avaliadas por vez nos filtros e nas estimativas
+BLOCK_ROWS = 262_144
+
+# Conjuntos de filtros com o total guardado (os mais recentes)
+TOTALS_CACHE_SIZE = 256
+
+# Filtros de faixa: nome do filtro -> (campo, comparação)
+RANGE_FILTERS = {
+    'min_area': ('area', np.greater_equal),
+    'max_area': ('area', np.less_equal),
+    'min_bedrooms': ('bedrooms', np.greater_equal),
+    'max_bedrooms': ('bedrooms', np.less_equal),
+    'min_price': ('rent_amount', np.greater_equal),
+    'max_price': ('rent_amount', np.less_equal)
+}
+
+# Valores da resposta para campos ausentes
+DEFAULTS = {
+    'property_type': 'Desconhecido',
+    'neighborhood': 'Desconhecido',
+    'city': 'Brasília',
+    'area': 0,
+    'bedrooms': 0,
+    'bathrooms': 1,
+    'parking_spaces': 0,
+    'hoa': 0,
+    'rent_amount': 0
+}
+
+
+def format_listing(record: dict) -> dict:
+    """
+    Anúncio no formato da API
+
+    Args:
+        record: Campo -> valor (campos ausentes, None e NaN recebem DEFAULTS)
+    """
+    def value(name, cast):
+        raw = record.get(name)
+        if raw is None or raw != raw:  # ausente ou NaN
+            return cast(DEFAULTS[name])
+        return cast(raw)
+
+    prop = {
+        'id': int(record['row_id']),
+        'property_type': value('property_type', str),
+        'neighborhood': value('neighborhood', str),
+        'area': value('area', float),
+        'bedrooms': value('bedrooms', int),
+        'bathrooms': value('bathrooms', int),
+        'parking_spaces': value('parking_spaces', int),
+        'hoa': value('hoa', float),
+        'furnished': bool(record.get('furnished') or False),
+        'rent_amount': value('rent_amount', float),
+        'city': value('city', str)
+    }
+    if record.get('estimate') is not None:
+        prop['estimated_rent'] = round(float(record['estimate']), 2)
+    return prop
+
+
+def compact(values) -> np.ndarray:
+    """
+    Menor tipo que representa os valores exatamente
+
+    Inteiros (ou floats inteiros, sem ausentes) vão para int8/int16/int32;
+    floats vão para float32 quando todos os valores são representáveis.
+    """
+    values = np.asarray(values)
+    if values.dtype.kind == 'f':
+        present = ~np.isnan(values)
+        if len(values) and present.all() and (values == np.round(values)).all():
+            values = values.astype(np.int64)
+        else:
+            compact32 = values.astype(np.float32)
+            return compact32 if ((compact32 == values) | ~present).all() else values
+    if values.dtype.kind in 'iu':
+        for dtype in (np.int8, np.int16, np.int32):
+            info = np.iinfo(dtype)
+            if len(values) == 0 or (values.min() >= info.min and values.max() <= info.max):
+                return values.astype(dtype)
+    return values
+
+
+def listing_ids(frame) -> np.ndarray:
+    """
+    Ids estáveis dos anúncios, derivados do conteúdo
+
+    O id é o hash BLAKE2b dos campos do anúncio (ID_FIELDS, já limpos),
+    truncado em ID_BITS bits: não depende da posição no CSV nem dos outros
+    anúncios, então continua o mesmo quando o CSV é reordenado ou ganha
+    linhas, ou quando os filtros mudam. Anúncios idênticos recebem ids
+    diferentes pela ordem de ocorrência (o n-ésimo repetido entra no hash).
+
+    Args:
+        frame: Anúncios limpos (DataFrame do snapshot ou de DataProcessor.clean)
+    """
+    # Texto de cada campo (cada valor distinto é formatado uma vez)
+    columns = []
+    for name in ID_FIELDS:
+        if name not in frame.columns:
+            columns.append([''] * len(frame))
+            continue
+        if name in CATEGORICAL_FIELDS:
+            categorical = frame[name].astype('category').cat
+            texts = [str(category) for category in categorical.categories] + ['']
+            codes = categorical.codes.to_numpy()
+        else:
+            values = frame[name].to_numpy(dtype=np.float64, na_value=np.nan)
+            uniques, codes = np.unique(values, return_inverse=True)
+            texts = ['' if value != value else repr(value) for value in uniques.tolist()]
+        columns.append([texts[code] for code in codes.tolist()])
+
+    def digest(content: str, occurrence: int) -> bytes:
+        return hashlib.blake2b(f'{content}\x1e{occurrence}'.encode(), digest_size=8).digest()
+
+    contents = ['\x1f'.join(fields) for fields in zip(*columns)]
+    occurrences = {}
+    digests = []
+    for content in contents:
+        occurrence = occurrences.get(content, 0)
+        occurrences[content] = occurrence + 1
+        digests.append(digest(content, occurrence))
+    ids = (np.frombuffer(b''.join(digests), dtype='>u8') >> np.uint64(64 - ID_BITS)).astype(np.int64)
+
+    ordered = np.sort(ids)
+    if (ordered[1:] == ordered[:-1]).any():
+        # Colisão entre conteúdos diferentes (improvável): refaz em sequência,
+        # passando para a próxima ocorrência do conteúdo até um id livre (sem
+        # colisão, o resultado é o mesmo do cálculo acima)
+        used = set()
+        occurrences = {}
+        for i, content in enumerate(contents):
+            occurrence = occurrences.get(content, 0)
+            while True:
+                listing_id = int.from_bytes(digest(content, occurrence), 'big') >> (64 - ID_BITS)
+                occurrence += 1
+                if listing_id not in used:
+                    break
+            occurrences[content] = occurrence
+            used.add(listing_id)
+            ids[i] = listing_id
+    return ids
+
+
+def arrays_from_frame(frame) -> dict:
+    """
+    Arrays do armazenamento a partir dos anúncios limpos (DataFrame do
+    snapshot ou de DataProcessor.clean), em ordem de id (ver listing_ids)
+    """
+    ids = listing_ids(frame)
+    order = np.argsort(ids, kind='stable')
+    frame = frame.iloc[order]
+    arrays = {'row_id': ids[order]}
+    for name in NUMERIC_FIELDS:
+        if name in frame.columns:
+            arrays[name] = compact(frame[name].to_numpy(dtype=np.float64, na_value=np.nan))
+    if 'furnished' in frame.columns:
+        arrays['furnished'] = frame['furnished'].to_numpy(dtype=bool)
+    for name in CATEGORICAL_FIELDS:
+        if name in frame.columns:
+            categorical = frame[name].astype('category').cat
+            arrays[f'{name}.codes'] = compact(categorical.codes.to_numpy())
+            arrays[f'{name}.categories'] = np.asarray([str(c) for c in categorical.categories], dtype=str)
+    return arrays
+
+
+def estimate_rents(arrays: dict, bundle, block_rows: int = BLOCK_ROWS) -> np.ndarray:
+    """
+    Aluguel estimado de cada anúncio por uma versão do modelo, em blocos
+
+    Args:
+        arrays: Arrays do armazenamento (ver arrays_from_frame)
+        bundle: Versão do modelo (model_pool.ModelBundle)
+        block_rows: Anúncios avaliados por vez
+    """
+    n_rows = len(arrays['row_id'])
+    estimates = np.empty(n_rows, dtype=np.float32)
+    for start in range(0, n_rows, block_rows):
+        stop = min(start + block_rows, n_rows)
+        columns = {name: arrays[name][start:stop] for name in NUMERIC_FIELDS + ['furnished'] if name in arrays}
+        for name in CATEGORICAL_FIELDS:
+            if f'{name}.codes' in arrays:
+                columns[name] = (arrays[f'{name}.codes'][start:stop], arrays[f'{name}.categories'].tolist())
+        estimates[start:stop] = bundle.predict(bundle.prepare_feature_matrix(columns, stop - start))
+    return estimates
+
+
+def save(arrays: dict, path, meta: dict):
+    """Grava o armazenamento (arquivo temporário renomeado no fim)"""
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    meta = {'format': STORE_FORMAT_VERSION, 'rows': len(arrays['row_id']), **meta}
+    model_io.save_npz(tmp, {**arrays, 'meta': np.asarray(json.dumps(meta))})
+    os.replace(tmp, path)
+    logger.info(f"Armazenamento dos anúncios gravado: {path} ({meta['rows']} anúncios, "
+                f"{path.stat().st_size / 1024 ** 2:.1f} MB)")
+    return meta
+
+
+def read_meta(path) -> dict:
+    """Metadados de um armazenamento"""
+    meta = json.loads(model_io.load_npz(path)['meta'].item())
+    if meta.get('format') != STORE_FORMAT_VERSION:
+        raise ValueError(f"Formato de armazenamento não suportado em {path}: {meta.get('format')}")
+    return meta
+
+
+def is_fresh(path, source, model_version: str = None) -> bool:
+    """
+    Se o armazenamento corresponde ao snapshot de origem (mesmo conteúdo) e
+    à versão do modelo das estimativas
+
+    Args:
+        path: Caminho do armazenamento
+        source: Snapshot de origem
+        model_version: Versão do modelo esperada (None: sem estimativas)
+    """
+    if not Path(path).exists():
+        return False
+    try:
+        meta = read_meta(path)
+    except (ValueError, KeyError, OSError) as e:
+        logger.warning(f"Armazenamento ilegível em {path}: {e}")
+        return False
+    return meta['model_version'] == model_version and meta['source_sha256'] == file_sha256(source)
+
+
+def build(frame, path, bundle=None, source=None) -> dict:
+    """
+    Grava o armazenamento dos anúncios
+
+    Args:
+        frame: Anúncios limpos (DataFrame do snapshot)
+        path: Caminho do arquivo
+        bundle: Versão do modelo para a estimativa de aluguel (opcional)
+        source: Snapshot de origem (registrado nos metadados, com o hash)
+
+    Returns:
+        Metadados gravados
+    """
+    arrays = arrays_from_frame(frame)
+    if bundle is not None:
+        arrays['estimate'] = estimate_rents(arrays, bundle)
+    return save(arrays, path, {
+        'model_version': None if bundle is None else bundle.version,
+        'source_sha256': None if source is None else file_sha256(source)
+    })
+
+
+class ListingStore:
+    """Anúncios em arrays por campo, com filtros e paginação sem DataFrame"""
+
+    def __init__(self, arrays: dict, meta: dict = None):
+        """
+        Inicializa o armazenamento
+
+        Args:
+            arrays: Arrays por campo (ver arrays_from_frame), em memória ou mapeados
+            meta: Metadados do arquivo
+        """
+        self.arrays = arrays
+        self.meta = meta or {}
+        self.n_rows = len(arrays['row_id'])
+        # Valores distintos das categorias (poucos: lidos uma vez)
+        self.categories = {name: arrays[f'{name}.categories'].tolist()
+                           for name in CATEGORICAL_FIELDS if f'{name}.categories' in arrays}
+        # Totais por conjunto de filtros (ver count)
+        self._totals = OrderedDict()
+        self._totals_lock = threading.Lock()
+
+    @classmethod
+    def open(cls, path, mmap: bool = True) -> 'ListingStore':
+        """Abre um arquivo, mapeando os arrays em memória (somente leitura)"""
+        arrays = model_io.load_npz(path, mmap=mmap)
+        meta = json.loads(arrays.pop('meta').item())
+        if meta.get('format') != STORE_FORMAT_VERSION:
+            raise ValueError(f"Formato de armazenamento não suportado em {path}: {meta.get('format')}")
+        return cls(arrays, meta)
+
+    @classmethod
+    def from_frame(cls, frame) -> 'ListingStore':
+        """Armazenamento em memória a partir dos anúncios limpos (sem arquivo)"""
+        return cls(arrays_from_frame(frame))
+
+    def __len__(self) -> int:
+        return self.n_rows
+
+    @property
+    def has_estimates(self) -> bool:
+        """Se o armazenamento tem a estimativa de aluguel do modelo"""
+        return 'estimate' in self.arrays
+
+    def _category_lookup(self, name: str, pattern: str) -> np.ndarray:
+        """
+        Tabela código -> casa com o padrão (busca sem diferenciar maiúsculas,
+        como str.contains do pandas); a última posição é o código -1 (ausente)
+        """
+        regex = re.compile(pattern, re.IGNORECASE)
+        categories = self.categories.get(name, [])
+        return np.array([regex.search(category) is not None for category in categories] + [False], dtype=bool)
+
+    def _block_mask(self, start: int, stop: int, lookups: dict, ranges: dict) -> np.ndarray:
+        """Linhas de um bloco que passam nos filtros"""
+        mask = np.ones(stop - start, dtype=bool)
+        for name, lookup in lookups.items():
+            if f'{name}.codes' in self.arrays:
+                mask &= lookup[self.arrays[f'{name}.codes'][start:stop]]
+            else:
+                mask[:] = False
+        for name, (field, compare, value) in ranges.items():
+            if field in self.arrays:
+                # Ausentes (NaN) não passam em nenhuma comparação
+                mask &= compare(self.arrays[field][start:stop], value)
+            else:
+                mask[:] = False
+        return mask
+
+    def _compile(self, filters: dict) -> tuple:
+        """Tabelas dos filtros de texto e comparações dos filtros de faixa"""
+        lookups = {name: self._category_lookup(name, filters[name])
+                   for name in CATEGORICAL_FIELDS if filters.get(name)}
+        ranges = {name: (*RANGE_FILTERS[name], filters[name]) for name in RANGE_FILTERS if name in filters}
+        return lookups, ranges
+
+    def count(self, filters: dict = None) -> int:
+        """
+        Total de anúncios filtrados
+
+        O total é guardado por conjunto de filtros (os arrays não mudam
+        enquanto o arquivo está aberto): a paginação pelas páginas seguintes
+        não percorre os arrays de novo para contar.
+
+        Args:
+            filters: Filtros (ver query)
+        """
+        filters = filters or {}
+        key = tuple(sorted(filters.items()))
+        with self._totals_lock:
+            if key in self._totals:
+                self._totals.move_to_end(key)
+                return self._totals[key]
+
+        lookups, ranges = self._compile(filters)
+        if not lookups and not ranges:
+            total = self.n_rows
+        else:
+            total = sum(int(np.count_nonzero(self._block_mask(start, min(start + BLOCK_ROWS, self.n_rows),
+                                                              lookups, ranges)))
+                        for start in range(0, self.n_rows, BLOCK_ROWS))
+
+        with self._totals_lock:
+            self._totals[key] = total
+            if len(self._totals) > TOTALS_CACHE_SIZE:
+                self._totals.popitem(last=False)
+        return total
+
+    def query(self, filters: dict = None, offset: int = 0, limit: int = 1000, after: int = None) -> tuple:
+        """
+        Filtra e pagina os anúncios (em ordem de `row_id`)
+
+        A página é buscada a partir do cursor (ou do início, sem cursor) e a
+        varredura para assim que tem `limit` anúncios; o total vem de `count`.
+
+        Args:
+            filters: Filtros: `property_type` e `neighborhood` (padrões de
+                texto) e os de RANGE_FILTERS (valores numéricos)
+            offset: Posição do primeiro anúncio retornado, entre os filtrados
+                (a partir do cursor `after`, se informado)
+            limit: Máximo de anúncios retornados
+            after: Cursor: a página começa no primeiro anúncio com `row_id`
+                maior que este (busca binária: `row_id` é crescente)
+
+        Returns:
+            (total de anúncios filtrados, lista de anúncios da página)
+        """
+        filters = filters or {}
+        lookups, ranges = self._compile(filters)
+        start_position = 0 if after is None else int(np.searchsorted(self.arrays['row_id'], after, side='right'))
+
+        if not lookups and not ranges:
+            first = min(start_position + offset, self.n_rows)
+            positions = np.arange(first, min(first + limit, self.n_rows))
+            return self.count(filters), self.rows(positions)
+
+        page = []
+        skip, needed = offset, limit
+        for start in range(start_position, self.n_rows, BLOCK_ROWS):
+            if needed <= 0:
+                break
+            stop = min(start + BLOCK_ROWS, self.n_rows)
+            matched = start + np.flatnonzero(self._block_mask(start, stop, lookups, ranges))
+            if skip >= len(matched):
+                skip -= len(matched)
+                continue
+            matched = matched[skip:skip + needed]
+            skip = 0
+            page.append(matched)
+            needed -= len(matched)
+        positions = np.concatenate(page) if page else np.empty(0, dtype=np.int64)
+        return self.count(filters), self.rows(positions)
+
+    def rows(self, positions: np.ndarray) -> list:
+        """Anúncios nas posições informadas, no formato da API"""
+        columns = {name: self.arrays[name][positions].tolist()
+                   for name in ['row_id'] + NUMERIC_FIELDS + ['furnished', 'estimate'] if name in self.arrays}
+        for name, categories in self.categories.items():
+            codes = self.arrays[f'{name}.codes'][positions].tolist()
+            columns[name] = [categories[code] if code >= 0 else None for code in codes]
+        return [format_listing({name: values[i] for name, values in columns.items()})
+                for i in range(len(positions))]
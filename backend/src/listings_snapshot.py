@@ -0,0 +1,171 @@
+"""
+Módulo do snapshot colunar dos anúncios
+
+O treino (DataProcessor) e a API (/data/properties) leem os mesmos anúncios.
+Em vez de cada um interpretar o CSV separado por ';' com a sua própria
+limpeza, um passo de build (build_dataset.py) grava um snapshot limpo e
+tipado, lido pelos dois:
+
+    - limpeza única: `DataProcessor.clean` (filtro de aluguel, colunas
+      renomeadas para os nomes do pipeline, tipos convertidos)
+    - formato colunar: um .npz sem compressão (o mesmo formato dos artefatos
+      do modelo, ver model_io), com um array por coluna. Colunas de texto
+      são gravadas como categorias (códigos inteiros + valores distintos)
+    - leitura com projeção de colunas e mapeamento em memória: só as colunas
+      pedidas são lidas, direto do arquivo, sem parsing
+
+Arrays do snapshot:
+
+    - columns/<coluna>: valores de uma coluna numérica ou booleana
+    - columns/<coluna>.codes e columns/<coluna>.categories: coluna categórica
+    - index: posição de cada anúncio no CSV de origem (só o índice do
+      DataFrame lido; os ids da API são derivados do conteúdo, ver
+      listing_store.listing_ids)
+    - meta: JSON com versão do formato, colunas, origem e versão do pipeline
+"""
+
+import json
+import logging
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import model_io
+from model_registry import file_sha256
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Versão do formato do snapshot
+SNAPSHOT_FORMAT_VERSION = 1
+
+# Nome padrão do snapshot (ao lado do CSV de origem, em data/)
+SNAPSHOT_NAME = "listings.npz"
+
+
+def is_snapshot(path) -> bool:
+    """Se o caminho é um snapshot (e não um CSV)"""
+    return Path(path).suffix == '.npz'
+
+
+def save(frame: pd.DataFrame, path, source=None, pipeline_version: int = None) -> dict:
+    """
+    Grava um DataFrame limpo como snapshot (arquivo temporário renomeado no
+    fim: leitores com o snapshot anterior mapeado não são afetados)
+
+    Args:
+        frame: DataFrame limpo (colunas numéricas, booleanas ou de texto)
+        path: Caminho do snapshot (.npz)
+        source: CSV de origem (registrado nos metadados, com o hash)
+        pipeline_version: Versão do pipeline que limpou os dados
+
+    Returns:
+        Metadados gravados
+    """
+    arrays = {}
+    for col in frame.columns:
+        series = frame[col]
+        if pd.api.types.is_numeric_dtype(series.dtype) or pd.api.types.is_bool_dtype(series.dtype):
+            arrays[f'columns/{col}'] = series.to_numpy()
+        else:
+            categorical = pd.Categorical(series)
+            arrays[f'columns/{col}.codes'] = categorical.codes
+            arrays[f'columns/{col}.categories'] = np.asarray([str(c) for c in categorical.categories], dtype=str)
+    arrays['index'] = frame.index.to_numpy(dtype=np.int64)
+
+    meta = {
+        'format': SNAPSHOT_FORMAT_VERSION,
+        'columns': list(frame.columns),
+        'rows': len(frame),
+        'pipeline_version': pipeline_version,
+        'source': None if source is None else Path(source).name,
+        'source_sha256': None if source is None else file_sha256(source)
+    }
+    arrays['meta'] = np.asarray(json.dumps(meta))
+
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    model_io.save_npz(tmp, arrays)
+    os.replace(tmp, path)
+    logger.info(f"Snapshot gravado: {path} ({len(frame)} anúncios, {path.stat().st_size / 1024 ** 2:.1f} MB)")
+    return meta
+
+
+def read_meta(path) -> dict:
+    """Metadados de um snapshot"""
+    meta = json.loads(model_io.load_npz(path)['meta'].item())
+    if meta.get('format') != SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(f"Formato de snapshot não suportado em {path}: {meta.get('format')}")
+    return meta
+
+
+def load(path, columns: list = None, mmap: bool = True) -> pd.DataFrame:
+    """
+    Lê um snapshot
+
+    Args:
+        path: Caminho do snapshot
+        columns: Colunas a ler (as ausentes no snapshot são ignoradas); se
+            None, todas
+        mmap: Se True, as colunas numéricas são mapeadas em memória (somente
+            leitura) em vez de copiadas
+
+    Returns:
+        DataFrame com as colunas pedidas, indexado pela posição no CSV de origem
+    """
+    arrays = model_io.load_npz(path, mmap=mmap)
+    meta = json.loads(arrays['meta'].item())
+    if meta.get('format') != SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(f"Formato de snapshot não suportado em {path}: {meta.get('format')}")
+
+    names = meta['columns'] if columns is None else [col for col in columns if col in meta['columns']]
+    data = {}
+    for col in names:
+        if f'columns/{col}.codes' in arrays:
+            data[col] = pd.Categorical.from_codes(np.asarray(arrays[f'columns/{col}.codes']),
+                                                  categories=arrays[f'columns/{col}.categories'].tolist())
+        else:
+            data[col] = arrays[f'columns/{col}']
+    # copy=False: as colunas continuam apontando para o arquivo mapeado
+    return pd.DataFrame(data, index=pd.Index(arrays['index']), copy=False)
+
+
+def is_fresh(path, source, pipeline_version: int) -> bool:
+    """
+    Se o snapshot corresponde ao CSV de origem (mesmo conteúdo) e à versão
+    atual do pipeline
+
+    Args:
+        path: Caminho do snapshot
+        source: CSV de origem
+        pipeline_version: Versão atual do pipeline
+    """
+    if not Path(path).exists():
+        return False
+    try:
+        meta = read_meta(path)
+    except (ValueError, KeyError, OSError) as e:
+        logger.warning(f"Snapshot ilegível em {path}: {e}")
+        return False
+    return meta['pipeline_version'] == pipeline_version and meta['source_sha256'] == file_sha256(source)
+
+
+def build(source, path) -> dict:
+    """
+    Limpa um CSV de anúncios e grava o snapshot
+
+    Args:
+        source: CSV de origem (formato imoveis-df.csv ou dataZAP.csv)
+        path: Caminho do snapshot
+
+    Returns:
+        Metadados gravados
+    """
+    # Importado aqui: data_processing lê snapshots com este módulo
+    from data_processing import DataProcessor
+
+    processor = DataProcessor(str(source))
+    frame = processor.clean()
+    return save(frame, path, source=source, pipeline_version=DataProcessor.PIPELINE_VERSION)
@@ -0,0 +1,234 @@
+"""
+Módulo de backends de modelo (algoritmos de regressão) do ModelTrainer
+
+Cada backend sabe construir, treinar e salvar um tipo de modelo, de forma
+que o mesmo pipeline (preparação, avaliação, registro) sirva para o XGBoost,
+para o HistGradientBoostingRegressor do scikit-learn e para um baseline
+linear (Ridge).
+"""
+
+import logging
+import pickle
+
+import numpy as np
+
+import model_io
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Parâmetros do XGBoost usados em produção até aqui
+XGBOOST_PARAMS = {
+    'objective': 'reg:squarederror',
+    'n_estimators': 100,
+    'max_depth': 6,
+    'learning_rate': 0.1,
+    'subsample': 0.8,
+    'colsample_bytree': 0.8,
+    'random_state': 42,
+    'n_jobs': -1
+}
+
+
+class ModelBackend:
+    """Interface de um backend de modelo"""
+
+    # Nome do backend (registrado nos metadados)
+    name = None
+    # Formato do artefato do modelo e extensão do arquivo
+    model_format = model_io.MODEL_FORMAT_PICKLE
+    suffix = '.pkl'
+    # Se o modelo pode ser exportado para ONNX (onnx_backend)
+    supports_onnx = False
+
+    def build(self, early_stopping: bool = True):
+        """
+        Cria o estimador (não treinado)
+
+        Args:
+            early_stopping: Se False, cria o estimador sem early stopping
+                (ex: validação cruzada, sem conjunto de validação)
+        """
+        raise NotImplementedError
+
+    def fit(self, X_train, y_train, X_val, y_val):
+        """
+        Treina o estimador
+
+        Args:
+            X_train: Features de treino
+            y_train: Target de treino
+            X_val: Features de validação
+            y_val: Target de validação
+        """
+        model = self.build()
+        model.fit(X_train, y_train)
+        return model
+
+    def save(self, model, path):
+        """Salva o modelo no formato do backend"""
+        with open(path, 'wb') as f:
+            pickle.dump(model, f)
+
+    def feature_importances(self, model, X=None, y=None) -> np.ndarray:
+        """
+        Importância de cada feature (soma 1)
+
+        Args:
+            model: Modelo treinado
+            X, y: Conjunto de validação (usado pelos backends sem importâncias
+                próprias)
+
+        Returns:
+            Importâncias, ou None se não houver como calculá-las
+        """
+        return np.asarray(model.feature_importances_, dtype=np.float64)
+
+    def params(self) -> dict:
+        """Parâmetros do estimador (registrados nos metadados)"""
+        return {k: v for k, v in self.build().get_params().items()
+                if isinstance(v, (int, float, str, bool)) or v is None}
+
+
+class XGBoostBackend(ModelBackend):
+    """XGBoost com early stopping no conjunto de validação"""
+
+    model_format = model_io.MODEL_FORMAT_UBJ
+    suffix = '.ubj'
+    supports_onnx = True
+
+    def __init__(self, name: str = 'xgboost', **overrides):
+        """
+        Inicializa o backend
+
+        Args:
+            name: Nome do backend
+            **overrides: Parâmetros que substituem XGBOOST_PARAMS
+        """
+        self.name = name
+        self.xgb_params = {**XGBOOST_PARAMS, **overrides}
+
+    def build(self, early_stopping: bool = True):
+        import xgboost as xgb
+
+        if early_stopping:
+            return xgb.XGBRegressor(**self.xgb_params, early_stopping_rounds=10)
+        return xgb.XGBRegressor(**self.xgb_params)
+
+    def fit(self, X_train, y_train, X_val, y_val):
+        import xgboost as xgb
+
+        # Treinar modelo (compatível com diferentes versões do XGBoost)
+        # Em versões mais recentes, early_stopping_rounds deve estar no construtor
+        # Em versões antigas, pode estar no fit ou não existir
+        try:
+            # Versão mais recente: early_stopping_rounds no construtor
+            model = self.build()
+            model.fit(
+                X_train, y_train,
+                eval_set=[(X_val, y_val)],
+                verbose=False
+            )
+        except TypeError:
+            # Versão intermediária: early_stopping_rounds no fit
+            try:
+                model = xgb.XGBRegressor(**self.xgb_params)
+                model.fit(
+                    X_train, y_train,
+                    eval_set=[(X_val, y_val)],
+                    early_stopping_rounds=10,
+                    verbose=False
+                )
+            except TypeError:
+                # Versão antiga: sem early stopping
+                model = xgb.XGBRegressor(**self.xgb_params)
+                model.fit(X_train, y_train, verbose=False)
+        return model
+
+    def save(self, model, path):
+        model_io.save_model(model, path)
+
+    def params(self) -> dict:
+        return dict(self.xgb_params)
+
+
+class HistGradientBoostingBackend(ModelBackend):
+    """HistGradientBoostingRegressor do scikit-learn"""
+
+    name = 'hist_gbr'
+
+    def build(self, early_stopping: bool = True):
+        from sklearn.ensemble import HistGradientBoostingRegressor
+
+        return HistGradientBoostingRegressor(
+            max_iter=300,
+            learning_rate=0.1,
+            max_leaf_nodes=31,
+            early_stopping=early_stopping,
+            validation_fraction=0.15,
+            n_iter_no_change=10,
+            random_state=42
+        )
+
+    # Linhas de validação usadas na importância por permutação
+    IMPORTANCE_SAMPLES = 20_000
+
+    def feature_importances(self, model, X=None, y=None) -> np.ndarray:
+        # O modelo não expõe importâncias: aumento do MAE ao permutar cada
+        # feature no conjunto de validação (API pública do scikit-learn)
+        if X is None or y is None or len(X) == 0:
+            return None
+        from sklearn.inspection import permutation_importance
+
+        result = permutation_importance(
+            model, X, y,
+            scoring='neg_mean_absolute_error',
+            n_repeats=5,
+            max_samples=min(1.0, self.IMPORTANCE_SAMPLES / len(X)),
+            random_state=42
+        )
+        gains = np.clip(result.importances_mean, 0, None)
+        total = gains.sum()
+        return gains / total if total > 0 else gains
+
+
+class RidgeBackend(ModelBackend):
+    """Regressão linear Ridge (baseline), com imputação pela mediana"""
+
+    name = 'ridge'
+
+    def build(self, early_stopping: bool = True):
+        from sklearn.impute import SimpleImputer
+        from sklearn.linear_model import Ridge
+        from sklearn.pipeline import make_pipeline
+
+        # Ao contrário das árvores, o Ridge não aceita valores ausentes
+        return make_pipeline(SimpleImputer(strategy='median'), Ridge(alpha=1.0))
+
+    def feature_importances(self, model, X=None, y=None) -> np.ndarray:
+        # Features normalizadas: o módulo do coeficiente é comparável
+        coefs = np.abs(np.asarray(model[-1].coef_, dtype=np.float64))
+        total = coefs.sum()
+        return coefs / total if total > 0 else coefs
+
+
+BACKENDS = {
+    'xgboost': XGBoostBackend(),
+    'xgboost_shallow': XGBoostBackend('xgboost_shallow', max_depth=4, n_estimators=200),
+    'xgboost_deep': XGBoostBackend('xgboost_deep', max_depth=8, learning_rate=0.05, n_estimators=300),
+    'hist_gbr': HistGradientBoostingBackend(),
+    'ridge': RidgeBackend()
+}
+
+
+def get_backend(name: str) -> ModelBackend:
+    """
+    Retorna um backend pelo nome
+
+    Raises:
+        ValueError: Se o backend não existir
+    """
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Backend de modelo desconhecido: {name}. Disponíveis: {', '.join(BACKENDS)}")
@@ -0,0 +1,242 @@
+"""
+Módulo de compactação do ensemble de árvores (poda e destilação)
+
+O modelo de produção é treinado sem olhar para o custo de servir. A
+compactação procura modelos menores com MAE parecido:
+
+    - Truncamento: usa apenas as primeiras rodadas do boosting do modelo
+      treinado (o "professor"), como `iteration_range` no XGBoost
+    - Destilação: treina um XGBoost menor (o "aluno", árvores mais rasas)
+      sobre as predições do professor no conjunto de treino e em linhas
+      aumentadas, que cobrem regiões do espaço de features sem rótulo real
+
+O custo de cada candidato é o número de nós visitados por linha (árvores ×
+profundidade), que é o que o ensemble compilado percorre na API. O menor
+candidato cujo MAE de validação fica dentro da tolerância é o escolhido.
+"""
+
+import logging
+import time
+
+import numpy as np
+
+from model_backends import XGBOOST_PARAMS
+from tree_compiler import CompiledEnsemble
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Tolerância padrão: MAE de validação até 5% acima do professor
+DEFAULT_MAE_TOLERANCE = 0.05
+
+# Profundidades testadas nos alunos
+STUDENT_DEPTHS = (3, 4, 5)
+
+# Linhas aumentadas por linha de treino (0: só as predições no treino)
+AUGMENT_FACTORS = (0.0, 1.0)
+
+# Parâmetros dos alunos (sobre XGBOOST_PARAMS; a profundidade varia)
+STUDENT_PARAMS = {'n_estimators': 300, 'learning_rate': 0.15}
+
+
+def augment(X: np.ndarray, n_rows: int, swap_prob: float = 0.2, seed: int = 42) -> np.ndarray:
+    """
+    Gera linhas sintéticas para a destilação
+
+    Cada linha parte de uma linha real sorteada e troca cada feature, com
+    probabilidade `swap_prob`, pelo valor da mesma feature em outra linha
+    real. Os valores continuam plausíveis (inclusive os categóricos
+    codificados e os ausentes), mas as combinações são novas.
+
+    Args:
+        X: Features de treino (normalizadas)
+        n_rows: Número de linhas geradas
+        swap_prob: Probabilidade de troca de cada feature
+        seed: Semente do sorteio
+    """
+    rng = np.random.default_rng(seed)
+    X = np.asarray(X, dtype=np.float64)
+    base = X[rng.integers(0, len(X), n_rows)]
+    donors = X[rng.integers(0, len(X), n_rows)]
+    swap = rng.random(base.shape) < swap_prob
+    return np.where(swap, donors, base)
+
+
+def from_booster(booster):
+    """Cria um XGBRegressor a partir de um xgboost.Booster"""
+    import xgboost as xgb
+
+    model = xgb.XGBRegressor()
+    model.load_model(bytearray(booster.save_raw('ubj')))
+    return model
+
+
+def used_rounds(model) -> int:
+    """Rodadas usadas na predição (até a melhor iteração do early stopping)"""
+    best_iteration = getattr(model, 'best_iteration', None)
+    if best_iteration is not None:
+        return best_iteration + 1
+    return model.get_booster().num_boosted_rounds()
+
+
+def describe(model, kind: str, X_val, y_val, X_test, y_test, X_batch: np.ndarray) -> dict:
+    """
+    Mede um candidato
+
+    Args:
+        model: XGBRegressor candidato
+        kind: Origem do candidato ('professor', 'truncado' ou 'aluno')
+        X_val, y_val: Conjunto de validação (usado na escolha)
+        X_test, y_test: Conjunto de teste (apenas reportado)
+        X_batch: Lote usado na medição de latência
+
+    Returns:
+        Tamanho (árvores, profundidade, nós, custo), MAE e latências
+    """
+    booster = model.get_booster()
+    rounds = used_rounds(model)
+    compiled = CompiledEnsemble.from_booster(booster, (0, rounds))
+
+    single_row = X_val[:1]
+    compiled.predict(single_row)
+    timings = []
+    for _ in range(200):
+        start = time.perf_counter()
+        compiled.predict(single_row)
+        timings.append(time.perf_counter() - start)
+
+    batch = np.ascontiguousarray(X_batch, dtype=np.float32)
+    booster.inplace_predict(batch, iteration_range=(0, rounds))
+    batch_timings = []
+    for _ in range(10):
+        start = time.perf_counter()
+        booster.inplace_predict(batch, iteration_range=(0, rounds))
+        batch_timings.append(time.perf_counter() - start)
+
+    return {
+        'kind': kind,
+        'trees': compiled.num_trees,
+        'max_depth': int(compiled.max_depth),
+        'nodes': int(len(compiled.value)),
+        'cost': int(compiled.num_trees * compiled.max_depth),
+        'val_MAE': float(np.mean(np.abs(model.predict(X_val) - np.asarray(y_val)))),
+        'test_MAE': float(np.mean(np.abs(model.predict(X_test) - np.asarray(y_test)))),
+        'single_ms': float(np.median(timings)) * 1000,
+        'batch_ms': float(np.median(batch_timings)) * 1000
+    }
+
+
+def mae_by_rounds(model, X_val, y_val) -> np.ndarray:
+    """
+    MAE de validação usando as primeiras k rodadas, para cada k
+
+    Returns:
+        Array em que a posição k-1 é o MAE com k rodadas
+    """
+    booster = model.get_booster()
+    X = np.ascontiguousarray(X_val, dtype=np.float32)
+    y = np.asarray(y_val, dtype=np.float64)
+    return np.array([
+        np.mean(np.abs(booster.inplace_predict(X, iteration_range=(0, k)) - y))
+        for k in range(1, used_rounds(model) + 1)
+    ])
+
+
+def truncate(model, rounds: int):
+    """Modelo com as primeiras `rounds` rodadas (o próprio modelo se já for o caso)"""
+    if rounds == used_rounds(model) and getattr(model, 'best_iteration', None) is None:
+        return model
+    return from_booster(model.get_booster()[0:rounds])
+
+
+def distill(teacher, X_train, X_val, y_val, depth: int, augment_factor: float = 1.0,
+            seed: int = 42):
+    """
+    Treina um aluno sobre as predições do professor
+
+    Args:
+        teacher: XGBRegressor treinado
+        X_train: Features de treino
+        X_val, y_val: Validação (early stopping do aluno, com o alvo real)
+        depth: Profundidade máxima das árvores do aluno
+        augment_factor: Linhas aumentadas por linha de treino
+        seed: Semente da aumentação
+    """
+    import xgboost as xgb
+
+    X_train = np.asarray(X_train, dtype=np.float64)
+    n_augmented = int(len(X_train) * augment_factor)
+    if n_augmented > 0:
+        X_student = np.vstack([X_train, augment(X_train, n_augmented, seed=seed)])
+    else:
+        X_student = X_train
+    y_student = teacher.predict(X_student)
+
+    params = {**XGBOOST_PARAMS, **STUDENT_PARAMS, 'max_depth': depth}
+    student = xgb.XGBRegressor(**params, early_stopping_rounds=10)
+    student.fit(X_student, y_student, eval_set=[(X_val, y_val)], verbose=False)
+    return student
+
+
+def compact(teacher, X_train, X_val, y_val, X_test, y_test,
+            mae_tolerance: float = DEFAULT_MAE_TOLERANCE, depths: tuple = STUDENT_DEPTHS,
+            augment_factors: tuple = AUGMENT_FACTORS, batch_size: int = 1000) -> tuple:
+    """
+    Procura o menor modelo dentro da tolerância de MAE
+
+    Para o professor e para cada aluno, o candidato é o menor prefixo de
+    rodadas cujo MAE de validação fica dentro da tolerância (ou, se nenhum
+    ficar, o prefixo de menor MAE).
+
+    Args:
+        teacher: XGBRegressor treinado
+        X_train: Features de treino
+        X_val, y_val: Validação (escolha do candidato)
+        X_test, y_test: Teste (apenas reportado)
+        mae_tolerance: Aumento relativo máximo do MAE de validação
+        depths: Profundidades dos alunos
+        augment_factors: Linhas aumentadas por linha de treino na destilação
+            (um aluno por profundidade e fator)
+        batch_size: Tamanho do lote da medição de latência
+
+    Returns:
+        (modelo escolhido, relatório com todos os candidatos)
+    """
+    X_batch = np.resize(np.asarray(X_test, dtype=np.float64), (batch_size, X_test.shape[1]))
+    teacher_row = describe(teacher, 'professor', X_val, y_val, X_test, y_test, X_batch)
+    mae_limit = teacher_row['val_MAE'] * (1 + mae_tolerance)
+
+    sources = [(teacher, 'truncado', None)]
+    for depth in depths:
+        for factor in augment_factors:
+            logger.info(f"Destilando aluno (profundidade {depth}, aumentação {factor:g}x)...")
+            sources.append((distill(teacher, X_train, X_val, y_val, depth, factor), 'aluno', factor))
+
+    candidates = [(teacher, teacher_row)]
+    for model, kind, factor in sources:
+        curve = mae_by_rounds(model, X_val, y_val)
+        within = np.nonzero(curve <= mae_limit)[0]
+        rounds = int(within[0] if len(within) else np.argmin(curve)) + 1
+        if model is teacher and rounds == used_rounds(teacher):
+            continue
+        candidate = truncate(model, rounds)
+        row = describe(candidate, kind, X_val, y_val, X_test, y_test, X_batch)
+        if factor is not None:
+            row['augment_factor'] = factor
+        candidates.append((candidate, row))
+
+    for _, row in candidates:
+        row['within_tolerance'] = bool(row['val_MAE'] <= mae_limit)
+
+    eligible = [c for c in candidates if c[1]['within_tolerance']]
+    chosen, chosen_row = min(eligible, key=lambda c: (c[1]['cost'], c[1]['val_MAE']))
+    chosen_row['chosen'] = True
+
+    report = {
+        'mae_tolerance': mae_tolerance,
+        'val_MAE_limit': float(mae_limit),
+        'chosen': chosen_row['kind'],
+        'cost_reduction': 1 - chosen_row['cost'] / teacher_row['cost'],
+        'candidates': [row for _, row in candidates]
+    }
+    return chosen, report
@@ -0,0 +1,372 @@
+"""
+Módulo de leitura e escrita dos artefatos do modelo
+
+Formatos nativos:
+    - Modelo XGBoost: formato UBJSON do próprio XGBoost (.ubj)
+    - Scaler e encoding: arquivos NumPy .npz sem compressão, cujos arrays
+      podem ser mapeados em memória diretamente do arquivo
+
+Os artefatos antigos em pickle (.pkl) e JSON (.json) continuam sendo lidos.
+"""
+
+import json
+import pickle
+import struct
+import sys
+import zipfile
+from pathlib import Path
+
+import numpy as np
+
+# Formato do modelo registrado nos metadados
+MODEL_FORMAT_UBJ = 'xgboost-ubj'
+MODEL_FORMAT_PICKLE = 'pickle'
+
+# Maior lote avaliado pelo ensemble compilado antes da calibração
+DEFAULT_MAX_COMPILED_BATCH = 16
+
+
+class ArrayScaler:
+    """
+    Equivalente ao StandardScaler (já ajustado) apenas para transformação
+
+    Não depende do scikit-learn, o que permite carregar o scaler sem
+    importar a biblioteca.
+    """
+
+    def __init__(self, mean, scale, var=None, n_samples_seen=None, feature_names=None):
+        """
+        Inicializa o scaler
+
+        Args:
+            mean: Média de cada feature
+            scale: Desvio padrão de cada feature
+            var: Variância de cada feature (opcional)
+            n_samples_seen: Número de amostras usadas no ajuste (opcional)
+            feature_names: Nomes das features (opcional)
+        """
+        self.mean_ = np.asarray(mean, dtype=np.float64)
+        self.scale_ = np.asarray(scale, dtype=np.float64)
+        self.var_ = None if var is None else np.asarray(var, dtype=np.float64)
+        self.n_samples_seen_ = n_samples_seen
+        self.feature_names_in_ = None if feature_names is None else np.asarray(feature_names, dtype=object)
+        self.n_features_in_ = len(self.mean_)
+
+    @classmethod
+    def from_sklearn(cls, scaler):
+        """Cria a partir de um StandardScaler ajustado"""
+        return cls(
+            scaler.mean_,
+            scaler.scale_,
+            getattr(scaler, 'var_', None),
+            getattr(scaler, 'n_samples_seen_', None),
+            getattr(scaler, 'feature_names_in_', None)
+        )
+
+    def to_sklearn(self):
+        """Converte para um StandardScaler ajustado"""
+        from sklearn.preprocessing import StandardScaler
+
+        scaler = StandardScaler()
+        scaler.mean_ = self.mean_.copy()
+        scaler.scale_ = self.scale_.copy()
+        scaler.var_ = self.var_.copy() if self.var_ is not None else self.scale_ ** 2
+        scaler.n_samples_seen_ = self.n_samples_seen_
+        scaler.n_features_in_ = self.n_features_in_
+        if self.feature_names_in_ is not None:
+            scaler.feature_names_in_ = self.feature_names_in_
+        return scaler
+
+    def transform(self, X) -> np.ndarray:
+        """Normaliza as features (mesma conta do StandardScaler)"""
+        X = np.array(X, dtype=np.float64)
+        X -= self.mean_
+        X /= self.scale_
+        return X
+
+
+def save_npz(path, arrays: dict):
+    """
+    Salva arrays em um .npz sem compressão (necessário para mapeamento em memória)
+
+    Args:
+        path: Caminho do arquivo
+        arrays: Dicionário nome -> array
+    """
+    with open(path, 'wb') as f:
+        np.savez(f, **arrays)
+
+
+def load_npz(path, mmap: bool = True) -> dict:
+    """
+    Carrega os arrays de um .npz
+
+    Com `mmap=True`, cada array é mapeado em memória (somente leitura) a
+    partir da sua posição dentro do arquivo zip, sem cópia para o heap.
+
+    Args:
+        path: Caminho do arquivo
+        mmap: Se True, mapeia os arrays em memória
+    """
+    if not mmap:
+        with np.load(path, allow_pickle=False) as data:
+            return {name: data[name] for name in data.files}
+
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as f:
+        for info in archive.infolist():
+            name = info.filename[:-4] if info.filename.endswith('.npy') else info.filename
+            if info.compress_type != zipfile.ZIP_STORED:
+                arrays[name] = np.load(archive.open(info), allow_pickle=False)
+                continue
+
+            # Cabeçalho local do zip: 30 bytes fixos + nome + campo extra
+            f.seek(info.header_offset)
+            local_header = f.read(30)
+            name_len, extra_len = struct.unpack('<HH', local_header[26:30])
+            f.seek(info.header_offset + 30 + name_len + extra_len)
+
+            # Cabeçalho do .npy
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+
+            if dtype.hasobject:
+                raise ValueError(f"Array '{name}' contém objetos Python e não pode ser mapeado")
+            if int(np.prod(shape)) == 0:
+                arrays[name] = np.empty(shape, dtype=dtype)
+                continue
+            arrays[name] = np.memmap(path, dtype=dtype, mode='r', offset=f.tell(),
+                                     shape=shape, order='F' if fortran_order else 'C')
+    return arrays
+
+
+def save_scaler(scaler, path):
+    """Salva o scaler (StandardScaler ou ArrayScaler) em .npz"""
+    arrays = {
+        'mean': np.asarray(scaler.mean_, dtype=np.float64),
+        'scale': np.asarray(scaler.scale_, dtype=np.float64)
+    }
+    if getattr(scaler, 'var_', None) is not None:
+        arrays['var'] = np.asarray(scaler.var_, dtype=np.float64)
+    if getattr(scaler, 'n_samples_seen_', None) is not None:
+        arrays['n_samples_seen'] = np.asarray(scaler.n_samples_seen_)
+    if getattr(scaler, 'feature_names_in_', None) is not None:
+        arrays['feature_names'] = np.asarray([str(n) for n in scaler.feature_names_in_])
+    save_npz(path, arrays)
+
+
+def load_scaler(path, mmap: bool = True) -> ArrayScaler:
+    """Carrega um scaler salvo em .npz"""
+    arrays = load_npz(path, mmap=mmap)
+    n_samples_seen = arrays.get('n_samples_seen')
+    return ArrayScaler(
+        arrays['mean'],
+        arrays['scale'],
+        arrays.get('var'),
+        int(n_samples_seen) if n_samples_seen is not None and n_samples_seen.ndim == 0 else n_samples_seen,
+        [str(n) for n in arrays['feature_names']] if 'feature_names' in arrays else None
+    )
+
+
+def save_encoding(encoding_data: dict, path):
+    """
+    Salva mapeamentos de encoding e valores únicos em .npz
+
+    Cada mapeamento categoria -> valor vira dois arrays (`<nome>.keys` e
+    `<nome>.values`), valores escalares viram arrays de dimensão zero e as
+    listas de valores únicos viram arrays de texto.
+    """
+    arrays = {}
+    for name, value in encoding_data.get('encoding_maps', {}).items():
+        if isinstance(value, dict):
+            arrays[f'encoding_maps/{name}.keys'] = np.asarray([str(k) for k in value.keys()])
+            arrays[f'encoding_maps/{name}.values'] = np.asarray(list(value.values()), dtype=np.float64)
+        else:
+            arrays[f'encoding_maps/{name}'] = np.asarray(value, dtype=np.float64)
+    for name, values in encoding_data.get('unique_values', {}).items():
+        arrays[f'unique_values/{name}'] = np.asarray([str(v) for v in values])
+    save_npz(path, arrays)
+
+
+def load_encoding(path, mmap: bool = True) -> dict:
+    """Carrega mapeamentos de encoding e valores únicos de um .npz"""
+    arrays = load_npz(path, mmap=mmap)
+    encoding_maps = {}
+    unique_values = {}
+    for key, array in arrays.items():
+        group, _, name = key.partition('/')
+        if group == 'unique_values':
+            unique_values[name] = [str(v) for v in array]
+        elif name.endswith('.keys'):
+            base = name[:-len('.keys')]
+            values = arrays[f'encoding_maps/{base}.values']
+            encoding_maps[base] = {str(k): float(v) for k, v in zip(array, values)}
+        elif not name.endswith('.values'):
+            encoding_maps[name] = float(array)
+    return {'encoding_maps': encoding_maps, 'unique_values': unique_values}
+
+
+class BoosterRegressor:
+    """
+    Wrapper mínimo do Booster do XGBoost para servir predições
+
+    Reproduz o `XGBRegressor.predict` (inclusive o corte na melhor iteração
+    do early stopping) sem depender do wrapper do scikit-learn. Se o
+    ensemble foi compilado (tree_compiler), lotes de até
+    `max_compiled_batch` linhas são avaliados pelos arrays NumPy, com o
+    mesmo resultado e sem o custo fixo da DMatrix. Os demais lotes usam
+    `Booster.inplace_predict` sobre um array float32 contíguo, também sem
+    construir uma DMatrix.
+    """
+
+    def __init__(self, booster, compile_trees: bool = False,
+                 max_compiled_batch: int = DEFAULT_MAX_COMPILED_BATCH, nthread: int = None):
+        """
+        Inicializa o wrapper
+
+        Args:
+            booster: xgboost.Booster carregado
+            compile_trees: Se True, compila o ensemble em arrays NumPy
+            max_compiled_batch: Maior lote avaliado pelo ensemble compilado
+            nthread: Threads do XGBoost por predição (se None, mantém o padrão
+                do XGBoost). Com um servidor multi-thread, 1 evita que cada
+                requisição dispute todos os núcleos com as demais.
+        """
+        self.booster = booster
+        if nthread is not None:
+            booster.set_param({'nthread': nthread})
+        best_iteration = booster.attr('best_iteration')
+        self.iteration_range = (0, int(best_iteration) + 1) if best_iteration is not None else (0, 0)
+        self.max_compiled_batch = max_compiled_batch
+        self.compiled = None
+        if compile_trees:
+            from tree_compiler import compile_booster
+            self.compiled = compile_booster(booster, self.iteration_range)
+
+    def predict(self, X) -> np.ndarray:
+        """Prediz para uma matriz de features já normalizadas"""
+        if self.compiled is not None and len(X) <= self.max_compiled_batch:
+            return self.compiled.predict(X)
+        return self.predict_native(X)
+
+    def predict_native(self, X) -> np.ndarray:
+        """Prediz usando o próprio XGBoost (in-place, sem DMatrix)"""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        return self.booster.inplace_predict(X, iteration_range=self.iteration_range)
+
+    def predict_dmatrix(self, X) -> np.ndarray:
+        """Prediz construindo uma DMatrix (caminho do XGBRegressor.predict)"""
+        xgb = import_xgboost()
+        return self.booster.predict(xgb.DMatrix(X), iteration_range=self.iteration_range)
+
+    def calibrate(self, sample: np.ndarray) -> int:
+        """
+        Mede o ponto de troca entre o ensemble compilado e o XGBoost
+
+        Args:
+            sample: Linhas de features já normalizadas usadas na medição
+
+        Returns:
+            Maior lote atendido pelo ensemble compilado
+        """
+        if self.compiled is None:
+            return 0
+        from tree_compiler import find_crossover
+        self.max_compiled_batch = find_crossover(self.compiled, self.predict_native, sample)
+        return self.max_compiled_batch
+
+
+def import_xgboost(lean: bool = False):
+    """
+    Importa o xgboost, opcionalmente sem carregar o scikit-learn
+
+    O pacote xgboost importa o scikit-learn (e com ele scipy e pandas) só
+    para definir o wrapper XGBRegressor, o que domina o tempo de cold start
+    da API. Servir predições exige apenas o Booster; com `lean=True` o
+    scikit-learn é marcado como ausente durante o import. Nesse caso o
+    XGBRegressor fica indisponível no processo, por isso só a API usa essa
+    opção (scripts de treino e manutenção fazem o import normal).
+
+    Args:
+        lean: Se True, importa o xgboost sem o scikit-learn
+    """
+    if 'xgboost' in sys.modules:
+        return sys.modules['xgboost']
+    if not lean or 'sklearn' in sys.modules:
+        import xgboost
+        return xgboost
+
+    sys.modules['sklearn'] = None
+    try:
+        import xgboost
+    finally:
+        del sys.modules['sklearn']
+    return xgboost
+
+
+def load_serving_model(path, compile_trees: bool = False,
+                       max_compiled_batch: int = DEFAULT_MAX_COMPILED_BATCH, nthread: int = None):
+    """
+    Carrega o modelo para servir predições
+
+    O formato nativo vira um BoosterRegressor (sem scikit-learn); pickles
+    antigos são carregados como estão.
+
+    Args:
+        path: Caminho do artefato
+        compile_trees: Se True, compila o ensemble em arrays NumPy
+        max_compiled_batch: Maior lote avaliado pelo ensemble compilado
+        nthread: Threads do XGBoost por predição (se None, o padrão do XGBoost)
+    """
+    path = Path(path)
+    if path.suffix == '.pkl':
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    xgb = import_xgboost()
+    return BoosterRegressor(xgb.Booster(model_file=str(path)), compile_trees, max_compiled_batch, nthread)
+
+
+def save_model(model, path):
+    """Salva o modelo XGBoost no formato nativo (UBJSON)"""
+    model.save_model(str(path))
+
+
+def load_model(path):
+    """
+    Carrega o modelo a partir do formato nativo (.ubj/.json) ou de pickle (.pkl)
+
+    Args:
+        path: Caminho do artefato
+    """
+    path = Path(path)
+    if path.suffix == '.pkl':
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    import xgboost as xgb
+
+    model = xgb.XGBRegressor()
+    model.load_model(str(path))
+    return model
+
+
+def load_scaler_artifact(path, mmap: bool = True):
+    """Carrega o scaler a partir de .npz ou de pickle (.pkl)"""
+    path = Path(path)
+    if path.suffix == '.pkl':
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    return load_scaler(path, mmap=mmap)
+
+
+def load_encoding_artifact(path, mmap: bool = True) -> dict:
+    """Carrega o encoding a partir de .npz ou de JSON"""
+    path = Path(path)
+    if path.suffix == '.json':
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return load_encoding(path, mmap=mmap)
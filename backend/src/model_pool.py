@@ -0,0 +1,576 @@
+"""
+Módulo de gerenciamento de múltiplas versões do modelo em memória
+"""
+
+import json
+import logging
+import random
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from model_registry import ModelRegistry, LEGACY_ARTIFACTS
+import model_io
+import onnx_backend
+from quantile_sketch import KLLSketch
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ModelBundle:
+    """Artefatos de uma versão do modelo (modelo, scaler, metadados e encoding)"""
+
+    def __init__(self, version: str, model, scaler, metadata: dict,
+                 encoding_data: dict = None, artifact_hashes: dict = None, onnx_model=None):
+        """
+        Inicializa o bundle
+
+        Args:
+            version: Versão do modelo
+            model: Modelo treinado
+            scaler: Scaler usado no treinamento
+            metadata: Metadados salvos junto ao modelo
+            encoding_data: Mapeamentos de target encoding e valores únicos
+            artifact_hashes: Hash do conteúdo de cada artefato (do manifest)
+            onnx_model: Modelo ONNX (com o scaler incorporado) usado no lugar
+                do modelo nativo, se informado
+        """
+        self.version = version
+        self.model = model
+        self.scaler = scaler
+        self.metadata = metadata
+        self.feature_names = metadata['feature_names']
+        self.feature_index = {name: i for i, name in enumerate(self.feature_names)}
+        self.encoding_data = encoding_data or {}
+        self.encoding_maps = self.encoding_data.get('encoding_maps', {})
+        self.unique_values = self.encoding_data.get('unique_values', {})
+        self.artifact_hashes = artifact_hashes or {}
+        self.onnx_model = onnx_model
+        # Backend de predição: o ONNX, ou o algoritmo registrado no treino
+        self.backend = 'onnx' if onnx_model is not None else metadata.get('backend', 'xgboost')
+        # Medianas do treinamento (sketches dos metadados), usadas nos campos
+        # numéricos ausentes da requisição, como na imputação do treinamento
+        self.medians = {
+            col: KLLSketch.from_dict(sketch).quantile(0.5)
+            for col, sketch in metadata.get('quantile_sketches', {}).items()
+        }
+
+    @property
+    def artifacts(self) -> dict:
+        """Objetos carregados de cada artefato compartilhável entre versões"""
+        artifacts = {
+            'model': self.model,
+            'scaler': self.scaler,
+            'encoding': self.encoding_data
+        }
+        if self.onnx_model is not None:
+            artifacts['onnx'] = self.onnx_model
+        return artifacts
+
+    def prepare_features(self, data: dict) -> np.ndarray:
+        """Prepara features para predição"""
+        row = self.feature_row(data)
+
+        # Normalizar (o modelo ONNX já inclui o scaler no grafo)
+        if self.onnx_model is not None:
+            return row
+        return self.scaler.transform(row)
+
+    def feature_row(self, data: dict) -> np.ndarray:
+        """Monta a linha de features (sem normalização) de uma requisição"""
+        feature_index = self.feature_index
+        encoding_maps = self.encoding_maps
+
+        # Inicializar vetor com zeros para todas as features esperadas
+        row = np.zeros(len(self.feature_names), dtype=np.float64)
+
+        def set_feature(name, value):
+            if name in feature_index:
+                row[feature_index[name]] = np.nan if value is None else value
+
+        def numeric(name, default=0):
+            # Ausente: mediana do treinamento (se os metadados tiverem os sketches)
+            value = data.get(name)
+            if value is None:
+                return self.medians.get(name, default if name not in data else None)
+            return value
+
+        # Preencher features numéricas básicas
+        set_feature('area', numeric('area'))
+        set_feature('bedrooms', numeric('bedrooms'))
+        set_feature('bathrooms', numeric('bathrooms'))
+        set_feature('parking_spaces', numeric('parking_spaces'))
+        set_feature('furnished', 1 if data.get('furnished', False) else 0)
+        set_feature('hoa', numeric('hoa'))
+        set_feature('suites', numeric('suites'))
+
+        # Calcular price_per_sqm (estimativa inicial baseada na média)
+        # Usar média de preço por m² do dataset, assumindo área média de 70m²
+        mean_rent = encoding_maps.get('mean_rent', 2000) if encoding_maps else 2000
+        set_feature('price_per_sqm', mean_rent / 70)
+
+        # Encoding de city (target encoding)
+        city_encoding = encoding_maps.get('city_encoding', {}) if encoding_maps else {}
+        set_feature('city_encoded', city_encoding.get(data.get('city', ''), mean_rent))
+
+        # Encoding de neighborhood (target encoding)
+        neighborhood_encoding = encoding_maps.get('neighborhood_encoding', {}) if encoding_maps else {}
+        set_feature('neighborhood_encoded', neighborhood_encoding.get(data.get('neighborhood', ''), mean_rent))
+
+        # Encoding de property_type (One-Hot - se necessário)
+        property_type = data.get('property_type', 'UNIT')
+        set_feature(f'property_type_{property_type}', 1)
+
+        return row.reshape(1, -1)
+
+    def prepare_feature_matrix(self, columns: dict, n_rows: int) -> np.ndarray:
+        """Prepara as features de vários imóveis (normalizadas; ver feature_matrix)"""
+        matrix = self.feature_matrix(columns, n_rows)
+        if self.onnx_model is not None:
+            return matrix
+        return self.scaler.transform(matrix)
+
+    def feature_matrix(self, columns: dict, n_rows: int) -> np.ndarray:
+        """
+        Monta as linhas de features (sem normalização) de vários imóveis
+
+        Versão vetorizada de `feature_row` (mesmas regras, por coluna):
+        valores numéricos ausentes (NaN) recebem a mediana do treinamento e
+        o encoding das categorias é calculado uma vez por categoria.
+
+        Args:
+            columns: Campo -> array com um valor por imóvel. Campos
+                categóricos (city, neighborhood, property_type) como
+                (códigos, categorias), com código -1 para ausente
+            n_rows: Número de imóveis
+        """
+        feature_index = self.feature_index
+        encoding_maps = self.encoding_maps
+        matrix = np.zeros((n_rows, len(self.feature_names)), dtype=np.float64)
+
+        def set_feature(name, values):
+            if name in feature_index:
+                matrix[:, feature_index[name]] = values
+
+        for name in ('area', 'bedrooms', 'bathrooms', 'parking_spaces', 'hoa', 'suites'):
+            if name in columns:
+                values = np.asarray(columns[name], dtype=np.float64)
+                set_feature(name, np.where(np.isnan(values), self.medians.get(name, 0), values))
+            else:
+                set_feature(name, self.medians.get(name, 0))
+        if 'furnished' in columns:
+            set_feature('furnished', np.asarray(columns['furnished'], dtype=bool).astype(np.float64))
+
+        mean_rent = encoding_maps.get('mean_rent', 2000) if encoding_maps else 2000
+        set_feature('price_per_sqm', mean_rent / 70)
+
+        def encoded(name, encoding):
+            if name not in columns:
+                return mean_rent
+            codes, categories = columns[name]
+            # Uma posição a mais para o código -1 (ausente)
+            values = np.array([encoding.get(str(category), mean_rent) for category in categories] + [mean_rent],
+                              dtype=np.float64)
+            return values[np.asarray(codes)]
+
+        set_feature('city_encoded', encoded('city', encoding_maps.get('city_encoding', {}) if encoding_maps else {}))
+        set_feature('neighborhood_encoded',
+                    encoded('neighborhood', encoding_maps.get('neighborhood_encoding', {}) if encoding_maps else {}))
+
+        if 'property_type' in columns:
+            codes, categories = columns['property_type']
+            codes = np.asarray(codes)
+            for code, category in enumerate(categories):
+                set_feature(f'property_type_{category}', (codes == code).astype(np.float64))
+
+        return matrix
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        """Executa a predição para features já preparadas"""
+        if self.onnx_model is not None:
+            return self.onnx_model.predict(features)
+        return self.model.predict(features)
+
+
+def list_versions(models_dir) -> list:
+    """
+    Lista as versões disponíveis sem manifest, da mais antiga para a mais recente (mtime)
+
+    Args:
+        models_dir: Diretório dos modelos
+    """
+    model_files = sorted(Path(models_dir).glob("model_*.pkl"), key=lambda p: p.stat().st_mtime)
+    return [p.stem.replace("model_", "") for p in model_files]
+
+
+def load_bundle(models_dir, version: str, registry: ModelRegistry = None,
+                loaded_artifacts: dict = None, serving_options: dict = None) -> ModelBundle:
+    """
+    Carrega todos os artefatos de uma versão
+
+    Com manifest, os caminhos vêm do registro e cada artefato tem tamanho e
+    hash conferidos antes de ser carregado. Artefatos cujo hash já está em
+    `loaded_artifacts` são reaproveitados sem leitura do disco. Sem manifest,
+    usa os nomes de arquivo do formato antigo.
+
+    Args:
+        models_dir: Diretório dos modelos
+        version: Versão do modelo
+        registry: Registro de versões (opcional)
+        loaded_artifacts: Artefatos já carregados, indexados pelo hash (sha256 -> objeto)
+        serving_options: Opções de carga do modelo: `backend` ('xgboost' ou
+            'onnx') e as opções de model_io.load_serving_model
+            (compile_trees, max_compiled_batch, nthread)
+    """
+    models_dir = Path(models_dir)
+    loaded_artifacts = loaded_artifacts or {}
+    logger.info(f"Carregando modelo versão: {version}")
+
+    if registry is not None and registry.exists():
+        hashes = registry.content_hashes(version)
+        pending = [name for name, sha256 in hashes.items() if sha256 not in loaded_artifacts]
+        registry.verify(version, names=pending)
+        artifacts = registry.resolve(version, verify=False)
+    else:
+        hashes = {}
+        artifacts = {name: models_dir / pattern.format(version=version)
+                     for name, pattern in LEGACY_ARTIFACTS.items()}
+
+    def load_artifact(name, loader):
+        sha256 = hashes.get(name)
+        if sha256 in loaded_artifacts:
+            logger.info(f"Artefato '{name}' da versão {version} já residente ({sha256[:12]}), reutilizando")
+            return loaded_artifacts[sha256]
+        return loader(artifacts[name])
+
+    serving_options = dict(serving_options or {})
+    backend = serving_options.pop('backend', 'xgboost')
+    model = load_artifact('model', lambda path: model_io.load_serving_model(path, **serving_options))
+    scaler = load_artifact('scaler', model_io.load_scaler_artifact)
+    if not isinstance(scaler, model_io.ArrayScaler):
+        # Scaler antigo em pickle: servir sem chamar o scikit-learn
+        scaler = model_io.ArrayScaler.from_sklearn(scaler)
+    metadata = _load_json(artifacts['metadata'])
+
+    encoding_data = {}
+    if 'encoding' in artifacts and artifacts['encoding'].exists():
+        encoding_data = load_artifact('encoding', model_io.load_encoding_artifact)
+    else:
+        logger.warning(f"Arquivo de encoding da versão {version} não encontrado. Usando valores padrão.")
+
+    onnx_model = None
+    if backend == 'onnx':
+        onnx_model = _load_onnx_model(version, artifacts, model, scaler, load_artifact,
+                                      serving_options.get('nthread'))
+
+    return ModelBundle(version, model, scaler, metadata, encoding_data, hashes, onnx_model)
+
+
+def _load_onnx_model(version: str, artifacts: dict, model, scaler, load_artifact, nthread: int = None):
+    """
+    Carrega o modelo ONNX de uma versão e confere a paridade com o nativo
+
+    Se o artefato, o onnxruntime ou a conferência falharem, retorna None e
+    a versão é servida pelo modelo nativo.
+    """
+    if 'onnx' not in artifacts:
+        logger.warning(f"Versão {version} não possui modelo ONNX (manage_models.py export-onnx). Usando XGBoost.")
+        return None
+    if not onnx_backend.runtime_available():
+        logger.warning("onnxruntime não instalado. Usando XGBoost.")
+        return None
+
+    onnx_model = load_artifact('onnx', lambda path: onnx_backend.OnnxRegressor(path, nthread))
+    try:
+        max_diff = onnx_backend.check_parity(onnx_model, model, scaler)
+    except ValueError as e:
+        logger.error(f"Versão {version}: {e}. Usando XGBoost.")
+        return None
+    logger.info(f"Versão {version} servida via onnxruntime (diferença máxima para o nativo: {max_diff:.6f})")
+    return onnx_model
+
+
+def _load_json(path) -> dict:
+    """Carrega um artefato JSON"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def parse_traffic_split(spec: str) -> dict:
+    """
+    Converte a especificação de divisão de tráfego em um dicionário de pesos
+
+    Args:
+        spec: Texto no formato "versao_a:0.9,versao_b:0.1"
+    """
+    weights = {}
+    if not spec:
+        return weights
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        version, _, weight = item.partition(':')
+        weights[version.strip()] = float(weight) if weight else 1.0
+    return {v: w for v, w in weights.items() if w > 0}
+
+
+class ModelPool:
+    """
+    Mantém várias versões do modelo residentes em memória (LRU), roteia
+    requisições entre elas e executa uma versão "shadow" fora do caminho
+    da requisição para comparar as predições.
+    """
+
+    def __init__(self, models_dir, max_size: int = 3, default_version: str = None,
+                 traffic_split: dict = None, shadow_version: str = None,
+                 divergence_history: int = 100, compile_trees: bool = False,
+                 max_compiled_batch: int = None, predict_nthread: int = None,
+                 backend: str = 'xgboost', max_shadow_pending: int = 100):
+        """
+        Inicializa o pool de modelos
+
+        Args:
+            models_dir: Diretório dos modelos
+            max_size: Número máximo de versões residentes
+            default_version: Versão usada quando não há roteamento explícito
+                (se None, usa a versão atual do manifest ou a mais recente)
+            traffic_split: Pesos por versão para divisão de tráfego
+            shadow_version: Versão avaliada em shadow (sem afetar a resposta)
+            divergence_history: Quantidade de divergências recentes mantidas
+            compile_trees: Se True, compila o ensemble de cada versão em
+                arrays NumPy para lotes pequenos
+            max_compiled_batch: Maior lote avaliado pelo ensemble compilado
+                (se None, é calibrado no warm-up)
+            predict_nthread: Threads por predição (se None, o padrão da
+                biblioteca)
+            backend: Backend de predição: 'xgboost' ou 'onnx' (onnxruntime)
+            max_shadow_pending: Máximo de predições shadow na fila; com a fila
+                cheia, as amostras novas são descartadas (e contadas)
+        """
+        self.models_dir = Path(models_dir)
+        self.registry = ModelRegistry(self.models_dir)
+        self.max_size = max(1, max_size)
+        self.traffic_split = traffic_split or {}
+        self.shadow_version = shadow_version
+        self.compile_trees = compile_trees
+        self.max_compiled_batch = max_compiled_batch
+        self.predict_nthread = predict_nthread
+        if backend not in ('xgboost', 'onnx'):
+            raise ValueError(f"Backend de predição desconhecido: {backend}")
+        self.backend = backend
+
+        self._bundles = OrderedDict()
+        self._lock = threading.RLock()
+        self._load_lock = threading.Lock()
+        self._shadow_executor = None
+        self.max_shadow_pending = max(1, max_shadow_pending)
+        self._shadow_pending = 0
+        self._divergence = {
+            'count': 0,
+            'errors': 0,
+            'dropped': 0,
+            'sum_abs_diff': 0.0,
+            'sum_rel_diff': 0.0,
+            'max_abs_diff': 0.0,
+            'recent': deque(maxlen=divergence_history)
+        }
+
+        versions = self.available_versions()
+        if not versions:
+            raise FileNotFoundError("Nenhum modelo encontrado. Execute train_model.py primeiro.")
+        if not self.registry.exists():
+            logger.warning("manifest.json não encontrado. Usando a versão mais recente por data de modificação.")
+        self.default_version = default_version or self.registry.current or versions[-1]
+
+        for version in list(self.traffic_split) + ([shadow_version] if shadow_version else []):
+            if version not in versions:
+                raise ValueError(f"Versão de modelo não encontrada: {version}")
+
+    def available_versions(self) -> list:
+        """Retorna as versões disponíveis (do manifest, ou em disco sem manifest)"""
+        if self.registry.exists():
+            return self.registry.versions()
+        return list_versions(self.models_dir)
+
+    def resident_versions(self) -> list:
+        """Retorna as versões carregadas em memória (da menos para a mais recente em uso)"""
+        with self._lock:
+            return list(self._bundles.keys())
+
+    def resident_backends(self) -> dict:
+        """Retorna o backend de predição de cada versão carregada em memória"""
+        with self._lock:
+            return {version: bundle.backend for version, bundle in self._bundles.items()}
+
+    def get(self, version: str = None) -> ModelBundle:
+        """
+        Retorna o bundle de uma versão, carregando-o se necessário
+
+        Args:
+            version: Versão do modelo (se None, usa a versão padrão)
+        """
+        version = version or self.default_version
+        bundle = self._lookup(version)
+        if bundle is not None:
+            return bundle
+
+        # O carregamento acontece fora do lock principal para não bloquear
+        # requisições atendidas por versões já residentes
+        with self._load_lock:
+            bundle = self._lookup(version)
+            if bundle is not None:
+                return bundle
+
+            if version not in self.available_versions():
+                raise KeyError(version)
+
+            bundle = load_bundle(self.models_dir, version, self.registry, self._resident_artifacts(),
+                                 self.serving_options())
+            with self._lock:
+                self._bundles[version] = bundle
+                while len(self._bundles) > self.max_size:
+                    evicted, _ = self._bundles.popitem(last=False)
+                    logger.info(f"Modelo {evicted} removido da memória (LRU)")
+            return bundle
+
+    def serving_options(self) -> dict:
+        """Opções de carga do modelo para servir predições"""
+        options = {'backend': self.backend, 'compile_trees': self.compile_trees, 'nthread': self.predict_nthread}
+        if self.max_compiled_batch is not None:
+            options['max_compiled_batch'] = self.max_compiled_batch
+        return options
+
+    def _resident_artifacts(self) -> dict:
+        """Artefatos já carregados pelas versões residentes, indexados pelo hash"""
+        with self._lock:
+            bundles = list(self._bundles.values())
+        loaded = {}
+        for bundle in bundles:
+            for name, obj in bundle.artifacts.items():
+                sha256 = bundle.artifact_hashes.get(name)
+                if sha256:
+                    loaded[sha256] = obj
+        return loaded
+
+    def _lookup(self, version: str):
+        """Retorna o bundle residente (marcando-o como usado) ou None"""
+        with self._lock:
+            bundle = self._bundles.get(version)
+            if bundle is not None:
+                self._bundles.move_to_end(version)
+            return bundle
+
+    def route(self, requested_version: str = None) -> ModelBundle:
+        """
+        Escolhe a versão que atende a requisição
+
+        Args:
+            requested_version: Versão pedida explicitamente (header X-Model-Version)
+        """
+        if requested_version:
+            return self.get(requested_version)
+        if self.traffic_split:
+            versions = list(self.traffic_split.keys())
+            weights = list(self.traffic_split.values())
+            return self.get(random.choices(versions, weights=weights)[0])
+        return self.get(self.default_version)
+
+    def submit_shadow(self, data: dict, primary_version: str, primary_prediction: float):
+        """
+        Agenda a predição da versão shadow em background e registra a divergência
+
+        Args:
+            data: Dados da requisição original
+            primary_version: Versão que respondeu a requisição
+            primary_prediction: Predição devolvida ao cliente
+        """
+        return self.submit_shadow_batch([data], primary_version, [primary_prediction])
+
+    def submit_shadow_batch(self, items: list, primary_version: str, primary_predictions):
+        """
+        Agenda a predição shadow de um lote de imóveis (mesmas entradas da
+        versão primária) e registra a divergência de cada um
+
+        A fila do executor não tem limite: com a versão shadow mais lenta que o
+        tráfego, as requisições pendentes (e a memória) cresceriam sem parar.
+        No máximo `max_shadow_pending` imóveis ficam pendentes; os que não
+        cabem são descartados e contados em `dropped`.
+
+        Args:
+            items: Dados de cada imóvel da requisição original
+            primary_version: Versão que respondeu a requisição
+            primary_predictions: Predições devolvidas ao cliente
+        """
+        if not self.shadow_version or self.shadow_version == primary_version:
+            return None
+        with self._lock:
+            accepted = min(len(items), self.max_shadow_pending - self._shadow_pending)
+            self._divergence['dropped'] += len(items) - max(accepted, 0)
+            if accepted <= 0:
+                return None
+            self._shadow_pending += accepted
+            # Criado sob o lock: um único worker, do qual depende o limite de pendentes
+            if self._shadow_executor is None:
+                self._shadow_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='shadow')
+        return self._shadow_executor.submit(
+            self._score_shadow, [dict(data) for data in items[:accepted]], primary_version,
+            [float(prediction) for prediction in primary_predictions[:accepted]]
+        )
+
+    def _score_shadow(self, items: list, primary_version: str, primary_predictions: list):
+        """Executa a predição shadow e acumula as estatísticas de divergência"""
+        try:
+            return self._compare_shadow(items, primary_version, primary_predictions)
+        finally:
+            with self._lock:
+                self._shadow_pending -= len(items)
+
+    def _compare_shadow(self, items: list, primary_version: str, primary_predictions: list):
+        """Predições shadow de um lote, comparadas com as predições primárias"""
+        try:
+            bundle = self.get(self.shadow_version)
+            features = np.vstack([bundle.prepare_features(data) for data in items])
+            shadow_predictions = [float(prediction) for prediction in bundle.predict(features)]
+        except Exception as e:
+            logger.error(f"Erro na predição shadow: {e}")
+            with self._lock:
+                self._divergence['errors'] += len(items)
+            return None
+
+        with self._lock:
+            stats = self._divergence
+            for primary_prediction, shadow_prediction in zip(primary_predictions, shadow_predictions):
+                abs_diff = abs(shadow_prediction - primary_prediction)
+                stats['count'] += 1
+                stats['sum_abs_diff'] += abs_diff
+                stats['sum_rel_diff'] += abs_diff / abs(primary_prediction) if primary_prediction else 0.0
+                stats['max_abs_diff'] = max(stats['max_abs_diff'], abs_diff)
+                stats['recent'].append({
+                    'primary_version': primary_version,
+                    'primary_prediction': primary_prediction,
+                    'shadow_prediction': shadow_prediction,
+                    'abs_diff': abs_diff
+                })
+        return shadow_predictions
+
+    def shadow_stats(self) -> dict:
+        """Retorna o resumo da divergência entre a versão shadow e as versões primárias"""
+        with self._lock:
+            stats = self._divergence
+            count = stats['count']
+            return {
+                'shadow_version': self.shadow_version,
+                'count': count,
+                'errors': stats['errors'],
+                'dropped': stats['dropped'],
+                'pending': self._shadow_pending,
+                'mean_abs_diff': stats['sum_abs_diff'] / count if count else 0.0,
+                'mean_rel_diff': stats['sum_rel_diff'] / count if count else 0.0,
+                'max_abs_diff': stats['max_abs_diff'],
+                'recent': list(stats['recent'])
+            }
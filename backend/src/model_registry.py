@@ -0,0 +1,369 @@
+"""
+Módulo de registro de versões do modelo (manifest.json)
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+from datetime import datetime
+from pathlib import Path
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_FORMAT_VERSION = 2
+
+# Diretório dos artefatos endereçados por conteúdo (objects/<sha256><extensão>)
+OBJECTS_DIR = "objects"
+
+# Prefixos dos artefatos gerados por versão (formato antigo, sem manifest)
+LEGACY_ARTIFACTS = {
+    'model': "model_{version}.pkl",
+    'scaler': "scaler_{version}.pkl",
+    'metadata': "metadata_{version}.json",
+    'encoding': "encoding_{version}.json"
+}
+
+
+def file_sha256(path) -> str:
+    """Calcula o hash SHA-256 de um arquivo"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    """
+    Registro de versões do modelo baseado em um manifest.json
+
+    O manifest lista, para cada versão, os artefatos (caminho relativo ao
+    diretório de modelos, hash SHA-256 e tamanho) e mantém um ponteiro
+    `current` para a versão servida pela API. Assim a versão atual é
+    resolvida sem listar o diretório nem depender do mtime dos arquivos.
+
+    Os artefatos são armazenados pelo hash do conteúdo em `objects/`:
+    versões com artefatos idênticos apontam para o mesmo arquivo e não
+    ocupam espaço extra em disco.
+    """
+
+    def __init__(self, model_dir: str = "models"):
+        """
+        Inicializa o registro
+
+        Args:
+            model_dir: Diretório dos modelos
+        """
+        self.model_dir = Path(model_dir)
+        self.manifest_path = self.model_dir / MANIFEST_NAME
+        self._manifest = None
+
+    def exists(self) -> bool:
+        """Indica se o diretório já possui um manifest"""
+        return self.manifest_path.exists()
+
+    @property
+    def manifest(self) -> dict:
+        """Conteúdo do manifest (carregado sob demanda)"""
+        if self._manifest is None:
+            self._manifest = self.load()
+        return self._manifest
+
+    def load(self) -> dict:
+        """Lê o manifest do disco (ou retorna um manifest vazio)"""
+        if not self.exists():
+            return {'format_version': MANIFEST_FORMAT_VERSION, 'current': None, 'versions': {}}
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            self._manifest = json.load(f)
+        return self._manifest
+
+    def save(self):
+        """Grava o manifest de forma atômica"""
+        self.model_dir.mkdir(exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    @property
+    def current(self) -> str:
+        """Versão atualmente promovida"""
+        return self.manifest.get('current')
+
+    def versions(self) -> list:
+        """Lista as versões registradas, da mais antiga para a mais recente"""
+        entries = self.manifest['versions']
+        return sorted(entries, key=lambda v: (entries[v].get('created_at', ''), v))
+
+    def get(self, version: str) -> dict:
+        """Retorna a entrada de uma versão"""
+        try:
+            return self.manifest['versions'][version]
+        except KeyError:
+            raise KeyError(f"Versão não registrada no manifest: {version}")
+
+    def register(self, version: str, artifacts: dict, make_current: bool = True,
+                 created_at: str = None) -> dict:
+        """
+        Registra uma versão e seus artefatos no manifest
+
+        Os arquivos informados são movidos para `objects/` (ou descartados,
+        se um objeto com o mesmo conteúdo já existir).
+
+        Args:
+            version: Versão do modelo
+            artifacts: Dicionário nome -> caminho do artefato
+            make_current: Se True, aponta `current` para esta versão
+            created_at: Data de criação (se None, usa o momento atual)
+        """
+        entry = {
+            'created_at': created_at or datetime.now().isoformat(),
+            'artifacts': {name: self.store_object(path) for name, path in artifacts.items()}
+        }
+
+        self.manifest['versions'][version] = entry
+        if make_current or not self.current:
+            self.manifest['current'] = version
+        self.save()
+        logger.info(f"Versão {version} registrada em {self.manifest_path}")
+        return entry
+
+    def add_artifact(self, version: str, name: str, path) -> dict:
+        """
+        Adiciona (ou substitui) um artefato de uma versão já registrada
+
+        Args:
+            version: Versão do modelo
+            name: Nome do artefato
+            path: Caminho do arquivo (movido para `objects/`)
+        """
+        entry = self.get(version)
+        entry['artifacts'][name] = self.store_object(path)
+        self.save()
+        logger.info(f"Artefato '{name}' adicionado à versão {version}")
+        return entry['artifacts'][name]
+
+    def store_object(self, path, move: bool = True) -> dict:
+        """
+        Armazena um arquivo em `objects/` pelo hash do conteúdo
+
+        Args:
+            path: Caminho do arquivo
+            move: Se True, move (ou remove, se duplicado) o arquivo original
+
+        Returns:
+            Informações do artefato (caminho relativo, hash e tamanho)
+        """
+        path = Path(path)
+        sha256 = file_sha256(path)
+        size = path.stat().st_size
+        objects_dir = self.model_dir / OBJECTS_DIR
+        objects_dir.mkdir(parents=True, exist_ok=True)
+        target = objects_dir / f"{sha256}{path.suffix}"
+
+        if target.exists():
+            logger.info(f"Artefato {path.name} já armazenado como {target.name}")
+            if move and path.resolve() != target.resolve():
+                path.unlink()
+        elif move:
+            os.replace(path, target)
+        else:
+            shutil.copy2(path, target)
+
+        return {
+            'path': self._relative(target),
+            'sha256': sha256,
+            'size': size
+        }
+
+    def migrate_to_objects(self) -> int:
+        """
+        Move os artefatos de versões já registradas para `objects/`
+
+        Returns:
+            Número de arquivos removidos por serem duplicados
+        """
+        removed = 0
+        for entry in self.manifest['versions'].values():
+            for name, info in entry['artifacts'].items():
+                if info['path'].startswith(f"{OBJECTS_DIR}/"):
+                    continue
+                path = self.model_dir / info['path']
+                if not path.exists():
+                    # Arquivo compartilhado já migrado por outra versão
+                    target = self.model_dir / OBJECTS_DIR / f"{info['sha256']}{path.suffix}"
+                    if not target.exists():
+                        raise FileNotFoundError(f"Artefato '{name}' não encontrado: {path}")
+                    info['path'] = self._relative(target)
+                    continue
+                duplicate = (self.model_dir / OBJECTS_DIR / f"{info['sha256']}{path.suffix}").exists()
+                entry['artifacts'][name] = self.store_object(path)
+                removed += int(duplicate)
+        self.manifest['format_version'] = MANIFEST_FORMAT_VERSION
+        self.save()
+        return removed
+
+    def collect_garbage(self, dry_run: bool = False) -> list:
+        """
+        Remove objetos que nenhuma versão referencia
+
+        Returns:
+            Lista dos objetos removidos
+        """
+        referenced = {info['path']
+                      for entry in self.manifest['versions'].values()
+                      for info in entry['artifacts'].values()}
+        removed = []
+        for path in sorted((self.model_dir / OBJECTS_DIR).glob("*")):
+            if self._relative(path) not in referenced:
+                removed.append(path.name)
+                if not dry_run:
+                    path.unlink()
+        return removed
+
+    def content_hashes(self, version: str) -> dict:
+        """Retorna o hash de cada artefato de uma versão"""
+        return {name: info['sha256'] for name, info in self.get(version)['artifacts'].items()}
+
+    def annotate(self, version: str, key: str, value):
+        """
+        Grava uma informação adicional na entrada de uma versão
+
+        Args:
+            version: Versão do modelo
+            key: Chave da informação (ex: 'promotion')
+            value: Valor serializável em JSON
+        """
+        self.get(version)[key] = value
+        self.save()
+
+    def set_current(self, version: str):
+        """Promove uma versão registrada a atual"""
+        self.get(version)
+        self.manifest['current'] = version
+        self.save()
+        logger.info(f"Versão atual: {version}")
+
+    def resolve(self, version: str = None, verify: bool = True) -> dict:
+        """
+        Resolve os caminhos dos artefatos de uma versão
+
+        Args:
+            version: Versão do modelo (se None, usa a versão atual)
+            verify: Se True, confere tamanho e hash de cada artefato
+
+        Returns:
+            Dicionário nome -> Path
+        """
+        version = version or self.current
+        if not version:
+            raise FileNotFoundError("Nenhuma versão atual no manifest. Execute train_model.py primeiro.")
+        if verify:
+            self.verify(version)
+        return {name: self.model_dir / info['path']
+                for name, info in self.get(version)['artifacts'].items()}
+
+    def verify(self, version: str, names: list = None):
+        """
+        Confere se os artefatos de uma versão existem e não foram alterados
+
+        Args:
+            version: Versão do modelo
+            names: Artefatos a conferir (se None, todos)
+
+        Raises:
+            FileNotFoundError: Se algum artefato não existir
+            ValueError: Se o tamanho ou o hash não conferirem
+        """
+        for name, info in self.get(version)['artifacts'].items():
+            if names is not None and name not in names:
+                continue
+            path = self.model_dir / info['path']
+            if not path.exists():
+                raise FileNotFoundError(f"Artefato '{name}' da versão {version} não encontrado: {path}")
+            if path.stat().st_size != info['size']:
+                raise ValueError(f"Tamanho do artefato '{name}' da versão {version} não confere")
+            if file_sha256(path) != info['sha256']:
+                raise ValueError(f"Hash do artefato '{name}' da versão {version} não confere")
+
+    def prune(self, keep: int = 3, dry_run: bool = False) -> list:
+        """
+        Remove versões antigas e seus artefatos
+
+        Mantém as `keep` versões mais recentes e sempre a versão atual.
+
+        Args:
+            keep: Número de versões mais recentes mantidas
+            dry_run: Se True, apenas retorna o que seria removido
+
+        Returns:
+            Lista das versões removidas
+        """
+        versions = self.versions()
+        kept = set(versions[-keep:]) if keep > 0 else set()
+        if self.current:
+            kept.add(self.current)
+        removed = [v for v in versions if v not in kept]
+        if dry_run:
+            return removed
+
+        for version in removed:
+            for info in self.get(version)['artifacts'].values():
+                path = self.model_dir / info['path']
+                if path.exists() and not self._is_referenced(info['path'], exclude=version):
+                    path.unlink()
+            del self.manifest['versions'][version]
+            logger.info(f"Versão {version} removida")
+        self.save()
+        return removed
+
+    def rebuild_from_files(self) -> list:
+        """
+        Recria o manifest a partir dos arquivos no formato antigo
+
+        A ordem das versões é dada pelo nome (timestamp), não pelo mtime,
+        e a versão atual passa a ser a mais recente. Os arquivos são
+        movidos para `objects/`.
+
+        Returns:
+            Lista das versões registradas
+        """
+        self._manifest = {'format_version': MANIFEST_FORMAT_VERSION, 'current': None, 'versions': {}}
+        versions = sorted(p.stem.replace("model_", "") for p in self.model_dir.glob("model_*.pkl"))
+        for version in versions:
+            artifacts = {}
+            for name, pattern in LEGACY_ARTIFACTS.items():
+                path = self.model_dir / pattern.format(version=version)
+                if path.exists():
+                    artifacts[name] = path
+            created_at = self._created_at_from_version(version)
+            self.register(version, artifacts, make_current=True, created_at=created_at)
+        return versions
+
+    def _relative(self, path: Path) -> str:
+        """Caminho do artefato relativo ao diretório de modelos"""
+        try:
+            return Path(path).resolve().relative_to(self.model_dir.resolve()).as_posix()
+        except ValueError:
+            raise ValueError(f"Artefato fora do diretório de modelos: {path}")
+
+    def _is_referenced(self, relative_path: str, exclude: str) -> bool:
+        """Indica se outro registro ainda referencia o mesmo arquivo"""
+        for version, entry in self.manifest['versions'].items():
+            if version == exclude:
+                continue
+            if any(info['path'] == relative_path for info in entry['artifacts'].values()):
+                return True
+        return False
+
+    @staticmethod
+    def _created_at_from_version(version: str):
+        """Converte uma versão no formato AAAAMMDD_HHMMSS em data ISO"""
+        try:
+            return datetime.strptime(version, "%Y%m%d_%H%M%S").isoformat()
+        except ValueError:
+            return None
@@ -4,8 +4,9 @@ Módulo de treinamento do modelo de Machine Learning
 
 import pandas as pd
 import numpy as np
-import pickle
 import json
+import tempfile
+import time
 from pathlib import Path
 from datetime import datetime
 import logging
@@ -13,7 +14,15 @@ import logging
 from sklearn.model_selection import train_test_split, cross_val_score
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 from sklearn.preprocessing import StandardScaler
-import xgboost as xgb
+
+from model_registry import ModelRegistry
+from model_backends import XGBoostBackend, get_backend
+import model_io
+import model_compaction
+import cv_scheduler
+import out_of_core
+import hyperparameter_search
+import onnx_backend
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -22,20 +31,33 @@ logger = logging.getLogger(__name__)
 class ModelTrainer:
     """Classe para treinamento do modelo de regressão"""
     
-    def __init__(self, model_dir: str = "models"):
+    def __init__(self, model_dir: str = "models", backend: str = "xgboost"):
         """
         Inicializa o treinador de modelo
         
         Args:
             model_dir: Diretório para salvar modelos
+            backend: Backend de modelo (ver model_backends.BACKENDS)
         """
         self.model_dir = Path(model_dir)
         self.model_dir.mkdir(exist_ok=True)
+        self.registry = ModelRegistry(self.model_dir)
         
+        self.backend = get_backend(backend)
         self.model = None
+        # Conjunto de validação do último treino (importância por permutação)
+        self.validation_data = None
         self.scaler = StandardScaler()
         self.feature_names = None
         self.metrics = {}
+        self.train_time_s = None
+        self.comparison = None
+        self.compaction = None
+        self.search = None
+        self.cv_report = None
+        self.incremental = None
+        self.out_of_core = None
+        self.base_metadata = None
         
     def prepare_data(self, X: pd.DataFrame, y: pd.Series, test_size: float = 0.15, val_size: float = 0.15):
         """
@@ -73,6 +95,26 @@ class ModelTrainer:
         return (X_train_scaled, X_val_scaled, X_test_scaled, 
                 y_train, y_val, y_test)
     
+    def train(self, X_train, y_train, X_val, y_val):
+        """
+        Treina o modelo do backend configurado
+        
+        Args:
+            X_train: Features de treino
+            y_train: Target de treino
+            X_val: Features de validação
+            y_val: Target de validação
+        """
+        logger.info(f"Treinando modelo ({self.backend.name})...")
+        
+        start = time.perf_counter()
+        self.model = self.backend.fit(X_train, y_train, X_val, y_val)
+        self.validation_data = (X_val, y_val)
+        self.train_time_s = time.perf_counter() - start
+        
+        logger.info(f"Modelo treinado com sucesso em {self.train_time_s:.2f}s!")
+        return self.model
+    
     def train_xgboost(self, X_train, y_train, X_val, y_val):
         """
         Treina modelo XGBoost
@@ -83,50 +125,198 @@ class ModelTrainer:
             X_val: Features de validação
             y_val: Target de validação
         """
-        logger.info("Treinando modelo XGBoost...")
-        
-        # Parâmetros do modelo
-        params = {
-            'objective': 'reg:squarederror',
-            'n_estimators': 100,
-            'max_depth': 6,
-            'learning_rate': 0.1,
-            'subsample': 0.8,
-            'colsample_bytree': 0.8,
-            'random_state': 42,
-            'n_jobs': -1
-        }
+        if not isinstance(self.backend, XGBoostBackend):
+            self.backend = get_backend('xgboost')
+        return self.train(X_train, y_train, X_val, y_val)
+    
+    def _reference_predictor(self, version: str):
+        """
+        Função de predição da versão de referência do drift (com o scaler
+        dela), ou None se a versão não puder ser carregada
         
-        self.model = xgb.XGBRegressor(**params)
+        Args:
+            version: Versão do último retreino completo
         
-        # Treinar modelo (compatível com diferentes versões do XGBoost)
-        # Em versões mais recentes, early_stopping_rounds deve estar no construtor
-        # Em versões antigas, pode estar no fit ou não existir
+        Returns:
+            Função que recebe as features sem normalização e retorna as predições
+        """
+        reference = ModelTrainer(model_dir=str(self.model_dir))
         try:
-            # Versão mais recente: early_stopping_rounds no construtor
-            self.model = xgb.XGBRegressor(**params, early_stopping_rounds=10)
-            self.model.fit(
-                X_train, y_train,
-                eval_set=[(X_val, y_val)],
-                verbose=False
-            )
-        except TypeError:
-            # Versão intermediária: early_stopping_rounds no fit
-            try:
-                self.model = xgb.XGBRegressor(**params)
-                self.model.fit(
-                    X_train, y_train,
-                    eval_set=[(X_val, y_val)],
-                    early_stopping_rounds=10,
-                    verbose=False
-                )
-            except TypeError:
-                # Versão antiga: sem early stopping
-                self.model = xgb.XGBRegressor(**params)
-                self.model.fit(X_train, y_train, verbose=False)
-        
-        logger.info("Modelo treinado com sucesso!")
-        return self.model
+            reference.load_model(version)
+        except (KeyError, FileNotFoundError, ValueError) as e:
+            logger.warning(f"Versão de referência indisponível ({e}): comparando com o modelo base")
+            return None
+        if set(reference.feature_names) != set(self.feature_names):
+            logger.warning(f"Versão de referência {version} com outras features: comparando com o modelo base")
+            return None
+        return lambda X: reference.model.predict(reference.scaler.transform(X[reference.feature_names]))
+    
+    def train_incremental(self, X_new, y_new, rounds: int = 20, holdout: float = 0.2,
+                          drift_threshold: float = 0.1, X_old=None, y_old=None):
+        """
+        Continua o boosting do modelo carregado com um lote novo de linhas
+        
+        As novas árvores são treinadas sobre as linhas do lote partindo das
+        predições do modelo atual (`xgb_model=`), com os mesmos parâmetros e
+        o mesmo scaler. O drift compara, nas mesmas linhas, o modelo
+        continuado e o modelo do último retreino completo (`reference_version`
+        nos metadados): o holdout compartilhado junta a parte do lote deixada
+        de fora e as linhas antigas (`X_old`). Se a piora relativa do MAE
+        passar de `drift_threshold`, o relatório indica que é preciso um
+        retreino completo (`fallback`). O MAE nas linhas antigas é reportado
+        à parte, para que o esquecimento fique visível.
+        
+        Args:
+            X_new: Features do lote (sem normalização, colunas de feature_names)
+            y_new: Target do lote
+            rounds: Rodadas de boosting adicionadas
+            holdout: Fração do lote usada só para avaliação
+            drift_threshold: Piora relativa máxima do MAE em relação à referência
+            X_old: Features de uma amostra dos dados antigos (sem normalização)
+            y_old: Target da amostra dos dados antigos
+        
+        Returns:
+            Relatório do treino incremental
+        """
+        import xgboost as xgb
+        
+        if self.model is None or self.base_metadata is None:
+            raise ValueError("Carregue o modelo atual (load_model) antes do treino incremental")
+        if not isinstance(self.backend, XGBoostBackend):
+            raise ValueError(f"Backend {self.backend.name} não suporta treino incremental")
+        
+        X_new = X_new[self.feature_names]
+        X_fit, X_holdout, y_fit, y_holdout = train_test_split(
+            X_new, y_new, test_size=holdout, random_state=42
+        )
+        
+        # Holdout compartilhado: as mesmas linhas para todos os modelos comparados
+        holdouts = {'new': (X_holdout, y_holdout)}
+        if X_old is not None and len(X_old):
+            holdouts['old'] = (X_old[self.feature_names], y_old)
+        holdouts['shared'] = (pd.concat([X for X, _ in holdouts.values()], ignore_index=True),
+                              pd.concat([y for _, y in holdouts.values()], ignore_index=True))
+        
+        # Continuar a partir das árvores efetivamente servidas (até a melhor iteração)
+        booster = self.model.get_booster()
+        best_iteration = getattr(self.model, 'best_iteration', None)
+        if best_iteration is not None:
+            booster = booster[0:best_iteration + 1]
+        base_rounds = booster.num_boosted_rounds()
+        base_predict = lambda X: booster.inplace_predict(self.scaler.transform(X))
+        
+        # Referência: o último retreino completo (o modelo base, se não estiver disponível)
+        reference_version = self.base_metadata.get('reference_version', self.base_metadata['version'])
+        reference_predict = self._reference_predictor(reference_version)
+        if reference_predict is None:
+            reference_version, reference_predict = self.base_metadata['version'], base_predict
+        
+        logger.info(f"Treino incremental: +{rounds} rodadas sobre {len(X_fit)} linhas novas "
+                    f"(modelo base com {base_rounds} rodadas)...")
+        start = time.perf_counter()
+        model = xgb.XGBRegressor(**{**self.backend.xgb_params, 'n_estimators': rounds})
+        model.fit(self.scaler.transform(X_fit), y_fit, xgb_model=booster, verbose=False)
+        self.train_time_s = time.perf_counter() - start
+        self.model = model
+        warm_predict = lambda X: model.predict(self.scaler.transform(X))
+        
+        mae = {}
+        for name, predict in (('base', base_predict), ('reference', reference_predict), ('warm', warm_predict)):
+            for split, (X, y) in holdouts.items():
+                mae[f'{name}_{split}'] = float(np.mean(np.abs(predict(X) - np.asarray(y))))
+        X_shared, y_shared = holdouts['shared']
+        self.metrics = self._compute_metrics(y_shared, warm_predict(X_shared))
+        drift = mae['warm_shared'] / mae['reference_shared'] - 1
+        base_train_time_s = self.base_metadata.get('full_train_time_s') or self.base_metadata.get('train_time_s')
+        
+        self.incremental = {
+            'base_version': self.base_metadata['version'],
+            'reference_version': reference_version,
+            'base_rounds': base_rounds,
+            'rounds_added': rounds,
+            'new_rows': int(len(X_new)),
+            'fit_rows': int(len(X_fit)),
+            'holdout_rows': int(len(X_holdout)),
+            'old_rows': int(len(holdouts['old'][0])) if 'old' in holdouts else 0,
+            'train_time_s': self.train_time_s,
+            'full_train_time_s': base_train_time_s,
+            'base_holdout_MAE': mae['base_new'],
+            'holdout_MAE': mae['warm_new'],
+            'reference_holdout_MAE': mae['reference_new'],
+            'old_MAE': mae.get('warm_old'),
+            'base_old_MAE': mae.get('base_old'),
+            'reference_old_MAE': mae.get('reference_old'),
+            'shared_MAE': mae['warm_shared'],
+            'reference_MAE': mae['reference_shared'],
+            'drift': drift,
+            'drift_threshold': drift_threshold,
+            'fallback': drift > drift_threshold
+        }
+        
+        logger.info(f"MAE no lote (holdout): R$ {mae['base_new']:.2f} antes, R$ {mae['warm_new']:.2f} depois "
+                    f"(referência {reference_version}: R$ {mae['reference_new']:.2f})")
+        if 'old' in holdouts:
+            logger.info(f"MAE nas {self.incremental['old_rows']} linhas antigas: R$ {mae['base_old']:.2f} antes, "
+                        f"R$ {mae['warm_old']:.2f} depois (referência: R$ {mae['reference_old']:.2f})")
+        else:
+            logger.warning("Sem linhas antigas no holdout: o esquecimento não é medido")
+        logger.info(f"MAE no holdout compartilhado: R$ {mae['warm_shared']:.2f} contra "
+                    f"R$ {mae['reference_shared']:.2f} da referência (drift {drift:+.1%})")
+        if base_train_time_s:
+            logger.info(f"Tempo de treino: {self.train_time_s:.2f}s "
+                        f"({self.train_time_s / base_train_time_s:.0%} do retreino completo)")
+        if self.incremental['fallback']:
+            logger.warning(f"Drift acima do limite ({drift_threshold:.0%}): retreino completo necessário")
+        return self.incremental
+    
+    def train_out_of_core(self, processor, chunk_rows: int = out_of_core.DEFAULT_CHUNK_ROWS,
+                          external_memory: bool = False, eval_rows: int = out_of_core.DEFAULT_EVAL_ROWS):
+        """
+        Treina o XGBoost lendo o CSV em blocos (ver out_of_core)
+        
+        O scaler é ajustado nas features da amostra do processador (fit_sample)
+        ou, sem amostra (fit_streaming), em uma passada pelos blocos
+        processados (`partial_fit`); o modelo é avaliado na amostra de teste
+        sorteada durante a leitura.
+        
+        Args:
+            processor: DataProcessor já ajustado (fit_sample ou fit_streaming)
+            chunk_rows: Linhas lidas por bloco
+            external_memory: Se True, as páginas quantizadas ficam em disco
+            eval_rows: Tamanho máximo das amostras de validação e de teste
+        
+        Returns:
+            Relatório do treino (blocos, linhas, passadas, tempos e pico de memória)
+        """
+        if not isinstance(self.backend, XGBoostBackend):
+            raise ValueError(f"Backend {self.backend.name} não suporta treino out-of-core")
+        
+        self.feature_names = list(processor.feature_names)
+        if processor.processed_df is not None:
+            self.scaler.fit(processor.processed_df[self.feature_names])
+        else:
+            logger.info("Ajustando o scaler em blocos...")
+            for X_chunk, _ in processor.iter_processed_chunks(chunk_rows):
+                self.scaler.partial_fit(X_chunk)
+        
+        logger.info(f"Treinando modelo ({self.backend.name}) em blocos de {chunk_rows} linhas"
+                    f"{' com memória externa' if external_memory else ''}...")
+        start = time.perf_counter()
+        booster, X_test, y_test, report = out_of_core.train(
+            processor, self.scaler, self.backend.xgb_params, chunk_rows=chunk_rows,
+            eval_rows=eval_rows, external_memory=external_memory
+        )
+        self.train_time_s = time.perf_counter() - start
+        self.model = model_compaction.from_booster(booster)
+        self.out_of_core = report
+        if getattr(processor, 'streaming_stats', None) is not None:
+            report['pipeline_stats'] = processor.streaming_stats
+        
+        logger.info(f"Modelo treinado com sucesso em {self.train_time_s:.2f}s "
+                    f"({report['train_rows']} linhas de treino, {report['best_rounds']} rodadas, "
+                    f"pico de memória {report['peak_rss_mb']:.0f} MB)")
+        self.evaluate(X_test, y_test)
+        return report
     
     def evaluate(self, X_test, y_test):
         """
@@ -138,9 +328,17 @@ class ModelTrainer:
         """
         logger.info("Avaliando modelo...")
         
-        y_pred = self.model.predict(X_test)
+        self.metrics = self._compute_metrics(y_test, self.model.predict(X_test))
         
-        # Calcular métricas
+        logger.info(f"MAE: R$ {self.metrics['MAE']:.2f} ({self.metrics['MAE_PCT']:.2f}%)")
+        logger.info(f"RMSE: R$ {self.metrics['RMSE']:.2f}")
+        logger.info(f"R²: {self.metrics['R2']:.4f}")
+        
+        return self.metrics
+    
+    @staticmethod
+    def _compute_metrics(y_test, y_pred) -> dict:
+        """Calcula as métricas de regressão"""
         mae = mean_absolute_error(y_test, y_pred)
         rmse = np.sqrt(mean_squared_error(y_test, y_pred))
         r2 = r2_score(y_test, y_pred)
@@ -148,7 +346,7 @@ class ModelTrainer:
         # MAE como porcentagem da média
         mae_pct = (mae / y_test.mean()) * 100
         
-        self.metrics = {
+        return {
             'MAE': float(mae),
             'RMSE': float(rmse),
             'R2': float(r2),
@@ -156,59 +354,179 @@ class ModelTrainer:
             'mean_actual': float(y_test.mean()),
             'mean_predicted': float(y_pred.mean())
         }
+    
+    def search_hyperparameters(self, X_train, y_train, X_val, y_val, n_configs: int = None,
+                               cpus: int = None, max_rounds: int = None) -> dict:
+        """
+        Busca hiperparâmetros do XGBoost (successive halving) e os aplica ao backend
         
-        logger.info(f"MAE: R$ {mae:.2f} ({mae_pct:.2f}%)")
-        logger.info(f"RMSE: R$ {rmse:.2f}")
-        logger.info(f"R²: {r2:.4f}")
+        Ver hyperparameter_search. A melhor configuração (inclusive o número
+        de árvores) substitui os parâmetros do backend no treino seguinte, e
+        o relatório é gravado nos metadados.
         
-        return self.metrics
+        Args:
+            X_train, y_train: Conjunto de treino
+            X_val, y_val: Conjunto de validação
+            n_configs: Configurações sorteadas (se None, o padrão do módulo)
+            cpus: Orçamento de núcleos (se None, todos)
+            max_rounds: Rodadas de boosting do último degrau (se None, o padrão)
+        
+        Returns:
+            Relatório da busca
+        """
+        if not isinstance(self.backend, XGBoostBackend):
+            raise ValueError(f"Backend {self.backend.name} não suporta a busca de hiperparâmetros")
+        
+        options = {'n_configs': n_configs, 'cpus': cpus, 'max_rounds': max_rounds}
+        report = hyperparameter_search.successive_halving(
+            X_train, y_train, X_val, y_val, **{k: v for k, v in options.items() if v is not None}
+        )
+        self.backend = XGBoostBackend(self.backend.name, **{**self.backend.xgb_params, **report['best']['params']})
+        self.search = report
+        return report
+    
+    def compare_backends(self, backends: list, X_train, y_train, X_val, y_val, X_test, y_test,
+                         batch_size: int = 1000) -> list:
+        """
+        Treina e compara vários backends nos mesmos conjuntos de dados
+        
+        Para cada backend mede MAE/RMSE/R² no teste, tempo de treino, tamanho
+        do artefato salvo e latência de predição para uma linha e para um
+        lote. O modelo do treinador não é alterado: a escolha do backend de
+        produção continua explícita (parâmetro `backend`).
+        
+        Args:
+            backends: Nomes dos backends comparados
+            X_train, y_train: Conjunto de treino
+            X_val, y_val: Conjunto de validação
+            X_test, y_test: Conjunto de teste
+            batch_size: Tamanho do lote da medição de latência
+        
+        Returns:
+            Lista com uma linha de resultados por backend
+        """
+        X_batch = np.resize(X_test, (batch_size, X_test.shape[1]))
+        rows = []
+        for name in backends:
+            backend = get_backend(name)
+            logger.info(f"Comparando backend {name}...")
+            
+            start = time.perf_counter()
+            model = backend.fit(X_train, y_train, X_val, y_val)
+            train_time_s = time.perf_counter() - start
+            
+            metrics = self._compute_metrics(y_test, model.predict(X_test))
+            
+            with tempfile.TemporaryDirectory() as tmp:
+                artifact_path = Path(tmp) / f"model{backend.suffix}"
+                backend.save(model, artifact_path)
+                artifact_kb = artifact_path.stat().st_size / 1024
+            
+            rows.append({
+                'backend': name,
+                'MAE': metrics['MAE'],
+                'R2': metrics['R2'],
+                'train_s': train_time_s,
+                'artifact_kb': artifact_kb,
+                'single_ms': self._median_latency(model, X_test[:1], repeats=200) * 1000,
+                'batch_ms': self._median_latency(model, X_batch, repeats=20) * 1000
+            })
+        
+        self.comparison = rows
+        return rows
+    
+    @staticmethod
+    def _median_latency(model, X, repeats: int) -> float:
+        """Mediana do tempo (em segundos) de uma chamada de predict"""
+        model.predict(X)
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            model.predict(X)
+            timings.append(time.perf_counter() - start)
+        return float(np.median(timings))
+    
+    def compact(self, X_train, y_train, X_val, y_val, X_test, y_test,
+                mae_tolerance: float = model_compaction.DEFAULT_MAE_TOLERANCE, apply: bool = True) -> dict:
+        """
+        Procura um ensemble menor (truncado ou destilado) com MAE parecido
+        
+        Ver model_compaction. O menor candidato cujo MAE de validação fica
+        até `mae_tolerance` acima do modelo treinado substitui o modelo (se
+        `apply`), e o relatório é gravado nos metadados.
+        
+        Args:
+            X_train, y_train: Conjunto de treino
+            X_val, y_val: Conjunto de validação (escolha do candidato)
+            X_test, y_test: Conjunto de teste (apenas reportado)
+            mae_tolerance: Aumento relativo máximo do MAE de validação
+            apply: Se True, o modelo escolhido substitui o modelo treinado
+        
+        Returns:
+            Relatório da compactação
+        """
+        if self.model is None:
+            raise ValueError("Modelo não treinado")
+        if not isinstance(self.backend, XGBoostBackend):
+            raise ValueError(f"Backend {self.backend.name} não suporta compactação")
+        
+        logger.info(f"Compactando ensemble (tolerância de MAE: {mae_tolerance:.0%})...")
+        model, report = model_compaction.compact(
+            self.model, X_train, X_val, y_val, X_test, y_test, mae_tolerance=mae_tolerance
+        )
+        self.compaction = report
+        
+        if apply and model is not self.model:
+            self.model = model
+            self.evaluate(X_test, y_test)
+        return report
     
-    def cross_validate(self, X, y, cv: int = 5):
+    def cross_validate(self, X, y, cv: int = 5, cpus: int = None):
         """
         Validação cruzada
         
+        Para o XGBoost, os núcleos são divididos explicitamente entre folds
+        simultâneos e threads por fold (ver cv_scheduler), sem o excesso de
+        threads de `cross_val_score(n_jobs=-1)` com `n_jobs=-1` no modelo.
+        
         Args:
             X: Features
             y: Target
             cv: Número de folds
+            cpus: Orçamento de núcleos (se None, todos)
         """
         logger.info(f"Executando validação cruzada (k={cv})...")
         
-        # Criar modelo sem early stopping para validação cruzada
-        # (early stopping requer eval_set que não está disponível em CV)
-        params = {
-            'objective': 'reg:squarederror',
-            'n_estimators': 100,
-            'max_depth': 6,
-            'learning_rate': 0.1,
-            'subsample': 0.8,
-            'colsample_bytree': 0.8,
-            'random_state': 42,
-            'n_jobs': -1
-        }
-        
-        cv_model = xgb.XGBRegressor(**params)
-        
-        scores = cross_val_score(
-            cv_model, X, y, 
-            cv=cv, 
-            scoring='neg_mean_absolute_error',
-            n_jobs=-1
-        )
-        
-        cv_mae = -scores.mean()
-        cv_std = scores.std()
+        if isinstance(self.backend, XGBoostBackend):
+            # Sem early stopping (não há conjunto de validação em CV)
+            self.cv_report = cv_scheduler.cross_validate(self.backend.xgb_params, X, y, folds=cv, cpus=cpus)
+            cv_mae, cv_std = self.cv_report['MAE'], self.cv_report['MAE_std']
+        else:
+            # Os demais backends já paralelizam internamente (ou são baratos):
+            # folds em sequência evitam o mesmo excesso de threads
+            cv_model = self.backend.build(early_stopping=False)
+            scores = cross_val_score(
+                cv_model, X, y, 
+                cv=cv, 
+                scoring='neg_mean_absolute_error',
+                n_jobs=1
+            )
+            cv_mae = -scores.mean()
+            cv_std = scores.std()
         
         logger.info(f"CV MAE: R$ {cv_mae:.2f} (+/- {cv_std:.2f})")
         
         return cv_mae, cv_std
     
     def get_feature_importance(self, top_n: int = 10):
-        """Retorna importância das features"""
+        """Retorna importância das features (lista vazia se o backend não as calcular)"""
         if self.model is None:
             raise ValueError("Modelo não treinado")
         
-        importance = self.model.feature_importances_
+        importance = self.backend.feature_importances(self.model, *(self.validation_data or (None, None)))
+        if importance is None:
+            logger.warning(f"Importância das features indisponível para o backend {self.backend.name}")
+            return []
         feature_importance = list(zip(self.feature_names, importance))
         feature_importance.sort(key=lambda x: x[1], reverse=True)
         
@@ -216,12 +534,40 @@ class ModelTrainer:
         result = [(name, float(imp)) for name, imp in feature_importance[:top_n]]
         return result
     
-    def save_model(self, version: str = None):
+    def export_onnx(self, path):
+        """
+        Exporta o modelo treinado, com o scaler incorporado, para ONNX
+        
+        Exporta apenas as árvores até a melhor iteração do early stopping,
+        como no predict do XGBRegressor.
+        
+        Args:
+            path: Caminho do arquivo .onnx
+        """
+        if self.model is None:
+            raise ValueError("Modelo não treinado")
+        if not self.backend.supports_onnx:
+            raise ValueError(f"Backend {self.backend.name} não suporta exportação para ONNX")
+        
+        best_iteration = getattr(self.model, 'best_iteration', None)
+        iteration_range = (0, best_iteration + 1) if best_iteration is not None else (0, 0)
+        onnx_backend.export_onnx(self.model.get_booster(), self.scaler, path, iteration_range)
+    
+    def save_model(self, version: str = None, encoding_data: dict = None, make_current: bool = True,
+                   export_onnx: bool = True):
         """
-        Salva o modelo treinado
+        Salva o modelo treinado e registra a versão no manifest
         
         Args:
             version: Versão do modelo (se None, usa timestamp)
+            encoding_data: Mapeamentos de encoding e valores únicos (salvos em encoding_<versão>.json)
+                e, opcionalmente, sketches de quantis das colunas numéricas
+                (`quantile_sketches`, salvos nos metadados) e o relatório por
+                etapa do processamento (`pipeline_report`, salvo como o
+                artefato 'pipeline_report')
+            make_current: Se True, marca a versão como atual no manifest
+            export_onnx: Se True, exporta também o modelo em ONNX (se onnx e
+                onnxmltools estiverem instalados)
         """
         if self.model is None:
             raise ValueError("Modelo não treinado")
@@ -229,57 +575,132 @@ class ModelTrainer:
         if version is None:
             version = datetime.now().strftime("%Y%m%d_%H%M%S")
         
-        model_path = self.model_dir / f"model_{version}.pkl"
-        scaler_path = self.model_dir / f"scaler_{version}.pkl"
-        metadata_path = self.model_dir / f"metadata_{version}.json"
+        # Os arquivos são gravados em uma área temporária e depois movidos pelo
+        # registro para objects/<sha256> (artefatos idênticos não são duplicados)
+        staging_dir = self.model_dir / ".staging"
+        staging_dir.mkdir(exist_ok=True)
         
-        # Salvar modelo
-        with open(model_path, 'wb') as f:
-            pickle.dump(self.model, f)
-        logger.info(f"Modelo salvo em {model_path}")
+        model_path = staging_dir / f"model_{version}{self.backend.suffix}"
+        scaler_path = staging_dir / f"scaler_{version}.npz"
+        metadata_path = staging_dir / f"metadata_{version}.json"
         
-        # Salvar scaler
-        with open(scaler_path, 'wb') as f:
-            pickle.dump(self.scaler, f)
-        logger.info(f"Scaler salvo em {scaler_path}")
+        # Salvar modelo no formato do backend (XGBoost: formato nativo .ubj)
+        self.backend.save(self.model, model_path)
+        
+        # Salvar scaler em .npz (pode ser mapeado em memória)
+        model_io.save_scaler(self.scaler, scaler_path)
         
         # Salvar metadados (garantir que todos os valores são serializáveis)
         metadata = {
             'version': version,
             'timestamp': datetime.now().isoformat(),
+            'backend': self.backend.name,
+            'model_format': self.backend.model_format,
+            'params': self.backend.params(),
+            'train_time_s': self.train_time_s,
             'metrics': {k: float(v) if isinstance(v, (np.integer, np.floating)) else v 
                        for k, v in self.metrics.items()},
             'feature_names': self.feature_names,
             'feature_importance': self.get_feature_importance(20)
         }
+        if self.comparison is not None:
+            metadata['backend_comparison'] = self.comparison
+        if self.compaction is not None:
+            metadata['compaction'] = self.compaction
+        if self.search is not None:
+            metadata['hyperparameter_search'] = self.search
+        if self.cv_report is not None:
+            metadata['cross_validation'] = self.cv_report
+        if self.out_of_core is not None:
+            metadata['out_of_core'] = self.out_of_core
+        # Sketches de quantis (a API usa as medianas nos campos ausentes)
+        if encoding_data is not None and encoding_data.get('quantile_sketches'):
+            metadata['quantile_sketches'] = encoding_data['quantile_sketches']
+        
+        # Referência para os treinos incrementais seguintes: a versão (e o
+        # tempo) do último retreino completo
+        if self.incremental is not None:
+            metadata['training_mode'] = 'incremental'
+            metadata['incremental'] = self.incremental
+            metadata['reference_version'] = self.incremental['reference_version']
+            metadata['full_train_time_s'] = self.incremental['full_train_time_s']
+        else:
+            metadata['training_mode'] = 'full'
+            metadata['reference_version'] = version
+            metadata['full_train_time_s'] = self.train_time_s
         
         with open(metadata_path, 'w') as f:
             json.dump(metadata, f, indent=2)
-        logger.info(f"Metadados salvos em {metadata_path}")
         
-        return model_path, scaler_path, metadata_path
+        artifacts = {
+            'model': model_path,
+            'scaler': scaler_path,
+            'metadata': metadata_path
+        }
+        
+        # Salvar encoding maps e unique values
+        if encoding_data is not None:
+            encoding_path = staging_dir / f"encoding_{version}.npz"
+            model_io.save_encoding(encoding_data, encoding_path)
+            artifacts['encoding'] = encoding_path
+        
+        # Relatório do processamento dos dados (tempo, linhas e memória por etapa)
+        if encoding_data is not None and encoding_data.get('pipeline_report'):
+            report_path = staging_dir / f"pipeline_report_{version}.json"
+            with open(report_path, 'w') as f:
+                json.dump(encoding_data['pipeline_report'], f, indent=2)
+            artifacts['pipeline_report'] = report_path
+        
+        # Exportar para ONNX (backend alternativo da API, dependência opcional)
+        if export_onnx and self.backend.supports_onnx:
+            if onnx_backend.export_available():
+                onnx_path = staging_dir / f"model_{version}.onnx"
+                self.export_onnx(onnx_path)
+                artifacts['onnx'] = onnx_path
+            else:
+                logger.warning("onnx/onnxmltools não instalados. Exportação para ONNX ignorada.")
+        
+        # Registrar versão no manifest
+        self.registry.register(version, artifacts, make_current=make_current)
+        stored = self.registry.resolve(version, verify=False)
+        for name, path in stored.items():
+            logger.info(f"Artefato '{name}' salvo em {path}")
+        
+        return stored['model'], stored['scaler'], stored['metadata']
     
-    def load_model(self, version: str):
+    def load_model(self, version: str = None):
         """
         Carrega modelo salvo
         
         Args:
-            version: Versão do modelo
+            version: Versão do modelo (se None, usa a versão atual do manifest)
         """
-        model_path = self.model_dir / f"model_{version}.pkl"
-        scaler_path = self.model_dir / f"scaler_{version}.pkl"
-        metadata_path = self.model_dir / f"metadata_{version}.json"
-        
-        with open(model_path, 'rb') as f:
-            self.model = pickle.load(f)
-        
-        with open(scaler_path, 'rb') as f:
-            self.scaler = pickle.load(f)
+        if self.registry.exists():
+            artifacts = self.registry.resolve(version)
+            version = version or self.registry.current
+            model_path = artifacts['model']
+            scaler_path = artifacts['scaler']
+            metadata_path = artifacts['metadata']
+        else:
+            model_path = self.model_dir / f"model_{version}.pkl"
+            scaler_path = self.model_dir / f"scaler_{version}.pkl"
+            metadata_path = self.model_dir / f"metadata_{version}.json"
+        
+        # Aceita tanto o formato nativo quanto os pickles antigos
+        self.model = model_io.load_model(model_path)
+        
+        scaler = model_io.load_scaler_artifact(scaler_path, mmap=False)
+        self.scaler = scaler.to_sklearn() if isinstance(scaler, model_io.ArrayScaler) else scaler
         
         with open(metadata_path, 'r') as f:
             metadata = json.load(f)
             self.feature_names = metadata['feature_names']
             self.metrics = metadata.get('metrics', {})
+            self.backend = get_backend(metadata.get('backend', 'xgboost'))
+            if isinstance(self.backend, XGBoostBackend) and 'params' in metadata:
+                # Parâmetros efetivos da versão (ex: após busca de hiperparâmetros)
+                self.backend = XGBoostBackend(self.backend.name, **metadata['params'])
+            self.base_metadata = metadata
         
         logger.info(f"Modelo {version} carregado com sucesso!")
         return self.model
@@ -0,0 +1,167 @@
+"""
+Módulo de exportação do modelo para ONNX e de predição com onnxruntime
+
+O grafo exportado recebe as features sem normalização (float64): o
+StandardScaler é incorporado como nós Sub/Div em float64, seguidos de um
+Cast para float32 e do TreeEnsembleRegressor, reproduzindo a mesma conta do
+caminho nativo (ArrayScaler + XGBoost).
+
+As dependências são opcionais: a exportação usa onnx e onnxmltools e a
+predição usa onnxruntime. Sem elas, o treinamento e a API seguem com o
+XGBoost.
+"""
+
+import logging
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Nome da entrada do grafo (features sem normalização, float64)
+ONNX_INPUT = 'features'
+
+# Opset do domínio padrão usado pelos nós do scaler
+ONNX_OPSET = 15
+
+# Tolerância da conferência com o modelo nativo. O onnxruntime soma as
+# folhas em outra ordem, então as predições diferem nos últimos bits do
+# float32 (centavos em aluguéis de milhares de reais)
+PARITY_RTOL = 1e-5
+PARITY_ATOL = 0.05
+
+
+def export_available() -> bool:
+    """Indica se as bibliotecas de exportação (onnx, onnxmltools) estão instaladas"""
+    try:
+        import onnx  # noqa: F401
+        import onnxmltools  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def runtime_available() -> bool:
+    """Indica se o onnxruntime está instalado"""
+    try:
+        import onnxruntime  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def export_onnx(booster, scaler, path, iteration_range: tuple = (0, 0)):
+    """
+    Exporta o booster, com o scaler incorporado, para um arquivo ONNX
+
+    Args:
+        booster: xgboost.Booster treinado
+        scaler: Scaler ajustado (StandardScaler ou ArrayScaler)
+        path: Caminho do arquivo .onnx
+        iteration_range: Iterações exportadas ((0, 0) exporta todas)
+    """
+    import onnx
+    from onnx import TensorProto, helper, numpy_helper
+    from onnxmltools.convert import convert_xgboost
+    from onnxmltools.convert.common.data_types import FloatTensorType
+
+    begin, end = iteration_range
+    if end > 0:
+        booster = booster[begin:end]
+
+    num_features = len(scaler.mean_)
+    trees = convert_xgboost(booster, initial_types=[('scaled', FloatTensorType([None, num_features]))])
+    graph = trees.graph
+
+    # Scaler em float64 antes do ensemble: (x - média) / desvio, depois float32
+    scaler_nodes = [
+        helper.make_node('Sub', [ONNX_INPUT, 'scaler_mean'], ['centered']),
+        helper.make_node('Div', ['centered', 'scaler_scale'], ['scaled_f64']),
+        helper.make_node('Cast', ['scaled_f64'], ['scaled'], to=TensorProto.FLOAT)
+    ]
+    initializers = [
+        numpy_helper.from_array(np.asarray(scaler.mean_, dtype=np.float64), 'scaler_mean'),
+        numpy_helper.from_array(np.asarray(scaler.scale_, dtype=np.float64), 'scaler_scale')
+    ]
+
+    model = helper.make_model(
+        helper.make_graph(
+            scaler_nodes + list(graph.node),
+            'alugai_xgboost',
+            [helper.make_tensor_value_info(ONNX_INPUT, TensorProto.DOUBLE, [None, num_features])],
+            list(graph.output),
+            initializer=initializers + list(graph.initializer)
+        ),
+        opset_imports=[helper.make_opsetid('', ONNX_OPSET)] +
+                      [opset for opset in trees.opset_import if opset.domain != '']
+    )
+    model.ir_version = trees.ir_version
+    onnx.checker.check_model(model)
+    onnx.save(model, str(path))
+    logger.info(f"Modelo exportado para ONNX em {path}")
+
+
+class OnnxRegressor:
+    """
+    Modelo ONNX executado com onnxruntime na CPU
+
+    Recebe as features sem normalização (o scaler faz parte do grafo).
+    """
+
+    def __init__(self, path, nthread: int = None):
+        """
+        Inicializa a sessão do onnxruntime
+
+        Args:
+            path: Caminho do arquivo .onnx
+            nthread: Threads por predição (se None, o padrão do onnxruntime)
+        """
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if nthread is not None:
+            options.intra_op_num_threads = nthread
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(str(path), options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict(self, X) -> np.ndarray:
+        """Prediz para uma matriz de features sem normalização"""
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        return self.session.run(None, {self.input_name: X})[0].ravel()
+
+
+def check_parity(onnx_model, native_model, scaler, n_rows: int = 512, seed: int = 0) -> float:
+    """
+    Confere se o modelo ONNX reproduz o modelo nativo
+
+    As linhas de teste são sorteadas em torno da média de cada feature (com
+    a dispersão do scaler), incluindo alguns valores ausentes.
+
+    Args:
+        onnx_model: OnnxRegressor
+        native_model: Modelo nativo (recebe features normalizadas)
+        scaler: Scaler do modelo nativo
+        n_rows: Número de linhas conferidas
+        seed: Semente do sorteio
+
+    Returns:
+        Maior diferença absoluta encontrada
+
+    Raises:
+        ValueError: Se alguma predição passar da tolerância
+    """
+    rng = np.random.default_rng(seed)
+    mean = np.asarray(scaler.mean_, dtype=np.float64)
+    scale = np.asarray(scaler.scale_, dtype=np.float64)
+    X = mean + scale * rng.normal(size=(n_rows, len(mean)))
+    X[rng.random(X.shape) < 0.02] = np.nan
+
+    expected = np.asarray(native_model.predict(scaler.transform(X)), dtype=np.float64)
+    actual = np.asarray(onnx_model.predict(X), dtype=np.float64)
+    max_diff = float(np.max(np.abs(expected - actual)))
+    if not np.allclose(actual, expected, rtol=PARITY_RTOL, atol=PARITY_ATOL):
+        raise ValueError(f"Modelo ONNX diverge do modelo nativo (diferença máxima {max_diff:.6f})")
+    return max_diff
@@ -0,0 +1,231 @@
+"""
+Módulo de treinamento fora da memória (out-of-core) a partir de CSV em blocos
+
+O pipeline em memória carrega o CSV inteiro e mantém várias cópias do
+DataFrame durante a limpeza e o encoding, o que limita o tamanho do conjunto
+à RAM disponível. Aqui:
+
+    - O pipeline é ajustado com estatísticas acumuladas em blocos
+      (DataProcessor.fit_streaming) ou em uma amostra limitada
+      (DataProcessor.fit_sample)
+    - O CSV é relido em blocos, cada um limpo, codificado e normalizado
+      (DataProcessor.iter_processed_chunks)
+    - Os blocos alimentam o XGBoost por um `xgboost.DataIter`: a
+      `QuantileDMatrix` guarda só as features quantizadas (1 byte por valor
+      em vez de 8) e a `ExtMemQuantileDMatrix` (`external_memory=True`)
+      grava as páginas quantizadas em disco
+
+A divisão treino/validação/teste é sorteada por bloco com semente fixa (a
+mesma a cada passada do iterador). Validação e teste ficam em amostras de
+tamanho limitado, coletadas na primeira passada.
+"""
+
+import logging
+import os
+import resource
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import xgboost as xgb
+
+import cv_scheduler
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Linhas por bloco lido do CSV
+DEFAULT_CHUNK_ROWS = 100_000
+
+# Tamanho máximo das amostras de validação e de teste
+DEFAULT_EVAL_ROWS = 100_000
+
+# Proporções da divisão (as mesmas de ModelTrainer.prepare_data)
+TEST_SIZE = 0.15
+VAL_SIZE = 0.15
+
+# Rodadas sem melhora na validação antes de parar (o mesmo do XGBoostBackend)
+EARLY_STOPPING_ROUNDS = 10
+
+
+def peak_rss_mb() -> float:
+    """Pico de memória residente do processo, em MB"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def split_chunk(n_rows: int, chunk_index: int, seed: int = 42) -> np.ndarray:
+    """
+    Sorteia a divisão das linhas de um bloco (0: treino, 1: validação, 2: teste)
+
+    A semente depende do índice do bloco, então cada passada sobre os dados
+    produz a mesma divisão.
+    """
+    draws = np.random.default_rng((seed, chunk_index)).random(n_rows)
+    return np.where(draws < TEST_SIZE, 2, np.where(draws < TEST_SIZE + VAL_SIZE, 1, 0))
+
+
+class BoundedSample:
+    """
+    Amostra uniforme de tamanho limitado de linhas (X, y) vistas em blocos
+
+    Cada linha recebe uma chave aleatória e ficam as `max_rows` de menor chave.
+    """
+
+    def __init__(self, max_rows: int, seed: int = 42):
+        """
+        Inicializa a amostra
+
+        Args:
+            max_rows: Tamanho máximo da amostra
+            seed: Semente das chaves
+        """
+        self.max_rows = max_rows
+        self.rng = np.random.default_rng(seed)
+        self.keys = np.empty(0)
+        self.X = None
+        self.y = np.empty(0, dtype=np.float32)
+        self.seen = 0
+
+    def add(self, X: np.ndarray, y: np.ndarray):
+        """Oferece as linhas de um bloco à amostra"""
+        self.seen += len(X)
+        keys = np.concatenate([self.keys, self.rng.random(len(X))])
+        X = X if self.X is None else np.vstack([self.X, X])
+        y = np.concatenate([self.y, y])
+        if len(keys) > self.max_rows:
+            keep = np.sort(np.argpartition(keys, self.max_rows)[:self.max_rows])
+            keys, X, y = keys[keep], X[keep], y[keep]
+        self.keys, self.X, self.y = keys, X, y
+
+
+class ChunkIterator(xgb.DataIter):
+    """
+    Alimenta o XGBoost com os blocos processados do CSV
+
+    Cada chamada de `next` lê, processa e normaliza um bloco e entrega só as
+    linhas de treino. Na primeira passada, as linhas de validação e teste vão
+    para as amostras limitadas.
+    """
+
+    def __init__(self, processor, scaler, chunk_rows: int = DEFAULT_CHUNK_ROWS,
+                 eval_rows: int = DEFAULT_EVAL_ROWS, seed: int = 42, cache_prefix: str = None):
+        """
+        Inicializa o iterador
+
+        Args:
+            processor: DataProcessor já ajustado (fit_sample ou fit_streaming)
+            scaler: Scaler já ajustado
+            chunk_rows: Linhas lidas por bloco
+            eval_rows: Tamanho máximo das amostras de validação e de teste
+            seed: Semente da divisão por bloco
+            cache_prefix: Prefixo dos arquivos de cache (só na memória externa)
+        """
+        self.processor = processor
+        self.scaler = scaler
+        self.chunk_rows = chunk_rows
+        self.seed = seed
+        self.val = BoundedSample(eval_rows, seed=seed + 1)
+        self.test = BoundedSample(eval_rows, seed=seed + 2)
+        self.passes = 0
+        self.train_rows = 0
+        self.chunks = 0
+        self._chunks = None
+        self._index = 0
+        super().__init__(cache_prefix=cache_prefix)
+
+    def reset(self):
+        """Volta ao início do CSV"""
+        self._chunks = None
+        self._index = 0
+
+    def next(self, input_data) -> bool:
+        """Entrega o próximo bloco de treino ao XGBoost; False ao fim do CSV"""
+        if self._chunks is None:
+            self._chunks = self.processor.iter_processed_chunks(self.chunk_rows)
+            self.passes += 1
+        first_pass = self.passes == 1
+
+        for X, y in self._chunks:
+            X = self.scaler.transform(X).astype(np.float32)
+            y = y.to_numpy(dtype=np.float32)
+            split = split_chunk(len(X), self._index, self.seed)
+            self._index += 1
+            if first_pass:
+                self.chunks += 1
+                self.val.add(X[split == 1], y[split == 1])
+                self.test.add(X[split == 2], y[split == 2])
+            train = split == 0
+            if not train.any():
+                continue
+            if first_pass:
+                self.train_rows += int(train.sum())
+            input_data(data=X[train], label=y[train])
+            return True
+        return False
+
+
+def train(processor, scaler, xgb_params: dict, chunk_rows: int = DEFAULT_CHUNK_ROWS,
+          eval_rows: int = DEFAULT_EVAL_ROWS, external_memory: bool = False,
+          cache_dir: str = None, nthread: int = None, max_bin: int = 256, seed: int = 42) -> tuple:
+    """
+    Treina o XGBoost lendo os dados em blocos
+
+    Args:
+        processor: DataProcessor já ajustado (fit_sample ou fit_streaming)
+        scaler: Scaler já ajustado
+        xgb_params: Parâmetros do XGBRegressor
+        chunk_rows: Linhas lidas por bloco
+        eval_rows: Tamanho máximo das amostras de validação e de teste
+        external_memory: Se True, guarda as páginas quantizadas em disco
+            (ExtMemQuantileDMatrix); senão, em memória (QuantileDMatrix)
+        cache_dir: Diretório do cache em disco (se None, um temporário)
+        nthread: Threads do XGBoost (se None, todas)
+        max_bin: Bins da quantização
+        seed: Semente da divisão por bloco
+
+    Returns:
+        (booster, X_test, y_test, relatório)
+    """
+    nthread = nthread or os.cpu_count() or 1
+    params, rounds = cv_scheduler.booster_params(xgb_params, nthread)
+    params['max_bin'] = max_bin
+
+    with tempfile.TemporaryDirectory(dir=cache_dir) as tmp:
+        cache_prefix = str(Path(tmp) / "cache") if external_memory else None
+        iterator = ChunkIterator(processor, scaler, chunk_rows=chunk_rows, eval_rows=eval_rows,
+                                 seed=seed, cache_prefix=cache_prefix)
+
+        start = time.perf_counter()
+        if external_memory:
+            dtrain = xgb.ExtMemQuantileDMatrix(iterator, max_bin=max_bin, nthread=nthread)
+        else:
+            dtrain = xgb.QuantileDMatrix(iterator, max_bin=max_bin, nthread=nthread)
+        build_s = time.perf_counter() - start
+        logger.info(f"Matriz de treino: {iterator.train_rows} linhas em {iterator.chunks} blocos, "
+                    f"{iterator.passes} passadas sobre o CSV em {build_s:.2f}s")
+
+        dval = xgb.QuantileDMatrix(iterator.val.X, iterator.val.y, ref=dtrain, nthread=nthread)
+        start = time.perf_counter()
+        booster = xgb.train(params, dtrain, num_boost_round=rounds, evals=[(dval, 'val')],
+                            early_stopping_rounds=EARLY_STOPPING_ROUNDS, verbose_eval=False)
+        train_s = time.perf_counter() - start
+        # Liberar as matrizes (e os arquivos de cache) antes de apagar o diretório
+        del dtrain, dval
+
+    report = {
+        'chunk_rows': chunk_rows,
+        'chunks': iterator.chunks,
+        'csv_passes': iterator.passes,
+        'external_memory': external_memory,
+        'train_rows': iterator.train_rows,
+        'val_rows': int(len(iterator.val.y)),
+        'test_rows': int(len(iterator.test.y)),
+        'val_rows_seen': iterator.val.seen,
+        'test_rows_seen': iterator.test.seen,
+        'best_rounds': int(booster.best_iteration) + 1,
+        'build_s': build_s,
+        'train_s': train_s,
+        'peak_rss_mb': peak_rss_mb()
+    }
+    return booster, iterator.test.X, iterator.test.y, report
@@ -0,0 +1,145 @@
+"""
+Módulo de cache do conjunto de treino processado
+
+O pipeline do DataProcessor (leitura do CSV, limpeza, outliers, encoding)
+é determinístico: com os mesmos arquivos de dados e a mesma versão do
+pipeline, o resultado é o mesmo. O cache guarda esse resultado em disco,
+endereçado por uma chave que combina:
+
+    - o hash SHA-256 do conteúdo de cada CSV (na ordem em que são lidos)
+    - DataProcessor.PIPELINE_VERSION (incrementada a cada mudança no resultado)
+    - a configuração que altera o resultado (ex: precisão dos quantis)
+
+Cada entrada é um diretório `<chave>/` com:
+
+    - data.npz: uma coluna do DataFrame processado por array (formato
+      colunar binário, sem parsing), mais o índice
+    - state.json: nomes e ordem das colunas, mapeamentos de encoding,
+      valores únicos, sketches de quantis e demais estatísticas ajustadas
+
+Treinos repetidos sobre os mesmos dados (ex: buscas de hiperparâmetros)
+pulam direto para o ajuste do modelo.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+from pathlib import Path
+
+import pandas as pd
+
+import model_io
+from model_registry import file_sha256
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Versão do formato das entradas do cache
+CACHE_FORMAT_VERSION = 1
+
+# Entradas mantidas no diretório do cache (as mais antigas são removidas)
+MAX_ENTRIES = 5
+
+DATA_NAME = "data.npz"
+STATE_NAME = "state.json"
+
+
+def cache_key(paths: list, pipeline_version: int, config: dict = None) -> str:
+    """
+    Chave de uma entrada do cache
+
+    Args:
+        paths: CSVs de entrada, na ordem de leitura
+        pipeline_version: Versão do pipeline de processamento
+        config: Parâmetros que alteram o resultado (serializáveis em JSON)
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps({'format': CACHE_FORMAT_VERSION, 'pipeline_version': pipeline_version,
+                              'config': config or {}}, sort_keys=True).encode())
+    for path in paths:
+        digest.update(file_sha256(path).encode())
+    return digest.hexdigest()
+
+
+def exists(cache_dir, key: str) -> bool:
+    """Se a entrada existe e está completa"""
+    entry = Path(cache_dir) / key
+    return (entry / DATA_NAME).exists() and (entry / STATE_NAME).exists()
+
+
+def save(cache_dir, key: str, frame: pd.DataFrame, state: dict) -> bool:
+    """
+    Grava uma entrada (diretório temporário renomeado no fim: leitores nunca
+    veem uma entrada pela metade)
+
+    Args:
+        cache_dir: Diretório do cache
+        key: Chave da entrada
+        frame: DataFrame processado (colunas numéricas ou booleanas)
+        state: Estado do processador (serializável em JSON)
+
+    Returns:
+        True se a entrada foi gravada
+    """
+    non_numeric = [col for col in frame.columns
+                   if not (pd.api.types.is_numeric_dtype(frame[col]) and frame[col].dtype != object)]
+    if non_numeric:
+        logger.warning(f"Colunas não numéricas {non_numeric}: resultado não armazenado no cache")
+        return False
+
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    entry = cache_dir / key
+    tmp = cache_dir / f".{key}.{os.getpid()}.tmp"
+    tmp.mkdir(exist_ok=True)
+
+    arrays = {f"col_{i}": frame[col].to_numpy() for i, col in enumerate(frame.columns)}
+    arrays['index'] = frame.index.to_numpy()
+    model_io.save_npz(tmp / DATA_NAME, arrays)
+    with open(tmp / STATE_NAME, 'w') as f:
+        json.dump({'format': CACHE_FORMAT_VERSION, 'columns': list(frame.columns), **state}, f)
+
+    if entry.exists():
+        # Outro processo gravou a mesma entrada (mesmo conteúdo)
+        shutil.rmtree(tmp)
+    else:
+        os.replace(tmp, entry)
+    prune(cache_dir)
+    logger.info(f"Dados processados armazenados no cache: {entry}")
+    return True
+
+
+def load(cache_dir, key: str) -> tuple:
+    """
+    Lê uma entrada do cache
+
+    Returns:
+        (DataFrame processado, estado) ou None se a entrada não existir
+    """
+    entry = Path(cache_dir) / key
+    if not exists(cache_dir, key):
+        return None
+    with open(entry / STATE_NAME, 'r') as f:
+        state = json.load(f)
+    if state.get('format') != CACHE_FORMAT_VERSION:
+        return None
+
+    arrays = model_io.load_npz(entry / DATA_NAME, mmap=False)
+    columns = state.pop('columns')
+    frame = pd.DataFrame({col: arrays[f"col_{i}"] for i, col in enumerate(columns)},
+                         index=pd.Index(arrays['index']))
+    # Entrada usada: mais recente para a limpeza
+    os.utime(entry)
+    return frame, state
+
+
+def prune(cache_dir, keep: int = MAX_ENTRIES) -> list:
+    """Remove as entradas menos usadas além das `keep` mais recentes"""
+    entries = sorted((path for path in Path(cache_dir).iterdir() if path.is_dir() and not path.name.startswith('.')),
+                     key=lambda path: path.stat().st_mtime, reverse=True)
+    removed = entries[keep:]
+    for path in removed:
+        shutil.rmtree(path, ignore_errors=True)
+    return removed
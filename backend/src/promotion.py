@@ -0,0 +1,262 @@
+"""
+Módulo de promoção de versões do modelo (gate de latência e memória)
+
+Antes de uma versão recém-treinada virar a versão atual do manifest, ela é
+medida em um processo novo, nas mesmas condições da API (xgboost sem o
+scikit-learn, ensemble compilado, warm-up): tempo de carga, memória
+residente, latência p50/p99 de uma linha e vazão em lote. A promoção é
+recusada se a candidata estourar algum orçamento absoluto ou piorar além da
+tolerância em relação à versão atual, mesmo que tenha MAE melhor.
+"""
+
+import json
+import logging
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from model_registry import ModelRegistry
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SRC_DIR = Path(__file__).parent
+
+# Orçamentos padrão (substituídos pelo arquivo de orçamento, se existir)
+DEFAULT_BUDGET = {
+    # Limites absolutos
+    'max_p50_ms': 2.0,
+    'max_p99_ms': 10.0,
+    'min_batch_rows_per_s': 50000,
+    'max_load_s': 1.0,
+    'max_rss_mb': 300,
+    # Piora máxima em relação à versão atual (fração)
+    'max_regression': {
+        'p50_ms': 0.25,
+        'p99_ms': 0.5,
+        'batch_rows_per_s': 0.25,
+        'load_s': 0.5,
+        'rss_mb': 0.2
+    },
+    # Diferença absoluta abaixo da qual a piora é tratada como ruído de medição
+    'noise_floor': {
+        'p50_ms': 0.05,
+        'p99_ms': 0.25,
+        'batch_rows_per_s': 0,
+        'load_s': 0.05,
+        'rss_mb': 5
+    }
+}
+
+# Rodadas de medição por versão (alternando candidata e atual)
+BENCHMARK_ROUNDS = 3
+
+# Métricas em que maior é melhor (as demais: menor é melhor)
+HIGHER_IS_BETTER = {'batch_rows_per_s'}
+
+# Script executado em processo novo para medir uma versão
+BENCHMARK_SCRIPT = """
+import json, logging, sys, time
+logging.disable(logging.CRITICAL)
+sys.path.insert(0, {src_dir!r})
+import numpy as np
+import model_io
+model_io.import_xgboost(lean=True)
+from model_pool import ModelPool
+from warmup import synthetic_requests, warm_up
+
+def rss_mb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+version, single_repeats, batch_size, batch_repeats = sys.argv[1], int(sys.argv[2]), int(sys.argv[3]), int(sys.argv[4])
+start = time.perf_counter()
+pool = ModelPool({models_dir!r}, max_size=1, default_version=version, compile_trees=True, predict_nthread=1)
+bundle = pool.get(version)
+load_s = time.perf_counter() - start
+warm_up(pool)
+
+requests = synthetic_requests(bundle, max_requests=200)
+timings = []
+for i in range(single_repeats):
+    data = requests[i % len(requests)]
+    t = time.perf_counter()
+    bundle.predict(bundle.prepare_features(data))
+    timings.append(time.perf_counter() - t)
+
+features = np.vstack([bundle.prepare_features(requests[i % len(requests)]) for i in range(batch_size)])
+batch_timings = []
+for _ in range(batch_repeats):
+    t = time.perf_counter()
+    bundle.predict(features)
+    batch_timings.append(time.perf_counter() - t)
+
+print(json.dumps({{
+    'load_s': load_s,
+    'rss_mb': rss_mb(),
+    'p50_ms': float(np.percentile(timings, 50)) * 1000,
+    'p99_ms': float(np.percentile(timings, 99)) * 1000,
+    'batch_rows_per_s': batch_size / float(np.median(batch_timings))
+}}))
+"""
+
+
+def load_budget(path=None) -> dict:
+    """
+    Carrega os orçamentos de promoção
+
+    Args:
+        path: Arquivo JSON com os orçamentos (se None ou inexistente, usa os padrões)
+    """
+    budget = json.loads(json.dumps(DEFAULT_BUDGET))
+    if path is not None and Path(path).exists():
+        with open(path, 'r', encoding='utf-8') as f:
+            custom = json.load(f)
+        for section in ('max_regression', 'noise_floor'):
+            budget[section].update(custom.pop(section, {}))
+        budget.update(custom)
+    return budget
+
+
+def benchmark_version(models_dir, version: str, single_repeats: int = 500,
+                      batch_size: int = 1000, batch_repeats: int = 20) -> dict:
+    """
+    Mede uma versão do modelo em um processo Python novo
+
+    Args:
+        models_dir: Diretório dos modelos
+        version: Versão medida
+        single_repeats: Número de predições de uma linha
+        batch_size: Linhas por lote
+        batch_repeats: Número de lotes
+
+    Returns:
+        Métricas: load_s, rss_mb, p50_ms, p99_ms e batch_rows_per_s
+    """
+    script = BENCHMARK_SCRIPT.format(src_dir=str(SRC_DIR), models_dir=str(models_dir))
+    output = subprocess.check_output(
+        [sys.executable, '-W', 'ignore', '-c', script, version,
+         str(single_repeats), str(batch_size), str(batch_repeats)],
+        stderr=subprocess.DEVNULL
+    )
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def best_of(runs: list) -> dict:
+    """
+    Combina várias rodadas de medição pegando o melhor valor de cada métrica
+
+    O ruído de uma máquina compartilhada só piora as medições, então o
+    melhor valor é a estimativa mais estável do custo real.
+    """
+    return {
+        metric: (max if metric in HIGHER_IS_BETTER else min)(run[metric] for run in runs)
+        for metric in runs[0]
+    }
+
+
+def check_budget(candidate: dict, budget: dict, current: dict = None) -> list:
+    """
+    Compara as métricas da candidata com os orçamentos e com a versão atual
+
+    Args:
+        candidate: Métricas da versão candidata
+        budget: Orçamentos (ver DEFAULT_BUDGET)
+        current: Métricas da versão atual (opcional)
+
+    Returns:
+        Lista de violações (vazia se a candidata pode ser promovida)
+    """
+    failures = []
+    limits = [
+        ('p50_ms', budget['max_p50_ms'], "latência p50 {value:.3f} ms acima de {limit:.3f} ms"),
+        ('p99_ms', budget['max_p99_ms'], "latência p99 {value:.3f} ms acima de {limit:.3f} ms"),
+        ('load_s', budget['max_load_s'], "tempo de carga {value:.3f}s acima de {limit:.3f}s"),
+        ('rss_mb', budget['max_rss_mb'], "memória {value:.1f} MB acima de {limit:.1f} MB")
+    ]
+    for metric, limit, message in limits:
+        if candidate[metric] > limit:
+            failures.append(message.format(value=candidate[metric], limit=limit))
+    if candidate['batch_rows_per_s'] < budget['min_batch_rows_per_s']:
+        failures.append(f"vazão em lote {candidate['batch_rows_per_s']:.0f} linhas/s abaixo de "
+                        f"{budget['min_batch_rows_per_s']:.0f} linhas/s")
+
+    if current is not None:
+        noise_floor = budget.get('noise_floor', {})
+        for metric, tolerance in budget['max_regression'].items():
+            if metric in HIGHER_IS_BETTER:
+                worse_by = current[metric] - candidate[metric]
+            else:
+                worse_by = candidate[metric] - current[metric]
+            regressed = worse_by > current[metric] * tolerance and worse_by > noise_floor.get(metric, 0)
+            if regressed:
+                failures.append(f"{metric} {candidate[metric]:.3f} piora mais de {tolerance:.0%} "
+                                f"em relação à versão atual ({current[metric]:.3f})")
+    return failures
+
+
+def promote(registry: ModelRegistry, version: str, budget: dict = None, force: bool = False,
+            rounds: int = BENCHMARK_ROUNDS) -> bool:
+    """
+    Promove uma versão a atual se ela passar pelo gate de latência e memória
+
+    O resultado (métricas da candidata e da versão atual, violações e
+    decisão) fica registrado na entrada da versão no manifest.
+
+    Args:
+        registry: Registro de versões
+        version: Versão candidata
+        budget: Orçamentos (se None, os padrões)
+        force: Se True, promove mesmo com violações
+        rounds: Rodadas de medição por versão
+
+    Returns:
+        True se a versão foi promovida
+    """
+    budget = budget or load_budget()
+    registry.verify(version)
+    current_version = registry.current if registry.current != version else None
+
+    # Candidata e atual são medidas em rodadas alternadas, para que uma
+    # variação passageira da máquina afete as duas da mesma forma
+    candidate_runs, current_runs = [], []
+    for round_number in range(1, rounds + 1):
+        logger.info(f"Rodada {round_number}/{rounds}: medindo versão candidata {version}...")
+        candidate_runs.append(benchmark_version(registry.model_dir, version))
+        if current_version:
+            logger.info(f"Rodada {round_number}/{rounds}: medindo versão atual {current_version}...")
+            current_runs.append(benchmark_version(registry.model_dir, current_version))
+    candidate = best_of(candidate_runs)
+    current = best_of(current_runs) if current_runs else None
+
+    failures = check_budget(candidate, budget, current)
+    for metric in ('p50_ms', 'p99_ms', 'batch_rows_per_s', 'load_s', 'rss_mb'):
+        reference = f" (atual: {current[metric]:.3f})" if current else ""
+        logger.info(f"  {metric:<18}{candidate[metric]:>12.3f}{reference}")
+
+    promoted = not failures or force
+    registry.annotate(version, 'promotion', {
+        'checked_at': datetime.now().isoformat(),
+        'compared_to': current_version,
+        'candidate': candidate,
+        'current': current,
+        'failures': failures,
+        'forced': bool(failures) and force,
+        'promoted': promoted
+    })
+
+    for failure in failures:
+        logger.warning(f"Gate de promoção: {failure}")
+    if not promoted:
+        logger.error(f"Versão {version} NÃO promovida ({len(failures)} violações). "
+                     f"Versão atual mantida: {registry.current}")
+        return False
+
+    if failures:
+        logger.warning(f"Versão {version} promovida com --force apesar das violações")
+    registry.set_current(version)
+    return True
@@ -0,0 +1,242 @@
+"""
+Módulo de sketch de quantis mergeável (KLL)
+
+Quantis exatos (`Series.quantile`, `median`) ordenam a coluna inteira. O
+sketch KLL mantém uma amostra ponderada de tamanho O(k) com erro de rank
+limitado, pode ser atualizado em blocos e combinado (merge) com outros
+sketches: cada bloco de uma coluna é resumido em paralelo e os resumos são
+combinados no final.
+
+Estrutura: níveis de "compactadores"; os itens do nível h pesam 2^h. Quando
+um nível passa da capacidade, seus itens são ordenados e metade deles (as
+posições pares ou ímpares, sorteadas) sobe para o nível seguinte. As
+capacidades decrescem geometricamente (fator 2/3) a partir do nível mais
+alto, que tem capacidade k. Enquanto nenhuma compactação acontece, os
+quantis são exatos.
+
+Os sketches são serializáveis (`to_dict`/`from_dict`) e vão para os
+metadados do modelo, onde a API os reaproveita (ex: medianas para imputar
+campos ausentes, como no treinamento).
+"""
+
+import logging
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Erro de rank normalizado padrão (1%: k ≈ 270)
+DEFAULT_ACCURACY = 0.01
+
+# Linhas por bloco na construção paralela
+DEFAULT_CHUNK_ROWS = 100_000
+
+# Fator de decaimento das capacidades dos níveis
+CAPACITY_DECAY = 2 / 3
+
+
+def weighted_quantile(values, counts, q: float) -> float:
+    """
+    Quantil de valores repetidos `counts` vezes
+
+    Mesma interpolação linear de `pandas.Series.quantile` sobre a série
+    expandida (cada valor repetido pela sua contagem).
+
+    Args:
+        values: Valores
+        counts: Contagem de cada valor
+        q: Quantil (0 a 1)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    counts = np.asarray(counts, dtype=np.int64)
+    valid = ~np.isnan(values) & (counts > 0)
+    values, counts = values[valid], counts[valid]
+    if len(values) == 0:
+        return float('nan')
+    order = np.argsort(values, kind='stable')
+    values, cumulative = values[order], np.cumsum(counts[order])
+    position = q * (cumulative[-1] - 1)
+    lower, upper = np.floor(position), np.ceil(position)
+    lower_value = values[np.searchsorted(cumulative, lower, side='right')]
+    upper_value = values[np.searchsorted(cumulative, upper, side='right')]
+    return float(lower_value + (upper_value - lower_value) * (position - lower))
+
+
+def k_for_accuracy(accuracy: float) -> int:
+    """
+    Parâmetro k do KLL para um erro de rank normalizado
+
+    Aproximação empírica do erro do KLL (a mesma da biblioteca Apache
+    DataSketches): erro ≈ 2.296 / k^0.9723.
+    """
+    return max(8, math.ceil((2.296 / accuracy) ** (1 / 0.9723)))
+
+
+class KLLSketch:
+    """Sketch KLL de quantis de uma coluna numérica"""
+
+    def __init__(self, k: int = None, accuracy: float = DEFAULT_ACCURACY, seed: int = 42):
+        """
+        Inicializa o sketch
+
+        Args:
+            k: Capacidade do nível mais alto (se None, calculado de `accuracy`)
+            accuracy: Erro de rank normalizado desejado (usado se k for None)
+            seed: Semente do sorteio das compactações
+        """
+        self.k = k or k_for_accuracy(accuracy)
+        self.levels = [np.empty(0)]
+        self.n = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.rng = np.random.default_rng(seed)
+
+    @property
+    def accuracy(self) -> float:
+        """Erro de rank normalizado aproximado"""
+        return 2.296 / self.k ** 0.9723
+
+    @property
+    def exact(self) -> bool:
+        """Se nenhuma compactação aconteceu (quantis exatos)"""
+        return len(self.levels) == 1
+
+    @property
+    def size(self) -> int:
+        """Número de itens mantidos"""
+        return sum(len(items) for items in self.levels)
+
+    def _capacity(self, level: int) -> int:
+        """Capacidade de um nível (k no mais alto, decaindo para baixo)"""
+        depth = len(self.levels) - level - 1
+        return max(2, math.ceil(self.k * CAPACITY_DECAY ** depth))
+
+    def _compress(self):
+        """Compacta os níveis acima da capacidade, do mais baixo para o mais alto"""
+        while True:
+            full = [h for h in range(len(self.levels)) if len(self.levels[h]) > self._capacity(h)]
+            if not full:
+                return
+            level = full[0]
+            if level + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            items = np.sort(self.levels[level])
+            # Com número ímpar de itens, um fica no nível
+            odd = len(items) % 2
+            promoted = items[odd:][self.rng.integers(2)::2]
+            self.levels[level] = items[:odd]
+            self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+
+    def update(self, values):
+        """Acumula um bloco de valores (ausentes são ignorados)"""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        self.n += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other: 'KLLSketch'):
+        """Combina com outro sketch (o k resultante é o menor dos dois)"""
+        self.k = min(self.k, other.k)
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self._compress()
+
+    def quantile(self, q: float) -> float:
+        """Quantil aproximado (interpolação linear como no pandas; NaN se vazio)"""
+        if self.n == 0:
+            return float('nan')
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2 ** h, dtype=np.int64)
+                                  for h, items in enumerate(self.levels)])
+        return weighted_quantile(values, weights, q)
+
+    def to_dict(self) -> dict:
+        """Representação serializável em JSON"""
+        return {
+            'k': self.k,
+            'n': self.n,
+            'min': self.min if self.n else None,
+            'max': self.max if self.n else None,
+            'levels': [items.tolist() for items in self.levels]
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict, seed: int = 42) -> 'KLLSketch':
+        """Recria um sketch a partir de `to_dict`"""
+        sketch = cls(k=data['k'], seed=seed)
+        sketch.n = data['n']
+        if sketch.n:
+            sketch.min, sketch.max = data['min'], data['max']
+        sketch.levels = [np.asarray(items, dtype=np.float64) for items in data['levels']] or [np.empty(0)]
+        return sketch
+
+
+def build(values, accuracy: float = DEFAULT_ACCURACY, chunk_rows: int = DEFAULT_CHUNK_ROWS,
+          workers: int = None, seed: int = 42) -> KLLSketch:
+    """
+    Constrói o sketch de uma coluna em paralelo, por blocos
+
+    Cada bloco é resumido em um sketch próprio (threads: a ordenação do
+    NumPy libera o GIL) e os sketches são combinados na ordem dos blocos
+    (resultado determinístico).
+
+    Args:
+        values: Valores da coluna
+        accuracy: Erro de rank normalizado
+        chunk_rows: Linhas por bloco
+        workers: Threads (se None, padrão do ThreadPoolExecutor)
+        seed: Semente (cada bloco usa seed + índice do bloco)
+    """
+    values = np.asarray(values, dtype=np.float64).ravel()
+    k = k_for_accuracy(accuracy)
+    starts = range(0, max(len(values), 1), chunk_rows)
+
+    def summarize(index_start):
+        index, start = index_start
+        sketch = KLLSketch(k=k, seed=seed + index)
+        sketch.update(values[start:start + chunk_rows])
+        return sketch
+
+    if len(starts) == 1:
+        return summarize((0, 0))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        sketches = list(pool.map(summarize, enumerate(starts)))
+    result = sketches[0]
+    for sketch in sketches[1:]:
+        result.merge(sketch)
+    return result
+
+
+def merge_serialized(base: dict, new: dict) -> dict:
+    """
+    Combina dois conjuntos de sketches serializados (coluna -> `to_dict`)
+
+    Usado no treino incremental: os sketches da versão anterior são
+    combinados com os do lote novo.
+    """
+    merged = dict(base)
+    for col, data in new.items():
+        if col in merged:
+            sketch = KLLSketch.from_dict(merged[col])
+            sketch.merge(KLLSketch.from_dict(data))
+            merged[col] = sketch.to_dict()
+        else:
+            merged[col] = data
+    return merged
@@ -0,0 +1,125 @@
+"""
+Módulo de estatísticas mergeáveis para o processamento em streaming
+
+As estatísticas do pipeline (medianas, quartis do IQR, médias do target
+encoding) são acumuladas bloco a bloco em estruturas de tamanho limitado,
+que podem ser combinadas (merge) entre blocos:
+
+    - LogBuckets: discretização logarítmica dos valores, com erro relativo
+      máximo `accuracy` (o valor representante de um bucket fica a no máximo
+      `accuracy` de qualquer valor do bucket)
+    - weighted_quantile (de quantile_sketch): quantis de valores com
+      contagens (células da grade ou itens ponderados do sketch KLL)
+    - GroupedGrid: contagens e somas por categoria e por buckets de várias
+      colunas. Permite calcular estatísticas condicionadas a filtros sobre
+      essas colunas depois da passada (ex: quartis da área só das linhas
+      cujo aluguel passou no filtro de outliers)
+
+O tamanho de cada estrutura depende do número de buckets ocupados (limitado
+pela faixa dos valores e pela precisão), não do número de linhas.
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+# weighted_quantile fica em quantile_sketch (importado pela API, sem pandas)
+from quantile_sketch import weighted_quantile
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Erro relativo padrão dos valores representantes dos buckets
+DEFAULT_ACCURACY = 0.01
+
+# Buckets especiais: valores ausentes e valores não positivos (representados por 0)
+NAN_INDEX = np.iinfo(np.int64).min
+ZERO_INDEX = NAN_INDEX + 1
+
+
+class LogBuckets:
+    """Discretização logarítmica com erro relativo limitado"""
+
+    def __init__(self, accuracy: float = DEFAULT_ACCURACY):
+        """
+        Inicializa a discretização
+
+        Args:
+            accuracy: Erro relativo máximo do valor representante de cada bucket
+        """
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.log_gamma = np.log(self.gamma)
+
+    def index(self, values) -> np.ndarray:
+        """Bucket de cada valor (o bucket i cobre (gamma^(i-1), gamma^i])"""
+        values = np.asarray(values, dtype=np.float64)
+        indices = np.full(values.shape, ZERO_INDEX, dtype=np.int64)
+        positive = values > 0
+        indices[positive] = np.ceil(np.log(values[positive]) / self.log_gamma).astype(np.int64)
+        indices[np.isnan(values)] = NAN_INDEX
+        return indices
+
+    def value(self, indices) -> np.ndarray:
+        """Valor representante de cada bucket (NaN e 0 nos buckets especiais)"""
+        indices = np.asarray(indices, dtype=np.int64)
+        regular = indices > ZERO_INDEX
+        values = np.zeros(indices.shape, dtype=np.float64)
+        values[regular] = 2 * self.gamma ** indices[regular].astype(np.float64) / (self.gamma + 1)
+        values[indices == NAN_INDEX] = np.nan
+        return values
+
+
+class GroupedGrid:
+    """
+    Contagens e somas por categoria e por buckets de colunas numéricas
+
+    Cada célula é uma combinação (categorias, bucket de cada coluna) e guarda
+    o número de linhas (`count`) e a soma exata de cada coluna de `sum_cols`
+    (`<coluna>_sum`; ausentes somam 0 e ficam no bucket NAN_INDEX).
+    """
+
+    def __init__(self, key_cols: list, bucket_cols: list, sum_cols: list,
+                 accuracy: float = DEFAULT_ACCURACY):
+        """
+        Inicializa a grade
+
+        Args:
+            key_cols: Colunas categóricas
+            bucket_cols: Colunas numéricas discretizadas em buckets
+            sum_cols: Colunas somadas em cada célula
+            accuracy: Erro relativo máximo dos valores representantes
+        """
+        self.key_cols = list(key_cols)
+        self.bucket_cols = list(bucket_cols)
+        self.sum_cols = [f"{col}_sum" for col in sum_cols]
+        self.buckets = LogBuckets(accuracy)
+        self.table = None
+
+    def _aggregate(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """Agrupa linhas (ou células) pelas chaves e buckets"""
+        grouped = frame.groupby(self.key_cols + self.bucket_cols, sort=False, observed=True)
+        return grouped[['count'] + self.sum_cols].sum().reset_index()
+
+    def add(self, df: pd.DataFrame):
+        """Acumula as linhas de um bloco"""
+        frame = pd.DataFrame({col: df[col].to_numpy() for col in self.key_cols})
+        for col in self.bucket_cols:
+            frame[col] = self.buckets.index(df[col].to_numpy(dtype=np.float64))
+        for col in self.sum_cols:
+            frame[col] = np.nan_to_num(df[col[:-len('_sum')]].to_numpy(dtype=np.float64))
+        frame['count'] = 1
+        self.merge_table(self._aggregate(frame))
+
+    def merge_table(self, table: pd.DataFrame):
+        """Combina com as células de outra grade de mesma configuração"""
+        if self.table is None:
+            self.table = table
+        else:
+            self.table = self._aggregate(pd.concat([self.table, table], ignore_index=True))
+
+    @property
+    def cells(self) -> int:
+        """Número de células ocupadas"""
+        return 0 if self.table is None else len(self.table)
@@ -0,0 +1,252 @@
+"""
+Módulo de compilação do ensemble XGBoost em arrays NumPy
+
+Para requisições com poucas linhas, o custo fixo do `Booster.predict`
+(construção da DMatrix, despacho de threads) é bem maior que o de percorrer
+~100 árvores de profundidade 6. O compilador achata as árvores do booster em
+arrays contíguos (feature, limiar, filhos, direção padrão e valor da folha) e
+avalia as linhas descendo todas as árvores ao mesmo tempo, um nível por vez.
+
+O resultado é idêntico bit a bit ao do XGBoost: as features são convertidas
+para float32, a comparação é `valor < limiar` (valores ausentes seguem a
+direção padrão) e as folhas são somadas em float32, árvore por árvore, a
+partir do base_score.
+"""
+
+import json
+import logging
+import time
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Tamanhos de lote usados para encontrar o ponto de troca com o XGBoost
+CROSSOVER_BATCH_SIZES = (1, 4, 16, 64, 256, 1024)
+
+# Objetivos cuja predição é a margem (sem função de ligação)
+SUPPORTED_OBJECTIVES = ('reg:squarederror', 'reg:absoluteerror', 'reg:pseudohubererror')
+
+
+class CompiledEnsemble:
+    """Ensemble de árvores achatado em arrays NumPy"""
+
+    def __init__(self, feature, threshold, left, right, default_left, value,
+                 roots, max_depth: int, base_score: float, num_features: int):
+        """
+        Inicializa o ensemble compilado
+
+        Os nós de todas as árvores ficam nos mesmos arrays (índice global).
+        Nas folhas, os dois filhos apontam para o próprio nó, de forma que a
+        descida pode seguir até a profundidade máxima sem tratar folhas.
+
+        Args:
+            feature: Índice da feature de cada nó
+            threshold: Limiar de cada nó (float32)
+            left: Filho esquerdo de cada nó
+            right: Filho direito de cada nó
+            default_left: Se valores ausentes vão para a esquerda
+            value: Valor da folha (float32; zero em nós internos)
+            roots: Índice da raiz de cada árvore
+            max_depth: Profundidade máxima entre as árvores
+            base_score: Margem inicial do modelo
+            num_features: Número de features esperado
+        """
+        self.feature = np.ascontiguousarray(feature, dtype=np.intp)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float32)
+        self.left = np.ascontiguousarray(left, dtype=np.intp)
+        self.right = np.ascontiguousarray(right, dtype=np.intp)
+        self.default_left = np.ascontiguousarray(default_left, dtype=bool)
+        self.value = np.ascontiguousarray(value, dtype=np.float32)
+        self.roots = np.ascontiguousarray(roots, dtype=np.intp)
+        self.max_depth = max_depth
+        self.base_score = np.float32(base_score)
+        self.num_features = num_features
+
+    @property
+    def num_trees(self) -> int:
+        """Número de árvores compiladas"""
+        return len(self.roots)
+
+    @property
+    def nbytes(self) -> int:
+        """Memória ocupada pelos arrays"""
+        return sum(a.nbytes for a in (self.feature, self.threshold, self.left, self.right,
+                                      self.default_left, self.value, self.roots))
+
+    @classmethod
+    def from_booster(cls, booster, iteration_range: tuple = (0, 0)):
+        """
+        Compila um xgboost.Booster
+
+        Args:
+            booster: Booster treinado (gbtree, regressão com uma saída)
+            iteration_range: Iterações usadas, como em `Booster.predict`
+                ((0, 0) usa todas)
+
+        Raises:
+            ValueError: Se o modelo não puder ser compilado
+        """
+        learner = json.loads(booster.save_raw('json'))['learner']
+        objective = learner['objective']['name']
+        if objective not in SUPPORTED_OBJECTIVES:
+            raise ValueError(f"Objetivo não suportado pelo compilador: {objective}")
+        if learner['gradient_booster']['name'] != 'gbtree':
+            raise ValueError(f"Booster não suportado pelo compilador: {learner['gradient_booster']['name']}")
+
+        model_param = learner['learner_model_param']
+        if int(model_param.get('num_target', 1)) != 1 or int(model_param.get('num_class', 0)) > 1:
+            raise ValueError("O compilador suporta apenas modelos com uma saída")
+        base_score = float(model_param['base_score'].strip('[]'))
+
+        model = learner['gradient_booster']['model']
+        trees = model['trees']
+        indptr = model.get('iteration_indptr') or list(range(len(trees) + 1))
+        begin, end = iteration_range
+        if end == 0:
+            end = len(indptr) - 1
+        trees = trees[indptr[begin]:indptr[end]]
+
+        feature, threshold, left, right, default_left, value, roots = [], [], [], [], [], [], []
+        max_depth = 0
+        offset = 0
+        for tree in trees:
+            if any(tree['split_type']):
+                raise ValueError("O compilador não suporta splits categóricos")
+            roots.append(offset)
+            tree_left = np.asarray(tree['left_children'], dtype=np.intp)
+            tree_right = np.asarray(tree['right_children'], dtype=np.intp)
+            is_leaf = tree_left == -1
+            node_ids = np.arange(len(tree_left)) + offset
+            conditions = np.asarray(tree['split_conditions'], dtype=np.float32)
+
+            feature.append(np.where(is_leaf, 0, tree['split_indices']))
+            threshold.append(np.where(is_leaf, np.float32(0), conditions))
+            left.append(np.where(is_leaf, node_ids, tree_left + offset))
+            right.append(np.where(is_leaf, node_ids, tree_right + offset))
+            default_left.append(np.asarray(tree['default_left'], dtype=bool))
+            value.append(np.where(is_leaf, conditions, np.float32(0)))
+            max_depth = max(max_depth, _tree_depth(tree_left, tree_right))
+            offset += len(tree_left)
+
+        def concat(parts, dtype):
+            return np.concatenate(parts).astype(dtype) if parts else np.empty(0, dtype=dtype)
+
+        return cls(
+            concat(feature, np.intp), concat(threshold, np.float32),
+            concat(left, np.intp), concat(right, np.intp),
+            concat(default_left, bool), concat(value, np.float32),
+            np.asarray(roots, dtype=np.intp), max_depth, base_score,
+            int(model_param['num_feature'])
+        )
+
+    def leaf_indices(self, X: np.ndarray) -> np.ndarray:
+        """
+        Retorna o nó folha (índice global) de cada linha em cada árvore
+
+        Args:
+            X: Matriz de features (n_linhas, n_features) em float32
+        """
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), self.num_trees))
+        for _ in range(self.max_depth):
+            values = X[rows, self.feature[nodes]]
+            go_left = np.where(np.isnan(values), self.default_left[nodes], values < self.threshold[nodes])
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def predict(self, X) -> np.ndarray:
+        """
+        Prediz para uma matriz de features já normalizadas
+
+        Args:
+            X: Matriz de features (n_linhas, n_features)
+
+        Returns:
+            Predições em float32, como o XGBoost
+        """
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.num_features:
+            raise ValueError(f"Esperadas {self.num_features} features, recebidas {X.shape[1]}")
+
+        leaves = self.value[self.leaf_indices(X)]
+        # Soma sequencial em float32 (cumsum não reordena as parcelas, ao
+        # contrário de np.sum), na mesma ordem do XGBoost
+        margins = np.empty((len(X), self.num_trees + 1), dtype=np.float32)
+        margins[:, 0] = self.base_score
+        margins[:, 1:] = leaves
+        return np.cumsum(margins, axis=1, dtype=np.float32)[:, -1]
+
+
+def _tree_depth(left: np.ndarray, right: np.ndarray) -> int:
+    """Profundidade de uma árvore a partir dos arrays de filhos"""
+    depth = np.zeros(len(left), dtype=np.intp)
+    max_depth = 0
+    # Os filhos sempre têm índice maior que o pai
+    for node in range(len(left)):
+        if left[node] != -1:
+            depth[left[node]] = depth[right[node]] = depth[node] + 1
+            max_depth = max(max_depth, depth[node] + 1)
+    return max_depth
+
+
+def compile_booster(booster, iteration_range: tuple = (0, 0)):
+    """
+    Compila o booster, retornando None se o modelo não for suportado
+
+    Args:
+        booster: xgboost.Booster treinado
+        iteration_range: Iterações usadas ((0, 0) usa todas)
+    """
+    start = time.perf_counter()
+    try:
+        compiled = CompiledEnsemble.from_booster(booster, iteration_range)
+    except ValueError as e:
+        logger.warning(f"Modelo não compilado, usando o XGBoost: {e}")
+        return None
+    logger.info(
+        f"Ensemble compilado: {compiled.num_trees} árvores, profundidade {compiled.max_depth}, "
+        f"{compiled.nbytes / 1024:.1f} KB em {(time.perf_counter() - start) * 1000:.1f} ms"
+    )
+    return compiled
+
+
+def measure_latency(predict, X: np.ndarray, repeats: int = 20) -> float:
+    """Mediana do tempo (em segundos) de uma chamada de predição"""
+    predict(X)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predict(X)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+
+def find_crossover(compiled: CompiledEnsemble, native_predict, sample: np.ndarray,
+                   batch_sizes: tuple = CROSSOVER_BATCH_SIZES, repeats: int = 20) -> int:
+    """
+    Encontra o maior lote em que o ensemble compilado é mais rápido que o XGBoost
+
+    Args:
+        compiled: Ensemble compilado
+        native_predict: Função de predição do XGBoost
+        sample: Linhas de exemplo (repetidas até o tamanho de cada lote)
+        batch_sizes: Tamanhos de lote medidos, em ordem crescente
+        repeats: Repetições por medição
+
+    Returns:
+        Maior tamanho de lote atendido pelo compilado (0 se nunca for mais rápido)
+    """
+    crossover = 0
+    for size in batch_sizes:
+        X = np.resize(sample, (size, sample.shape[1]))
+        compiled_s = measure_latency(compiled.predict, X, repeats)
+        native_s = measure_latency(native_predict, X, repeats)
+        logger.info(f"Lote {size}: compilado {compiled_s * 1000:.3f} ms, XGBoost {native_s * 1000:.3f} ms")
+        if compiled_s >= native_s:
+            break
+        crossover = size
+    return crossover
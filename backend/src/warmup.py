@@ -0,0 +1,124 @@
+"""
+Módulo de aquecimento (warm-up) dos modelos antes de receber tráfego
+"""
+
+import logging
+import time
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Perfis de imóveis usados nas requisições sintéticas
+SYNTHETIC_PROFILES = [
+    {'area': 35.0, 'bedrooms': 1, 'bathrooms': 1, 'parking_spaces': 0, 'suites': 0, 'hoa': 300.0, 'furnished': True},
+    {'area': 70.0, 'bedrooms': 2, 'bathrooms': 2, 'parking_spaces': 1, 'suites': 1, 'hoa': 600.0, 'furnished': False},
+    {'area': 120.0, 'bedrooms': 3, 'bathrooms': 2, 'parking_spaces': 2, 'suites': 1, 'hoa': 1000.0, 'furnished': False},
+    {'area': 250.0, 'bedrooms': 4, 'bathrooms': 4, 'parking_spaces': 3, 'suites': 3, 'hoa': 0.0, 'furnished': True}
+]
+
+
+def synthetic_requests(bundle, max_requests: int = 50) -> list:
+    """
+    Gera requisições sintéticas representativas para uma versão do modelo
+
+    Percorre os bairros e tipos de imóvel conhecidos pelo encoding (mais um
+    bairro desconhecido, para exercitar o fallback), alternando os perfis
+    de área/quartos.
+
+    Args:
+        bundle: ModelBundle da versão
+        max_requests: Número máximo de requisições geradas
+    """
+    neighborhoods = list(bundle.unique_values.get('neighborhoods', [])) + ['']
+    property_types = list(bundle.unique_values.get('property_types', [])) or ['UNIT']
+    cities = list(bundle.unique_values.get('cities', [])) or ['Brasília']
+
+    count = min(max_requests, max(len(neighborhoods), len(property_types), len(SYNTHETIC_PROFILES)))
+    requests = []
+    for i in range(count):
+        data = dict(SYNTHETIC_PROFILES[i % len(SYNTHETIC_PROFILES)])
+        data['neighborhood'] = neighborhoods[i % len(neighborhoods)]
+        data['property_type'] = property_types[i % len(property_types)]
+        data['city'] = cities[i % len(cities)]
+        requests.append(data)
+    return requests
+
+
+def warm_up_bundle(bundle, max_requests: int = 50, calibrate: bool = False) -> dict:
+    """
+    Executa predições sintéticas em uma versão do modelo
+
+    A primeira predição paga a inicialização do XGBoost (threads, buffers
+    do booster); as seguintes medem a latência já aquecida. Com
+    `calibrate=True`, mede também a partir de que tamanho de lote o XGBoost
+    passa a ser mais rápido que o ensemble compilado.
+
+    Args:
+        bundle: ModelBundle da versão
+        max_requests: Número máximo de predições sintéticas
+        calibrate: Se True, calibra o ponto de troca do ensemble compilado
+
+    Returns:
+        Estatísticas do aquecimento
+    """
+    requests = synthetic_requests(bundle, max_requests)
+    latencies = []
+    predictions = []
+    for data in requests:
+        start = time.perf_counter()
+        prediction = bundle.predict(bundle.prepare_features(data))[0]
+        latencies.append(time.perf_counter() - start)
+        predictions.append(float(prediction))
+
+    if not np.all(np.isfinite(predictions)):
+        raise ValueError(f"Predição inválida durante o warm-up da versão {bundle.version}")
+
+    # Predição em lote, para aquecer também o caminho com várias linhas
+    features = np.vstack([bundle.prepare_features(data) for data in requests])
+    bundle.predict(features)
+
+    stats = {
+        'backend': bundle.backend,
+        'requests': len(requests),
+        'first_ms': latencies[0] * 1000,
+        'p50_ms': float(np.median(latencies[1:] or latencies)) * 1000
+    }
+    if bundle.onnx_model is None and getattr(bundle.model, 'compiled', None) is not None:
+        if calibrate:
+            bundle.model.calibrate(features)
+        stats['max_compiled_batch'] = bundle.model.max_compiled_batch
+    return stats
+
+
+def warm_up(pool, max_requests: int = 50, calibrate: bool = True) -> dict:
+    """
+    Aquece as versões que podem receber tráfego logo após a inicialização
+
+    Inclui a versão padrão, as versões da divisão de tráfego e a versão
+    shadow (limitadas ao tamanho do pool, para não causar evicções).
+
+    Args:
+        pool: ModelPool inicializado
+        max_requests: Número máximo de predições sintéticas por versão
+        calibrate: Se True, calibra o ponto de troca do ensemble compilado
+            (ignorado se o pool já tem um `max_compiled_batch` fixo)
+
+    Returns:
+        Estatísticas por versão
+    """
+    versions = [pool.default_version] + list(pool.traffic_split)
+    if pool.shadow_version:
+        versions.append(pool.shadow_version)
+    versions = list(dict.fromkeys(versions))[:pool.max_size]
+
+    stats = {}
+    for version in versions:
+        stats[version] = warm_up_bundle(pool.get(version), max_requests,
+                                        calibrate and pool.max_compiled_batch is None)
+        logger.info(
+            f"Warm-up da versão {version}: {stats[version]['requests']} predições, "
+            f"primeira {stats[version]['first_ms']:.2f} ms, p50 {stats[version]['p50_ms']:.2f} ms"
+        )
+    return stats
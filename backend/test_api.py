@@ -15,6 +15,14 @@ def test_health():
     print(f"Response: {json.dumps(response.json(), indent=2)}")
     print()
 
+def test_ready():
+    """Testa endpoint de readiness (200 só após carga do modelo e warm-up)"""
+    print("Testando /ready...")
+    response = requests.get(f"{API_URL}/ready")
+    print(f"Status: {response.status_code}")
+    print(f"Response: {json.dumps(response.json(), indent=2)}")
+    print()
+
 def test_predict():
     """Testa endpoint de predição"""
     print("Testando /predict...")
@@ -37,6 +45,22 @@ def test_predict():
     print(f"Response: {json.dumps(response.json(), indent=2)}")
     print()
 
+def test_predict_batch():
+    """Testa endpoint de predição em lote"""
+    print("Testando /predict/batch...")
+    
+    properties = [
+        {"area": 35.0, "bedrooms": 1, "bathrooms": 1, "parking_spaces": 0, "furnished": True,
+         "hoa": 300.0, "property_type": "UNIT", "city": "Brasília", "neighborhood": "Asa Sul"},
+        {"area": 120.0, "bedrooms": 3, "bathrooms": 2, "parking_spaces": 2, "furnished": False,
+         "hoa": 900.0, "property_type": "UNIT", "city": "Brasília", "neighborhood": "Sudoeste"}
+    ]
+    
+    response = requests.post(f"{API_URL}/predict/batch", json={"properties": properties})
+    print(f"Status: {response.status_code}")
+    print(f"Response: {json.dumps(response.json(), indent=2)}")
+    print()
+
 def test_model_info():
     """Testa endpoint de informações do modelo"""
     print("Testando /model/info...")
@@ -45,6 +69,28 @@ def test_model_info():
     print(f"Response: {json.dumps(response.json(), indent=2)}")
     print()
 
+def test_model_versions():
+    """Testa roteamento por versão do modelo"""
+    print("Testando /model/versions e header X-Model-Version...")
+    response = requests.get(f"{API_URL}/model/versions")
+    print(f"Status: {response.status_code}")
+    print(f"Response: {json.dumps(response.json(), indent=2)}")
+    
+    version = response.json()['default_version']
+    data = {
+        "area": 70.0,
+        "bedrooms": 2,
+        "bathrooms": 2,
+        "parking_spaces": 1,
+        "furnished": False,
+        "hoa": 400.0,
+        "property_type": "UNIT"
+    }
+    response = requests.post(f"{API_URL}/predict", json=data, headers={"X-Model-Version": version})
+    print(f"Status: {response.status_code}")
+    print(f"Versão usada: {response.headers.get('X-Model-Version')}")
+    print()
+
 if __name__ == "__main__":
     print("=" * 60)
     print("TESTE DA API ALUGAI")
@@ -53,8 +99,11 @@ if __name__ == "__main__":
     
     try:
         test_health()
+        test_ready()
         test_model_info()
         test_predict()
+        test_predict_batch()
+        test_model_versions()
         
         print("=" * 60)
         print("TESTES CONCLUÍDOS!")
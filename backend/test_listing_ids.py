@@ -0,0 +1,108 @@
+"""
+Script de teste dos ids estáveis dos anúncios (src/listing_store.py)
+
+Confere que o id de cada anúncio não muda quando o CSV é reordenado ou
+ganha linhas, nem quando os filtros da consulta mudam, e que o caminho de
+colisão (forçado com poucos bits de id) ainda gera ids distintos.
+"""
+
+import sys
+from pathlib import Path
+
+# Adicionar src ao path
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+import numpy as np
+import pandas as pd
+
+from data_processing import DataProcessor
+import listing_store
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def contents(frame: pd.DataFrame, ids: np.ndarray) -> dict:
+    """Id -> campos do anúncio (ID_FIELDS)"""
+    rows = frame.reindex(columns=listing_store.ID_FIELDS).astype(str).itertuples(index=False, name=None)
+    return dict(zip(ids.tolist(), rows))
+
+
+def check(condition: bool, message: str) -> bool:
+    """Registra o resultado de uma verificação"""
+    if condition:
+        logger.info(f"✓ {message}")
+    else:
+        logger.error(f"✗ {message}")
+    return condition
+
+
+def main():
+    """Executa as verificações"""
+    data_path = Path(__file__).parent.parent / "data" / "imoveis-df.csv"
+
+    logger.info("=" * 60)
+    logger.info("TESTE DOS IDS DOS ANÚNCIOS")
+    logger.info("=" * 60)
+
+    try:
+        frame = DataProcessor(str(data_path)).clean().reset_index(drop=True)
+        rng = np.random.default_rng(42)
+        ids = listing_store.listing_ids(frame)
+        by_id = contents(frame, ids)
+        results = [check(len(by_id) == len(frame), f"{len(frame)} anúncios com ids distintos")]
+
+        # CSV reordenado: cada id continua apontando para o mesmo conteúdo
+        # (anúncios idênticos podem trocar de id entre si, já que são iguais)
+        shuffled = frame.iloc[rng.permutation(len(frame))].reset_index(drop=True)
+        results.append(check(contents(shuffled, listing_store.listing_ids(shuffled)) == by_id,
+                             "mesmos ids com o CSV reordenado"))
+
+        # CSV com linhas novas (inclusive repetições de anúncios existentes)
+        extra = frame.sample(n=200, random_state=1).reset_index(drop=True)
+        extra.loc[:100, 'rent_amount'] = extra.loc[:100, 'rent_amount'] + 1
+        extended = pd.concat([frame, extra], ignore_index=True)
+        extended_ids = listing_store.listing_ids(extended)
+        results.append(check(np.array_equal(extended_ids[:len(frame)], ids),
+                             "mesmos ids com linhas novas no fim do CSV"))
+        results.append(check(len(np.unique(extended_ids)) == len(extended),
+                             "linhas novas (e repetidas) com ids distintos"))
+
+        # Filtros diferentes: o id de um anúncio não depende dos outros filtrados
+        store = listing_store.ListingStore.from_frame(frame)
+        _, everything = store.query({}, limit=len(frame))
+        unfiltered = {listing['id']: listing for listing in everything}
+        results.append(check(set(unfiltered) == set(by_id), "ids da consulta iguais aos de listing_ids"))
+        for filters in ({'property_type': 'apart'}, {'neighborhood': 'asa', 'min_area': 50.0},
+                        {'min_bedrooms': 3, 'max_price': 3000.0}):
+            _, page = store.query(filters, limit=len(frame))
+            same = bool(page) and all(unfiltered.get(listing['id']) == listing for listing in page)
+            results.append(check(same, f"mesmos ids com os filtros {filters} ({len(page)} anúncios)"))
+
+        # Colisão forçada: com 8 bits, 200 anúncios colidem; os ids seguem distintos
+        bits = listing_store.ID_BITS
+        listing_store.ID_BITS = 8
+        try:
+            sample = frame.head(200)
+            collided = listing_store.listing_ids(sample)
+        finally:
+            listing_store.ID_BITS = bits
+        results.append(check(len(np.unique(collided)) == len(sample) and collided.max() < 2 ** 8,
+                             "ids distintos no caminho de colisão (ID_BITS=8)"))
+    except Exception as e:
+        logger.error(f"\n✗ ERRO: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+    if not all(results):
+        logger.error(f"\n✗ {results.count(False)} de {len(results)} verificações falharam")
+        return False
+    logger.info(f"\n✓ {len(results)} verificações concluídas")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,137 @@
+"""
+Script de teste do sketch de quantis (src/quantile_sketch.py)
+
+Confere, em colunas aleatórias grandes, que o erro de rank dos quantis do
+sketch KLL fica dentro de `accuracy` (comparado com `np.quantile`), e que
+combinar sketches (merge, inclusive serializados como nos metadados) é
+equivalente a um único sketch atualizado com todos os valores.
+"""
+
+import sys
+from pathlib import Path
+
+# Adicionar src ao path
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+import numpy as np
+
+import quantile_sketch
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Linhas de cada coluna aleatória
+ROWS = 1_000_000
+
+# Quantis conferidos (inclui os usados no pipeline: quartis e mediana)
+QUANTILES = np.linspace(0.01, 0.99, 99)
+
+# Erros de rank pedidos ao sketch
+ACCURACIES = (0.02, 0.01, 0.005)
+
+
+def columns() -> dict:
+    """Colunas aleatórias: simétrica, assimétrica (como aluguéis) e com muitos empates"""
+    rng = np.random.default_rng(0)
+    return {
+        'normal': rng.normal(size=ROWS),
+        'lognormal': rng.lognormal(7, 0.6, size=ROWS),
+        'inteiros': rng.integers(0, 50, size=ROWS).astype(np.float64)
+    }
+
+
+def rank_error(sorted_values: np.ndarray, estimate: float, q: float) -> float:
+    """Distância entre q e a faixa de ranks normalizados do valor estimado"""
+    n = len(sorted_values)
+    low = np.searchsorted(sorted_values, estimate, side='left') / n
+    high = np.searchsorted(sorted_values, estimate, side='right') / n
+    return max(low - q, q - high, 0.0)
+
+
+def max_rank_error(sketch: quantile_sketch.KLLSketch, sorted_values: np.ndarray) -> float:
+    """Maior erro de rank entre os QUANTILES"""
+    return max(rank_error(sorted_values, sketch.quantile(q), q) for q in QUANTILES)
+
+
+def single_sketch(values: np.ndarray, accuracy: float, chunk_rows: int) -> quantile_sketch.KLLSketch:
+    """Um único sketch atualizado bloco a bloco (sem merge)"""
+    sketch = quantile_sketch.KLLSketch(accuracy=accuracy)
+    for start in range(0, len(values), chunk_rows):
+        sketch.update(values[start:start + chunk_rows])
+    return sketch
+
+
+def serialized_merge(values: np.ndarray, accuracy: float, parts: int) -> quantile_sketch.KLLSketch:
+    """Sketches de partes da coluna combinados por merge_serialized (como no treino incremental)"""
+    merged = {}
+    for part in np.array_split(values, parts):
+        sketch = quantile_sketch.build(part, accuracy=accuracy)
+        merged = quantile_sketch.merge_serialized(merged, {'col': sketch.to_dict()})
+    return quantile_sketch.KLLSketch.from_dict(merged['col'])
+
+
+def check(condition: bool, message: str) -> bool:
+    """Registra o resultado de uma verificação"""
+    if condition:
+        logger.info(f"✓ {message}")
+    else:
+        logger.error(f"✗ {message}")
+    return condition
+
+
+def main():
+    """Executa as verificações"""
+    logger.info("=" * 60)
+    logger.info("TESTE DO SKETCH DE QUANTIS")
+    logger.info("=" * 60)
+
+    try:
+        results = []
+        for name, values in columns().items():
+            sorted_values = np.sort(values)
+            for accuracy in ACCURACIES:
+                sketches = {
+                    'merge (build)': quantile_sketch.build(values, accuracy=accuracy),
+                    'único': single_sketch(values, accuracy, quantile_sketch.DEFAULT_CHUNK_ROWS),
+                    'merge serializado': serialized_merge(values, accuracy, parts=4)
+                }
+                errors = {label: max_rank_error(sketch, sorted_values) for label, sketch in sketches.items()}
+                results.append(check(
+                    all(error <= accuracy for error in errors.values()),
+                    f"{name}, accuracy {accuracy}: erro de rank máximo "
+                    + ", ".join(f"{label} {error:.4f}" for label, error in errors.items())
+                ))
+                results.append(check(
+                    all(sketch.n == len(values) and sketch.min == values.min() and sketch.max == values.max()
+                        for sketch in sketches.values()),
+                    f"{name}, accuracy {accuracy}: contagem, mínimo e máximo iguais nos três sketches"
+                ))
+
+        # Sem compactação o sketch é exato: merge e sketch único dão o mesmo
+        # valor, igual ao np.quantile (a menos do arredondamento da interpolação)
+        rng = np.random.default_rng(1)
+        small = rng.lognormal(7, 0.6, size=200)
+        merged = quantile_sketch.build(small, chunk_rows=50)
+        single = single_sketch(small, quantile_sketch.DEFAULT_ACCURACY, chunk_rows=50)
+        exact = all(merged.quantile(q) == single.quantile(q)
+                    and np.isclose(merged.quantile(q), np.quantile(small, q), rtol=1e-12, atol=0)
+                    for q in (0.0, 0.25, 0.5, 0.75, 1.0, *QUANTILES))
+        results.append(check(merged.exact and single.exact and exact,
+                             "sem compactação: merge = sketch único = np.quantile"))
+    except Exception as e:
+        logger.error(f"\n✗ ERRO: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+    if not all(results):
+        logger.error(f"\n✗ {results.count(False)} de {len(results)} verificações falharam")
+        return False
+    logger.info(f"\n✓ {len(results)} verificações concluídas")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
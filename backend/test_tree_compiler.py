@@ -0,0 +1,143 @@
+"""
+Script de teste do ensemble compilado (src/tree_compiler.py)
+
+Confere que as predições do CompiledEnsemble são idênticas bit a bit às do
+XGBoost (`inplace_predict`) para os modelos do registro e para modelos
+sintéticos com árvores de profundidades diferentes, com valores ausentes
+(NaN em células, em colunas inteiras e em linhas inteiras).
+"""
+
+import sys
+from pathlib import Path
+
+# Adicionar src ao path
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+import numpy as np
+
+from model_registry import ModelRegistry
+from tree_compiler import CompiledEnsemble
+import model_io
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Linhas avaliadas por modelo
+ROWS = 2000
+
+
+def sample_features(compiled: CompiledEnsemble, seed: int = 42) -> np.ndarray:
+    """
+    Features normalizadas aleatórias, com NaN em células, numa coluna e numa
+    linha; metade das linhas tem valores iguais aos limiares dos splits
+    (confere o lado da comparação `valor < limiar`)
+    """
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(ROWS, compiled.num_features)).astype(np.float32)
+    internal = compiled.left != np.arange(len(compiled.left))
+    for feature in range(compiled.num_features):
+        thresholds = compiled.threshold[internal & (compiled.feature == feature)]
+        if len(thresholds):
+            X[ROWS // 2:, feature] = rng.choice(thresholds, size=ROWS - ROWS // 2)
+    X[rng.random(X.shape) < 0.1] = np.nan
+    X[:, rng.integers(compiled.num_features)] = np.nan
+    X[0] = np.nan
+    return X
+
+
+def check_parity(booster, label: str, iteration_range: tuple = (0, 0)) -> bool:
+    """Compara o ensemble compilado com o XGBoost em um booster"""
+    compiled = CompiledEnsemble.from_booster(booster, iteration_range)
+    X = sample_features(compiled)
+    expected = booster.inplace_predict(X, iteration_range=iteration_range)
+    ok = True
+    for name, rows in (('lote', X), ('linha única', X[1:2]), ('só ausentes', X[0:1])):
+        reference = expected if rows is X else booster.inplace_predict(rows, iteration_range=iteration_range)
+        if not np.array_equal(compiled.predict(rows), reference):
+            logger.error(f"✗ {label} ({name}): predições diferentes do XGBoost")
+            ok = False
+
+    # Número errado de features é recusado, não avaliado
+    try:
+        compiled.predict(X[:, :-1])
+        logger.error(f"✗ {label}: matriz com features faltando foi aceita")
+        ok = False
+    except ValueError:
+        pass
+
+    if ok:
+        logger.info(f"✓ {label}: {compiled.num_trees} árvores, profundidade {compiled.max_depth}, "
+                    f"{len(X)} linhas idênticas")
+    return ok
+
+
+def registry_boosters(models_dir: Path) -> list:
+    """(versão, booster, iteration_range) dos modelos XGBoost do registro"""
+    registry = ModelRegistry(models_dir)
+    if not registry.exists():
+        return []
+    boosters = []
+    for version in registry.versions():
+        model = model_io.load_model(registry.resolve(version)['model'])
+        if not hasattr(model, 'get_booster') and type(model).__name__ != 'Booster':
+            logger.info(f"Versão {version} não é XGBoost, ignorada")
+            continue
+        booster = model.get_booster() if hasattr(model, 'get_booster') else model
+        best_iteration = getattr(model, 'best_iteration', None)
+        iteration_range = (0, int(best_iteration) + 1) if best_iteration is not None else (0, 0)
+        boosters.append((version, booster, iteration_range))
+    return boosters
+
+
+def synthetic_boosters() -> list:
+    """Modelos sintéticos: árvores rasas, profundas e desbalanceadas (folhas em níveis diferentes)"""
+    import xgboost as xgb
+
+    rng = np.random.default_rng(7)
+    X = rng.normal(size=(5000, 12)).astype(np.float32)
+    X[rng.random(X.shape) < 0.15] = np.nan
+    y = np.nan_to_num(X[:, 0] * 3 + X[:, 1] ** 2 - X[:, 2] * X[:, 3]) + rng.normal(size=len(X))
+    configs = {
+        'profundidade 1': {'max_depth': 1},
+        'profundidade 6': {'max_depth': 6},
+        'lossguide (desbalanceada)': {'grow_policy': 'lossguide', 'max_depth': 0, 'max_leaves': 64},
+        'absoluteerror': {'max_depth': 4, 'objective': 'reg:absoluteerror'}
+    }
+    boosters = []
+    for label, params in configs.items():
+        booster = xgb.train({'tree_method': 'hist', 'seed': 42, **params}, xgb.DMatrix(X, label=y),
+                            num_boost_round=30)
+        boosters.append((label, booster, (0, 0)))
+        if label == 'profundidade 6':
+            boosters.append((f'{label}, 20 iterações', booster, (0, 20)))
+    return boosters
+
+
+def main():
+    """Executa as comparações"""
+    models_dir = Path(__file__).parent / "models"
+
+    logger.info("=" * 60)
+    logger.info("TESTE DO ENSEMBLE COMPILADO")
+    logger.info("=" * 60)
+
+    try:
+        results = [check_parity(booster, label, iteration_range)
+                   for label, booster, iteration_range in registry_boosters(models_dir) + synthetic_boosters()]
+    except Exception as e:
+        logger.error(f"\n✗ ERRO: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+    if not all(results):
+        logger.error(f"\n✗ {results.count(False)} de {len(results)} modelos com predições diferentes")
+        return False
+    logger.info(f"\n✓ {len(results)} modelos com predições idênticas ao XGBoost")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
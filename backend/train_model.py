@@ -1,8 +1,23 @@
 """
 Script principal para treinar o modelo
+
+Exemplos:
+    python train_model.py
+    python train_model.py --backend hist_gbr
+    python train_model.py --compare                       # Compara todos os backends
+    python train_model.py --compare xgboost ridge --no-save
+    python train_model.py --force-promote                 # Promove mesmo fora do orçamento
+    python train_model.py --compact 0.05                  # Menor ensemble com MAE até 5% pior
+    python train_model.py --search 27 --search-cpus 4     # Busca de hiperparâmetros
+    python train_model.py --incremental ../data/lote.csv  # Continua o modelo atual com um lote novo
+    python train_model.py --out-of-core --chunk-rows 50000 # Lê o CSV em blocos (memória limitada)
+    python train_model.py --no-cache                      # Reprocessa o CSV mesmo sem mudanças
+    python train_model.py --no-snapshot                   # Lê o CSV mesmo com o snapshot atualizado
 """
 
+import argparse
 import sys
+from datetime import datetime
 from pathlib import Path
 
 # Adicionar src ao path
@@ -10,14 +25,266 @@ sys.path.insert(0, str(Path(__file__).parent / "src"))
 
 from data_processing import DataProcessor
 from model_trainer import ModelTrainer
+from model_backends import BACKENDS
+from model_compaction import DEFAULT_MAE_TOLERANCE
+from hyperparameter_search import DEFAULT_CONFIGS
+from out_of_core import DEFAULT_CHUNK_ROWS
+from streaming_stats import DEFAULT_ACCURACY
+import quantile_sketch
+import listings_snapshot
+from model_registry import ModelRegistry
+import model_io
+import promotion
 import logging
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Cache dos dados processados (ver processing_cache)
+CACHE_DIR = Path(__file__).parent / ".cache" / "processed"
+
+# Linhas do dataset atual no holdout do drift incremental
+DEFAULT_OLD_HOLDOUT_ROWS = 20_000
+
+
+def log_comparison(rows: list, chosen: str):
+    """Mostra a tabela de comparação entre backends"""
+    logger.info("=" * 96)
+    logger.info("COMPARAÇÃO DE BACKENDS (conjunto de teste)")
+    logger.info("=" * 96)
+    logger.info(f"{'backend':<18}{'MAE (R$)':>10}{'R²':>8}{'treino (s)':>12}{'artefato (KB)':>15}"
+                f"{'1 linha (ms)':>14}{'lote (ms)':>12}")
+    for row in rows:
+        marker = '*' if row['backend'] == chosen else ' '
+        logger.info(f"{marker}{row['backend']:<17}{row['MAE']:>10.2f}{row['R2']:>8.4f}{row['train_s']:>12.2f}"
+                    f"{row['artifact_kb']:>15.1f}{row['single_ms']:>14.3f}{row['batch_ms']:>12.3f}")
+    logger.info(f"* backend salvo (--backend {chosen}); a troca é uma decisão explícita de precisão vs custo")
+
+
+def log_compaction(report: dict):
+    """Mostra a tabela de candidatos da compactação"""
+    logger.info("=" * 96)
+    logger.info(f"COMPACTAÇÃO DO ENSEMBLE (MAE de validação até R$ {report['val_MAE_limit']:.2f})")
+    logger.info("=" * 96)
+    logger.info(f"{'candidato':<14}{'aumento':>8}{'árvores':>9}{'prof.':>7}{'custo':>7}{'MAE val':>10}"
+                f"{'MAE teste':>11}{'1 linha (ms)':>14}{'lote (ms)':>12}")
+    for row in report['candidates']:
+        marker = '*' if row.get('chosen') else ('' if row['within_tolerance'] else 'x')
+        factor = f"{row['augment_factor']:g}x" if 'augment_factor' in row else '-'
+        logger.info(f"{marker:<1}{row['kind']:<13}{factor:>8}{row['trees']:>9}{row['max_depth']:>7}{row['cost']:>7}"
+                    f"{row['val_MAE']:>10.2f}{row['test_MAE']:>11.2f}{row['single_ms']:>14.3f}{row['batch_ms']:>12.3f}")
+    logger.info(f"* escolhido ({report['cost_reduction']:.0%} menos nós por linha); x fora da tolerância")
+
+
+def parse_args():
+    """Lê os argumentos de linha de comando"""
+    parser = argparse.ArgumentParser(description="Treinamento do modelo AlugAI")
+    parser.add_argument('--backend', default='xgboost', choices=list(BACKENDS),
+                        help="Backend do modelo salvo (padrão: xgboost)")
+    parser.add_argument('--compare', nargs='*', choices=list(BACKENDS), metavar='BACKEND',
+                        help="Compara backends (sem nomes: todos) antes de salvar")
+    parser.add_argument('--compact', nargs='?', type=float, const=DEFAULT_MAE_TOLERANCE, metavar='TOLERANCIA',
+                        help="Compacta o ensemble (truncamento/destilação) dentro da tolerância de MAE "
+                             f"(padrão: {DEFAULT_MAE_TOLERANCE})")
+    parser.add_argument('--search', nargs='?', type=int, const=DEFAULT_CONFIGS, metavar='CONFIGS',
+                        help="Busca hiperparâmetros (successive halving) antes do treino "
+                             f"(padrão: {DEFAULT_CONFIGS} configurações)")
+    parser.add_argument('--search-cpus', type=int, default=None,
+                        help="Orçamento de núcleos da busca (padrão: todos)")
+    parser.add_argument('--cv-cpus', type=int, default=None,
+                        help="Orçamento de núcleos da validação cruzada (padrão: todos)")
+    parser.add_argument('--incremental', metavar='CSV', default=None,
+                        help="Treino incremental: continua o modelo atual com as linhas do CSV "
+                             "(retreino completo se o drift passar do limite)")
+    parser.add_argument('--incremental-rounds', type=int, default=20,
+                        help="Rodadas de boosting adicionadas no treino incremental")
+    parser.add_argument('--drift-threshold', type=float, default=0.1,
+                        help="Piora relativa máxima do MAE no treino incremental")
+    parser.add_argument('--old-holdout-rows', type=int, default=DEFAULT_OLD_HOLDOUT_ROWS,
+                        help="Linhas do dataset atual no holdout do drift incremental "
+                             f"(padrão: {DEFAULT_OLD_HOLDOUT_ROWS}; 0 desativa)")
+    parser.add_argument('--quantile-accuracy', type=float, default=None, metavar='ERRO',
+                        help="Medianas e quartis do IQR por sketches KLL com este erro de rank "
+                             "(padrão: quantis exatos)")
+    parser.add_argument('--out-of-core', action='store_true',
+                        help="Treina lendo o CSV em blocos (sem comparação, busca, compactação e CV)")
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS,
+                        help="Linhas por bloco no treino out-of-core")
+    parser.add_argument('--sample-rows', type=int, default=None,
+                        help="Treino out-of-core com o pipeline ajustado em uma amostra de até N linhas "
+                             "(padrão: estatísticas acumuladas em todos os blocos)")
+    parser.add_argument('--stats-accuracy', type=float, default=DEFAULT_ACCURACY,
+                        help="Erro relativo máximo dos quantis acumulados em blocos")
+    parser.add_argument('--external-memory', action='store_true',
+                        help="Treino out-of-core com as páginas quantizadas em disco")
+    parser.add_argument('--cache-dir', default=str(CACHE_DIR),
+                        help="Diretório do cache de dados processados")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Reprocessa os dados sem consultar nem gravar o cache")
+    parser.add_argument('--no-snapshot', action='store_true',
+                        help="Lê o CSV em vez do snapshot colunar (ver build_dataset.py)")
+    parser.add_argument('--no-save', action='store_true', help="Não salva o modelo treinado")
+    parser.add_argument('--budget', default=str(Path(__file__).parent / "promotion_budget.json"),
+                        help="Orçamentos do gate de promoção")
+    parser.add_argument('--no-promote', action='store_true',
+                        help="Salva a versão sem torná-la atual (sem gate)")
+    parser.add_argument('--force-promote', action='store_true',
+                        help="Promove a versão mesmo que viole o gate")
+    return parser.parse_args()
+
+
+def save_and_promote(args, trainer: ModelTrainer, encoding_data: dict, models_dir: Path):
+    """Salva a versão treinada e a submete ao gate de promoção"""
+    if args.no_save:
+        logger.info("\nModelo não salvo (--no-save)")
+        return
+    
+    logger.info("\nSalvando modelo...")
+    registry = ModelRegistry(models_dir)
+    had_current = registry.exists() and registry.current is not None
+    
+    # A versão é registrada sem virar a atual; só o gate de promoção
+    # (latência, vazão, carga e memória) pode promovê-la
+    version = datetime.now().strftime("%Y%m%d_%H%M%S")
+    trainer.save_model(version=version, make_current=False, encoding_data=encoding_data)
+    
+    if args.no_promote:
+        logger.info(f"Versão {version} salva sem promoção (--no-promote)")
+    elif not had_current:
+        logger.info(f"Versão {version} é a primeira do registro e já é a atual")
+    else:
+        logger.info("\nGate de promoção...")
+        budget = promotion.load_budget(args.budget)
+        promoted = promotion.promote(ModelRegistry(models_dir), version, budget, force=args.force_promote)
+        if not promoted:
+            logger.info(f"Para promover mesmo assim: python manage_models.py promote {version} --force")
+
+
+def sample_old_rows(args, data_path: Path, encoding: dict, feature_names: list):
+    """
+    Amostra do dataset atual para o holdout do drift incremental, codificada
+    com os mapeamentos da versão atual (sem atualizá-los)
+    
+    Returns:
+        (X_old, y_old) ou (None, None) se desativado ou impossível
+    """
+    if args.old_holdout_rows <= 0:
+        return None, None
+    processor = DataProcessor(str(data_path), quantile_accuracy=args.quantile_accuracy)
+    try:
+        processor.process_batch(encoding['encoding_maps'], feature_names, update=False)
+    except (ValueError, KeyError) as e:
+        logger.warning(f"Linhas antigas indisponíveis para o drift: {e}")
+        return None, None
+    X_old, y_old = processor.get_features_and_target()
+    if len(X_old) > args.old_holdout_rows:
+        X_old = X_old.sample(n=args.old_holdout_rows, random_state=42)
+        y_old = y_old.loc[X_old.index]
+    return X_old, y_old
+
+
+def train_incremental(args, data_path: Path, models_dir: Path):
+    """
+    Treino incremental a partir da versão atual do registro
+    
+    O drift é medido em um holdout com parte do lote e uma amostra do
+    dataset atual (`data_path`, ver sample_old_rows).
+    
+    Returns:
+        (trainer, encoding_data) ou None se for preciso um retreino completo
+    """
+    logger.info("\n[1/2] Processando lote novo...")
+    trainer = ModelTrainer(model_dir=str(models_dir), backend=args.backend)
+    registry = ModelRegistry(models_dir)
+    if not registry.exists() or registry.current is None:
+        logger.warning("Nenhuma versão atual no registro: retreino completo")
+        return None
+    trainer.load_model()
+    
+    artifacts = registry.resolve()
+    if 'encoding' not in artifacts:
+        logger.warning("Versão atual sem mapeamentos de encoding: retreino completo")
+        return None
+    encoding = model_io.load_encoding_artifact(artifacts['encoding'], mmap=False)
+    
+    processor = DataProcessor(args.incremental, quantile_accuracy=args.quantile_accuracy)
+    try:
+        processor.process_batch(encoding['encoding_maps'], trainer.feature_names)
+    except ValueError as e:
+        logger.warning(f"{e}")
+        return None
+    X_new, y_new = processor.get_features_and_target()
+    X_old, y_old = sample_old_rows(args, data_path, encoding, trainer.feature_names)
+    
+    logger.info("\n[2/2] Continuando o boosting...")
+    try:
+        report = trainer.train_incremental(X_new, y_new, rounds=args.incremental_rounds,
+                                           drift_threshold=args.drift_threshold, X_old=X_old, y_old=y_old)
+    except ValueError as e:
+        logger.warning(f"{e}")
+        return None
+    if report['fallback']:
+        return None
+    
+    # Valores únicos: os da versão anterior mais os do lote
+    unique_values = {name: list(values) for name, values in encoding.get('unique_values', {}).items()}
+    for name, values in processor.get_unique_values().items():
+        unique_values[name] = sorted(set(unique_values.get(name, [])) | set(values))
+    
+    # Sketches de quantis: os da versão anterior combinados com os do lote
+    quantile_sketches = quantile_sketch.merge_serialized(
+        trainer.base_metadata.get('quantile_sketches', {}), processor.get_quantile_sketches()
+    )
+    
+    return trainer, {
+        'encoding_maps': processor.get_encoding_maps(),
+        'unique_values': unique_values,
+        'quantile_sketches': quantile_sketches,
+        'pipeline_report': processor.get_pipeline_report()
+    }
+
+
+def train_out_of_core(args, data_path: Path, extra_paths: list, models_dir: Path):
+    """
+    Treino com o CSV lido em blocos (ver out_of_core)
+    
+    Returns:
+        (trainer, encoding_data)
+    """
+    skipped = [flag for flag, value in (('--compare', args.compare), ('--search', args.search),
+                                        ('--compact', args.compact)) if value is not None]
+    if skipped:
+        logger.warning(f"Ignorado no treino out-of-core: {', '.join(skipped)}")
+    
+    processor = DataProcessor(str(data_path), extra_paths=extra_paths)
+    if args.sample_rows:
+        logger.info("\n[1/3] Ajustando o pipeline em uma amostra...")
+        feature_names = processor.fit_sample(sample_rows=args.sample_rows, chunk_rows=args.chunk_rows)
+    else:
+        logger.info("\n[1/3] Acumulando estatísticas do pipeline em blocos...")
+        feature_names = processor.fit_streaming(chunk_rows=args.chunk_rows, accuracy=args.stats_accuracy)
+    logger.info(f"{len(feature_names)} features")
+    
+    logger.info("\n[2/3] Treinando modelo em blocos...")
+    trainer = ModelTrainer(model_dir=str(models_dir), backend=args.backend)
+    report = trainer.train_out_of_core(processor, chunk_rows=args.chunk_rows,
+                                       external_memory=args.external_memory)
+    
+    logger.info("\n[3/3] Resumo...")
+    logger.info(f"{report['chunks']} blocos, {report['csv_passes']} passadas sobre o CSV, "
+                f"{report['train_rows']} linhas de treino; teste em {report['test_rows']} linhas")
+    logger.info(f"Pico de memória: {report['peak_rss_mb']:.0f} MB")
+    
+    return trainer, {
+        'encoding_maps': processor.get_encoding_maps(),
+        'unique_values': processor.get_unique_values(),
+        'quantile_sketches': processor.get_quantile_sketches()
+    }
+
 
 def main():
     """Função principal para treinar o modelo"""
+    args = parse_args()
     
     # Caminhos - tentar usar imoveis-df.csv primeiro, depois dataZAP.csv
     data_path_imoveis = Path(__file__).parent.parent / "data" / "imoveis-df.csv"
@@ -38,9 +305,53 @@ def main():
     logger.info("TREINAMENTO DO MODELO ALUGAI")
     logger.info("=" * 60)
     
+    # Treino incremental (opcional): cai para o retreino completo, com o lote
+    # incluído, se não for possível ou se o drift passar do limite
+    extra_paths = []
+    if args.incremental:
+        result = train_incremental(args, data_path, models_dir)
+        if result is not None:
+            trainer, encoding_data = result
+            save_and_promote(args, trainer, encoding_data, models_dir)
+            logger.info("\n" + "=" * 60)
+            logger.info("TREINAMENTO INCREMENTAL CONCLUÍDO!")
+            logger.info("=" * 60)
+            logger.info(f"MAE no holdout compartilhado: R$ {trainer.metrics['MAE']:.2f} "
+                        f"({trainer.metrics['MAE_PCT']:.2f}%)")
+            if trainer.incremental['old_MAE'] is not None:
+                logger.info(f"MAE nas linhas antigas: R$ {trainer.incremental['old_MAE']:.2f}")
+            logger.info(f"Drift: {trainer.incremental['drift']:+.1%} "
+                        f"(referência {trainer.incremental['reference_version']})")
+            return
+        logger.info("\nRetreino completo com o lote incluído...")
+        extra_paths = [args.incremental]
+    
+    # Snapshot colunar (build_dataset.py): lido no lugar do CSV se corresponder
+    # a ele (não pode ser combinado com lotes em CSV)
+    snapshot_path = data_path.parent / listings_snapshot.SNAPSHOT_NAME
+    if not args.no_snapshot and not extra_paths and snapshot_path.exists():
+        if listings_snapshot.is_fresh(snapshot_path, data_path, DataProcessor.PIPELINE_VERSION):
+            logger.info(f"Usando snapshot: {snapshot_path.name}")
+            data_path = snapshot_path
+        else:
+            logger.warning(f"Snapshot {snapshot_path.name} desatualizado; lendo {data_path.name} "
+                           f"(atualize com build_dataset.py)")
+    
+    # Treino out-of-core (opcional): memória limitada pelo tamanho dos blocos
+    if args.out_of_core:
+        trainer, encoding_data = train_out_of_core(args, data_path, extra_paths, models_dir)
+        save_and_promote(args, trainer, encoding_data, models_dir)
+        logger.info("\n" + "=" * 60)
+        logger.info("TREINAMENTO OUT-OF-CORE CONCLUÍDO!")
+        logger.info("=" * 60)
+        logger.info(f"MAE: R$ {trainer.metrics['MAE']:.2f} ({trainer.metrics['MAE_PCT']:.2f}%)")
+        logger.info(f"R²: {trainer.metrics['R2']:.4f}")
+        return
+    
     # 1. Processar dados
     logger.info("\n[1/3] Processando dados...")
-    processor = DataProcessor(str(data_path))
+    processor = DataProcessor(str(data_path), extra_paths=extra_paths, quantile_accuracy=args.quantile_accuracy,
+                              cache_dir=None if args.no_cache else args.cache_dir)
     processed_df = processor.process()
     
     # 2. Separar features e target
@@ -49,21 +360,38 @@ def main():
     
     # 3. Treinar modelo
     logger.info("\n[2/3] Treinando modelo...")
-    trainer = ModelTrainer(model_dir=str(models_dir))
+    trainer = ModelTrainer(model_dir=str(models_dir), backend=args.backend)
     
     # Preparar dados
     X_train, X_val, X_test, y_train, y_val, y_test = trainer.prepare_data(X, y)
     
+    # Comparar backends nos mesmos conjuntos (opcional)
+    if args.compare is not None:
+        backends = args.compare or list(BACKENDS)
+        rows = trainer.compare_backends(backends, X_train, y_train, X_val, y_val, X_test, y_test)
+        log_comparison(rows, args.backend)
+    
+    # Buscar hiperparâmetros (opcional)
+    if args.search is not None:
+        trainer.search_hyperparameters(X_train, y_train, X_val, y_val,
+                                       n_configs=args.search, cpus=args.search_cpus)
+    
     # Treinar
-    trainer.train_xgboost(X_train, y_train, X_val, y_val)
+    trainer.train(X_train, y_train, X_val, y_val)
     
     # Avaliar
     logger.info("\n[3/3] Avaliando modelo...")
     metrics = trainer.evaluate(X_test, y_test)
     
+    # Compactar o ensemble (opcional)
+    if args.compact is not None:
+        report = trainer.compact(X_train, y_train, X_val, y_val, X_test, y_test, mae_tolerance=args.compact)
+        log_compaction(report)
+        metrics = trainer.metrics
+    
     # Validação cruzada
     X_all = trainer.scaler.transform(X)
-    cv_mae, cv_std = trainer.cross_validate(X_all, y)
+    cv_mae, cv_std = trainer.cross_validate(X_all, y, cpus=args.cv_cpus)
     
     # Feature importance
     logger.info("\nTop 10 Features mais importantes:")
@@ -74,20 +402,12 @@ def main():
     encoding_maps = processor.get_encoding_maps()
     unique_values = processor.get_unique_values()
     
-    # Salvar modelo (incluindo encoding maps e unique values)
-    logger.info("\nSalvando modelo...")
-    model_path, scaler_path, metadata_path = trainer.save_model()
-    version = metadata_path.stem.replace('metadata_', '')
-    
-    # Salvar encoding maps e unique values
-    import json
-    encoding_path = models_dir / f"encoding_{version}.json"
-    with open(encoding_path, 'w', encoding='utf-8') as f:
-        json.dump({
-            'encoding_maps': encoding_maps,
-            'unique_values': unique_values
-        }, f, ensure_ascii=False, indent=2)
-    logger.info(f"Mapeamentos de encoding salvos em {encoding_path}")
+    save_and_promote(args, trainer, {
+        'encoding_maps': encoding_maps,
+        'unique_values': unique_values,
+        'quantile_sketches': processor.get_quantile_sketches(),
+        'pipeline_report': processor.get_pipeline_report()
+    }, models_dir)
     
     logger.info("\n" + "=" * 60)
     logger.info("TREINAMENTO CONCLUÍDO!")